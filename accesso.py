@@ -0,0 +1,62 @@
+"""
+DETERMINAFACILE - Accesso all'Archivio v1.0
+Riconosce l'ente che usa l'archivio delle determine (archivio.py) dal suo
+codice di accesso. Gli enti abilitati sono nei secrets di Streamlit, con
+l'impronta SHA-256 del codice (mai il codice in chiaro):
+
+    [archivio_enti]
+    "Comune di Prova" = "<sha256 del codice, es. da: printf %s CODICE | sha256sum>"
+
+L'ente riconosciuto resta nella sessione (anche passando alla pagina di
+ricerca) e decide quali atti si archiviano, si cercano e si riscaricano,
+e su quali atti si verificano la rotazione e la spesa cumulata. Senza enti
+configurati l'archivio, anche se attivo, non riceve né mostra nulla.
+"""
+
+from typing import Dict, Optional
+
+import streamlit as st
+
+from archivio import ente_autorizzato
+
+
+CHIAVE_SESSIONE = "ente_archivio"
+
+
+def enti_configurati() -> Dict[str, str]:
+    try:
+        return dict(st.secrets["archivio_enti"])
+    except (FileNotFoundError, KeyError):
+        return {}
+
+
+def ente_sessione() -> Optional[str]:
+    """Ente riconosciuto in questa sessione (None se nessun accesso)."""
+    return st.session_state.get(CHIAVE_SESSIONE)
+
+
+def modulo_accesso() -> Optional[str]:
+    """Campo del codice ente (o l'ente già riconosciuto, con il pulsante per uscire)."""
+    ente = ente_sessione()
+    if ente:
+        st.caption(f"🗄️ Archivio: **{ente}**")
+        if st.button("Esci dall'archivio", key="esci_archivio"):
+            del st.session_state[CHIAVE_SESSIONE]
+            st.session_state.pop("codice_ente", None)
+            st.rerun()
+        return ente
+
+    enti = enti_configurati()
+    if not enti:
+        st.caption("🗄️ Archivio: nessun ente abilitato.")
+        return None
+    codice = st.text_input("Codice ente (archivio)", type="password", key="codice_ente",
+                           help="Solo con il codice del tuo ente le determine scaricate sono archiviate")
+    if codice:
+        ente = ente_autorizzato(codice, enti)
+        if ente is None:
+            st.error("Codice ente non valido.")
+            return None
+        st.session_state[CHIAVE_SESSIONE] = ente
+        st.rerun()
+    return None
@@ -0,0 +1,188 @@
+"""
+DETERMINAFACILE - Cache Risposte AI v1.0
+Cache a due livelli per le risposte del modello usate dalle funzioni
+'Magic Writer' (riscrittura motivazione, oggetto, CPV):
+- livello in memoria (LRU, per processo)
+- livello su disco facoltativo (SQLite, condiviso tra processi) con
+  scadenza (TTL) e limite sul numero di risposte memorizzate: conserva i
+  testi delle motivazioni, per cui è attivo solo se richiesto
+Solo le risposte valide vengono memorizzate: gli errori non entrano mai in cache.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Optional
+
+
+# File del livello su disco; vuoto (predefinito) = solo memoria
+PERCORSO_PREDEFINITO = os.environ.get("DETERMINAFACILE_AI_CACHE", "")
+
+
+def normalizza_testo(testo: str) -> str:
+    """Normalizza l'input dell'utente: Unicode NFC, spazi compattati, senza spazi ai bordi."""
+    return " ".join(unicodedata.normalize("NFC", testo or "").split())
+
+
+def chiave_risposta(funzione: str, modello: str, prompt: str,
+                    temperatura: float, testo: str) -> str:
+    """Chiave della risposta: hash di funzione, modello, prompt, temperatura e input normalizzato."""
+    materiale = json.dumps(
+        [funzione, modello, prompt, float(temperatura), normalizza_testo(testo)],
+        ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(materiale.encode("utf-8")).hexdigest()
+
+
+class CacheRisposteAI:
+    """
+    Cache delle risposte AI con livello in memoria e livello SQLite.
+
+    Args:
+        percorso_db: File SQLite (None o vuoto per disattivare il livello su disco)
+        ttl_secondi: Validità di una risposta memorizzata
+        max_voci_memoria: Risposte tenute nel livello in memoria
+        max_voci_disco: Risposte tenute su disco; oltre il limite si
+            eliminano quelle usate meno di recente
+    """
+
+    def __init__(self, percorso_db: Optional[str] = PERCORSO_PREDEFINITO,
+                 ttl_secondi: float = 30 * 24 * 3600,
+                 max_voci_memoria: int = 512, max_voci_disco: int = 20000):
+        self.ttl_secondi = ttl_secondi
+        self.max_voci_memoria = max_voci_memoria
+        self.max_voci_disco = max_voci_disco
+        self._memoria: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hit_memoria = 0
+        self.hit_disco = 0
+        self.miss = 0
+
+        self._db = None
+        if percorso_db:
+            cartella = os.path.dirname(percorso_db)
+            if cartella:
+                os.makedirs(cartella, exist_ok=True)
+            self._db = sqlite3.connect(percorso_db, check_same_thread=False, timeout=5)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS risposte ("
+                " chiave TEXT PRIMARY KEY,"
+                " risposta TEXT NOT NULL,"
+                " scadenza REAL NOT NULL,"
+                " usata REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_risposte_usata ON risposte(usata)")
+            self._db.commit()
+
+    # -------------------------------------------------------------------------
+    # Livello in memoria
+    # -------------------------------------------------------------------------
+
+    def _leggi_memoria(self, chiave: str, adesso: float) -> Optional[str]:
+        voce = self._memoria.get(chiave)
+        if voce is None:
+            return None
+        risposta, scadenza = voce
+        if scadenza <= adesso:
+            del self._memoria[chiave]
+            return None
+        self._memoria.move_to_end(chiave)
+        return risposta
+
+    def _scrivi_memoria(self, chiave: str, risposta: str, scadenza: float) -> None:
+        self._memoria[chiave] = (risposta, scadenza)
+        self._memoria.move_to_end(chiave)
+        while len(self._memoria) > self.max_voci_memoria:
+            self._memoria.popitem(last=False)
+
+    # -------------------------------------------------------------------------
+    # Livello su disco
+    # -------------------------------------------------------------------------
+
+    def _leggi_disco(self, chiave: str, adesso: float) -> Optional[tuple]:
+        if self._db is None:
+            return None
+        riga = self._db.execute(
+            "SELECT risposta, scadenza FROM risposte WHERE chiave = ?", (chiave,)
+        ).fetchone()
+        if riga is None:
+            return None
+        if riga[1] <= adesso:
+            self._db.execute("DELETE FROM risposte WHERE chiave = ?", (chiave,))
+            self._db.commit()
+            return None
+        self._db.execute("UPDATE risposte SET usata = ? WHERE chiave = ?", (adesso, chiave))
+        self._db.commit()
+        return riga
+
+    def _scrivi_disco(self, chiave: str, risposta: str, scadenza: float, adesso: float) -> None:
+        if self._db is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO risposte (chiave, risposta, scadenza, usata) VALUES (?, ?, ?, ?)",
+            (chiave, risposta, scadenza, adesso)
+        )
+        self._db.execute("DELETE FROM risposte WHERE scadenza <= ?", (adesso,))
+        eccedenza = self._db.execute("SELECT COUNT(*) FROM risposte").fetchone()[0] - self.max_voci_disco
+        if eccedenza > 0:
+            self._db.execute(
+                "DELETE FROM risposte WHERE chiave IN "
+                "(SELECT chiave FROM risposte ORDER BY usata LIMIT ?)", (eccedenza,)
+            )
+        self._db.commit()
+
+    # -------------------------------------------------------------------------
+    # API pubblica
+    # -------------------------------------------------------------------------
+
+    def leggi(self, chiave: str) -> Optional[str]:
+        """Restituisce la risposta memorizzata o None."""
+        adesso = time.time()
+        with self._lock:
+            risposta = self._leggi_memoria(chiave, adesso)
+            if risposta is not None:
+                self.hit_memoria += 1
+                return risposta
+            riga = self._leggi_disco(chiave, adesso)
+            if riga is not None:
+                self.hit_disco += 1
+                self._scrivi_memoria(chiave, riga[0], riga[1])
+                return riga[0]
+            self.miss += 1
+            return None
+
+    def scrivi(self, chiave: str, risposta: str) -> None:
+        """Memorizza una risposta valida in entrambi i livelli."""
+        adesso = time.time()
+        scadenza = adesso + self.ttl_secondi
+        with self._lock:
+            self._scrivi_memoria(chiave, risposta, scadenza)
+            self._scrivi_disco(chiave, risposta, scadenza, adesso)
+
+    def ottieni_o_calcola(self, chiave: str, calcola: Callable[[], str]) -> str:
+        """
+        Restituisce la risposta in cache oppure esegue `calcola()` e ne
+        memorizza il risultato. Le eccezioni di `calcola` vengono propagate
+        senza scrivere nulla in cache.
+        """
+        risposta = self.leggi(chiave)
+        if risposta is None:
+            risposta = calcola()
+            if risposta:
+                self.scrivi(chiave, risposta)
+        return risposta
+
+    def statistiche(self) -> dict:
+        with self._lock:
+            return {
+                "hit_memoria": self.hit_memoria,
+                "hit_disco": self.hit_disco,
+                "miss": self.miss,
+                "voci_memoria": len(self._memoria),
+            }
@@ -0,0 +1,471 @@
+"""
+DETERMINAFACILE - Funzioni AI v1.1
+Prompt e chiamate al modello per le funzioni 'Magic Writer'.
+Contiene le versioni asincrone (AsyncOpenAI) con timeout per chiamata,
+tentativi limitati con backoff e jitter, e l'azione combinata che genera
+oggetto e CPV dalla motivazione in parallelo, più la versione in streaming
+della riscrittura della motivazione (testo mostrato man mano che arriva).
+- crea_client: client sincrono da tenere uno per processo, con pool di
+  connessioni keep-alive (gli handshake TLS si riusano tra le chiamate)
+- completamento: la chiamata sincrona con gli stessi timeout e ritentativi
+  delle versioni asincrone
+- CircuitoAI: dopo una serie di errori transitori (429, 5xx, rete,
+  timeout) le chiamate falliscono subito con AINonDisponibile per qualche
+  secondo, invece di far attendere ogni utente fino al timeout
+- con `traffico` (ai_traffico.TrafficoAI) le richieste identiche in corso
+  sono accorpate e ogni sessione consuma i gettoni del suo `secchio`
+Non dipende da Streamlit: il client può puntare a qualunque base_url
+compatibile (es. un server HTTP locale di prova).
+"""
+
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Iterator, Optional, Tuple
+
+import openai
+from openai import AsyncOpenAI, OpenAI
+
+from ai_cache import CacheRisposteAI, chiave_risposta
+from ai_traffico import LimiteRichiesteAI, SecchioGettoni, TrafficoAI
+
+
+# =============================================================================
+# PROMPT E PARAMETRI
+# =============================================================================
+
+MODELLO_AI = "gpt-4o-mini"
+
+PROMPT_MOTIVAZIONE = "Sei un esperto funzionario della P.A. Riscrivi il testo dell'utente in linguaggio amministrativo formale per la premessa di una Determina. Usa termini come 'preso atto', 'verificata', 'ritenuto'. Non aggiungere saluti."
+
+PROMPT_OGGETTO = "Sei un esperto amministrativo. Sintetizza il testo fornito in un OGGETTO DI DETERMINA. Regole: 1. Massimo 15 parole. 2. Tutto MAIUSCOLO. 3. Stile telegrafico. 4. Niente punto finale."
+
+PROMPT_CPV = "Identifica il codice CPV (Common Procurement Vocabulary) più idoneo per l'oggetto fornito. Restituisci SOLO il codice numerico e la descrizione sintetica."
+
+# Secondi massimi per singola chiamata al modello
+TIMEOUT_CHIAMATA = 20.0
+
+# Tentativi complessivi per chiamata (il primo più i ritentativi)
+TENTATIVI = 3
+
+# Attesa base del backoff esponenziale, in secondi
+BACKOFF_BASE = 0.5
+
+# Attesa massima tra due tentativi, anche se il server chiede di più (Retry-After)
+ATTESA_MASSIMA = 8.0
+
+# Connessioni keep-alive tenute aperte dal client sincrono e per quanti secondi
+CONNESSIONI_KEEPALIVE = 10
+SCADENZA_KEEPALIVE = 60.0
+
+# Errori per cui ha senso ritentare: timeout, rete, 429 e 5xx
+ERRORI_TRANSITORI = (
+    asyncio.TimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+def crea_client_async(api_key: str, base_url: Optional[str] = None) -> AsyncOpenAI:
+    """
+    Crea il client asincrono. I ritentativi interni dell'SDK sono disattivati
+    perché gestiti da _completamento_async con backoff e jitter.
+    """
+    return AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+
+
+def crea_client(api_key: str, base_url: Optional[str] = None) -> OpenAI:
+    """
+    Crea il client sincrono, da creare una volta e condividere nel processo
+    (è thread-safe): le connessioni restano aperte tra una chiamata e
+    l'altra. Timeout per chiamata e niente ritentativi interni dell'SDK,
+    gestiti da completamento().
+    """
+    opzioni = {}
+    try:
+        import httpx
+    except ImportError:
+        pass  # resta il pool predefinito dell'SDK (keep-alive più breve)
+    else:
+        opzioni["http_client"] = httpx.Client(follow_redirects=True, limits=httpx.Limits(
+            max_keepalive_connections=CONNESSIONI_KEEPALIVE,
+            keepalive_expiry=SCADENZA_KEEPALIVE,
+        ))
+    return OpenAI(api_key=api_key, base_url=base_url, max_retries=0,
+                  timeout=TIMEOUT_CHIAMATA, **opzioni)
+
+
+def _attesa(tentativo: int, errore: Exception) -> float:
+    """
+    Secondi prima del tentativo successivo: backoff esponenziale con jitter
+    per non sincronizzare i ritentativi, o il Retry-After di un 429/503 se
+    maggiore (entro ATTESA_MASSIMA).
+    """
+    attesa = BACKOFF_BASE * (2 ** tentativo) * random.uniform(0.5, 1.5)
+    risposta = getattr(errore, "response", None)
+    try:
+        attesa = max(attesa, float(risposta.headers.get("retry-after", 0)))
+    except (AttributeError, TypeError, ValueError):
+        pass
+    return min(attesa, ATTESA_MASSIMA)
+
+
+# =============================================================================
+# INTERRUTTORE DI CIRCUITO
+# =============================================================================
+
+class AINonDisponibile(Exception):
+    """Il circuito è aperto: la chiamata al modello non è stata nemmeno tentata."""
+
+
+# Chiamate rifiutate prima di contattare il modello: il messaggio è già per l'utente
+CHIAMATE_RIFIUTATE = (AINonDisponibile, LimiteRichiesteAI)
+
+
+class CircuitoAI:
+    """
+    Interruttore di circuito condiviso dalle chiamate al modello.
+
+    - chiuso: le chiamate passano; `soglia` chiamate consecutive fallite per
+      errori transitori (dopo i ritentativi) lo aprono
+    - aperto: per `pausa` secondi ogni chiamata fallisce subito con
+      AINonDisponibile
+    - semiaperto: trascorsa la pausa passa una sola chiamata di prova; se
+      riesce il circuito si chiude, se fallisce si riapre per un'altra pausa
+
+    Gli errori non transitori (es. richiesta non valida, API Key errata)
+    indicano che il servizio risponde: non aprono il circuito.
+    """
+
+    def __init__(self, soglia: int = 3, pausa: float = 30.0,
+                 orologio: Callable[[], float] = time.monotonic):
+        self.soglia = soglia
+        self.pausa = pausa
+        self._orologio = orologio
+        self._lock = threading.Lock()
+        self._errori = 0
+        self._riapertura: Optional[float] = None  # None = chiuso
+        self._prova_in_corso = False
+        self.aperture = 0
+        self.rifiutate = 0
+
+    @property
+    def stato(self) -> str:
+        with self._lock:
+            if self._riapertura is None:
+                return "chiuso"
+            return "aperto" if self._orologio() < self._riapertura else "semiaperto"
+
+    def consenti(self) -> bool:
+        """
+        Solleva AINonDisponibile se la chiamata non deve partire; True se è
+        la chiamata di prova del circuito semiaperto.
+        """
+        with self._lock:
+            if self._riapertura is None:
+                return False
+            mancano = self._riapertura - self._orologio()
+            if mancano <= 0 and not self._prova_in_corso:
+                self._prova_in_corso = True
+                return True
+            self.rifiutate += 1
+        raise AINonDisponibile(
+            f"AI temporaneamente non disponibile: riprova tra {max(1, round(mancano))} secondi."
+        )
+
+    def successo(self) -> None:
+        with self._lock:
+            self._errori = 0
+            self._riapertura = None
+            self._prova_in_corso = False
+
+    def fallimento(self, prova: bool = False) -> None:
+        with self._lock:
+            self._errori += 1
+            if prova:
+                self._prova_in_corso = False
+            elif self._riapertura is not None or self._errori < self.soglia:
+                return  # già aperto (chiamata partita prima) o sotto soglia
+            self._riapertura = self._orologio() + self.pausa
+            self.aperture += 1
+
+    @contextmanager
+    def chiamata(self):
+        """Blocco che esegue una chiamata (ritentativi compresi) e ne registra l'esito."""
+        prova = self.consenti()
+        try:
+            yield
+        except ERRORI_TRANSITORI:
+            self.fallimento(prova)
+            raise
+        except Exception:
+            self.successo()
+            raise
+        except BaseException:
+            # Interrotta senza esito (es. cancellata): libera la prova
+            if prova:
+                with self._lock:
+                    self._prova_in_corso = False
+            raise
+        else:
+            self.successo()
+
+    def statistiche(self) -> dict:
+        stato = self.stato
+        with self._lock:
+            return {
+                "stato": stato,
+                "errori_consecutivi": self._errori,
+                "aperture": self.aperture,
+                "rifiutate": self.rifiutate,
+            }
+
+
+# =============================================================================
+# CHIAMATA CON TIMEOUT E RITENTATIVI
+# =============================================================================
+
+async def _completamento_async(client: AsyncOpenAI, funzione: str, prompt: str,
+                               etichetta: str, testo: str, temperatura: float,
+                               timeout: float = TIMEOUT_CHIAMATA,
+                               tentativi: int = TENTATIVI,
+                               cache: Optional[CacheRisposteAI] = None,
+                               circuito: Optional[CircuitoAI] = None,
+                               traffico: Optional[TrafficoAI] = None,
+                               secchio: Optional[SecchioGettoni] = None) -> str:
+    """
+    Esegue una chiamata al modello con timeout per tentativo e ritentativi
+    limitati sugli errori transitori. La cancellazione del task chiamante
+    interrompe subito la richiesta in corso. Con `circuito` la chiamata
+    fallisce subito (AINonDisponibile) mentre il circuito è aperto; con
+    `traffico` è accorpata alle richieste identiche in corso e consuma un
+    gettone di `secchio` (LimiteRichiesteAI se esaurito). Le letture e
+    scritture della cache (SQLite, sincrone) girano in un thread, per non
+    fermare l'event loop.
+    """
+    if tentativi < 1:
+        raise ValueError(f"tentativi deve essere almeno 1 (ricevuto {tentativi})")
+    # La chiave usa il testo normalizzato; al modello va il testo originale
+    chiave = chiave_risposta(funzione, MODELLO_AI, prompt, temperatura, testo)
+    if cache is not None:
+        risposta = await asyncio.to_thread(cache.leggi, chiave)
+        if risposta is not None:
+            return risposta
+
+    async def chiama() -> str:
+        with circuito.chiamata() if circuito is not None else nullcontext():
+            for tentativo in range(tentativi):
+                try:
+                    response = await asyncio.wait_for(
+                        client.chat.completions.create(
+                            model=MODELLO_AI,
+                            messages=[{"role": "system", "content": prompt}, {"role": "user", "content": f"{etichetta}: '{testo}'"}],
+                            temperature=temperatura
+                        ),
+                        timeout
+                    )
+                    break
+                except ERRORI_TRANSITORI as e:
+                    if tentativo == tentativi - 1:
+                        raise
+                    await asyncio.sleep(_attesa(tentativo, e))
+
+        risposta = response.choices[0].message.content.strip()
+        if cache is not None and risposta:
+            await asyncio.to_thread(cache.scrivi, chiave, risposta)
+        return risposta
+
+    if traffico is None:
+        return await chiama()
+    return await traffico.esegui_async(chiave, chiama, secchio)
+
+
+async def _con_messaggio_errore(coroutine) -> str:
+    """Converte le eccezioni nel messaggio mostrato all'utente (la cancellazione resta un'eccezione)."""
+    try:
+        return await coroutine
+    except asyncio.TimeoutError:
+        return "Errore AI: tempo di risposta scaduto."
+    except CHIAMATE_RIFIUTATE as e:
+        return str(e)
+    except Exception as e:
+        return f"Errore AI: {str(e)}"
+
+
+def completamento(client: OpenAI, funzione: str, prompt: str,
+                  etichetta: str, testo: str, temperatura: float,
+                  timeout: float = TIMEOUT_CHIAMATA,
+                  tentativi: int = TENTATIVI,
+                  cache: Optional[CacheRisposteAI] = None,
+                  circuito: Optional[CircuitoAI] = None,
+                  traffico: Optional[TrafficoAI] = None,
+                  secchio: Optional[SecchioGettoni] = None) -> str:
+    """
+    Versione sincrona di _completamento_async, per il client condiviso di
+    crea_client. Le eccezioni vengono propagate: gli errori non entrano in
+    cache.
+    """
+    if tentativi < 1:
+        raise ValueError(f"tentativi deve essere almeno 1 (ricevuto {tentativi})")
+    chiave = chiave_risposta(funzione, MODELLO_AI, prompt, temperatura, testo)
+    if cache is not None:
+        risposta = cache.leggi(chiave)
+        if risposta is not None:
+            return risposta
+
+    def chiama() -> str:
+        with circuito.chiamata() if circuito is not None else nullcontext():
+            for tentativo in range(tentativi):
+                try:
+                    response = client.chat.completions.create(
+                        model=MODELLO_AI,
+                        messages=[{"role": "system", "content": prompt}, {"role": "user", "content": f"{etichetta}: '{testo}'"}],
+                        temperature=temperatura,
+                        timeout=timeout
+                    )
+                    break
+                except ERRORI_TRANSITORI as e:
+                    if tentativo == tentativi - 1:
+                        raise
+                    time.sleep(_attesa(tentativo, e))
+
+        risposta = response.choices[0].message.content.strip()
+        if cache is not None and risposta:
+            cache.scrivi(chiave, risposta)
+        return risposta
+
+    if traffico is None:
+        return chiama()
+    return traffico.esegui(chiave, chiama, secchio)
+
+
+# =============================================================================
+# FUNZIONI AI ASINCRONE
+# =============================================================================
+
+async def riscrivi_motivazione_async(client: AsyncOpenAI, testo_grezzo: str, **opzioni) -> str:
+    """Trasforma testo informale in burocratese."""
+    return await _con_messaggio_errore(_completamento_async(
+        client, "riscrivi_motivazione", PROMPT_MOTIVAZIONE, "Testo", testo_grezzo, 0.7, **opzioni
+    ))
+
+
+async def genera_oggetto_async(client: AsyncOpenAI, testo_motivazione: str, **opzioni) -> str:
+    """Sintetizza la motivazione in un Oggetto maiuscolo."""
+    return await _con_messaggio_errore(_completamento_async(
+        client, "genera_oggetto", PROMPT_OGGETTO, "Testo", testo_motivazione, 0.5, **opzioni
+    ))
+
+
+async def trova_cpv_async(client: AsyncOpenAI, descrizione_oggetto: str, **opzioni) -> str:
+    """Trova il codice CPV più probabile."""
+    return await _con_messaggio_errore(_completamento_async(
+        client, "trova_cpv", PROMPT_CPV, "Oggetto", descrizione_oggetto, 0.3, **opzioni
+    ))
+
+
+async def genera_oggetto_e_cpv_async(client: AsyncOpenAI, testo_motivazione: str,
+                                     **opzioni) -> Tuple[str, str]:
+    """
+    Genera oggetto e CPV dalla motivazione con due chiamate concorrenti:
+    il tempo complessivo è quello della chiamata più lenta.
+    Restituisce (oggetto, cpv); un errore su una delle due non blocca l'altra.
+    """
+    oggetto, cpv = await asyncio.gather(
+        genera_oggetto_async(client, testo_motivazione, **opzioni),
+        trova_cpv_async(client, testo_motivazione, **opzioni),
+    )
+    return oggetto, cpv
+
+
+# =============================================================================
+# STREAMING (MAGIC WRITER)
+# =============================================================================
+
+def _completamento_stream(client: OpenAI, funzione: str, prompt: str,
+                          etichetta: str, testo: str, temperatura: float,
+                          timeout: float = TIMEOUT_CHIAMATA,
+                          cache: Optional[CacheRisposteAI] = None,
+                          circuito: Optional[CircuitoAI] = None,
+                          traffico: Optional[TrafficoAI] = None,
+                          secchio: Optional[SecchioGettoni] = None) -> Iterator[str]:
+    """
+    Come _completamento_async ma con stream=True: restituisce i frammenti di
+    testo man mano che il modello li genera. Una risposta già in cache viene
+    restituita in un unico frammento; quella generata viene memorizzata solo
+    se lo stream arriva fino in fondo. Niente ritentativi (un frammento
+    potrebbe essere già stato mostrato) né accorpamento: `traffico` conta
+    la chiamata e preleva il gettone dal secchio, restituito se la chiamata
+    fallisce prima del primo frammento (il chiamante ripiega sulla chiamata
+    normale, che ne preleva uno suo).
+    """
+    chiave = chiave_risposta(funzione, MODELLO_AI, prompt, temperatura, testo)
+    if cache is not None:
+        risposta = cache.leggi(chiave)
+        if risposta is not None:
+            yield risposta
+            return
+
+    if traffico is not None:
+        traffico.preleva(secchio)
+    frammenti = []
+    try:
+        with circuito.chiamata() if circuito is not None else nullcontext():
+            stream = client.chat.completions.create(
+                model=MODELLO_AI,
+                messages=[{"role": "system", "content": prompt}, {"role": "user", "content": f"{etichetta}: '{testo}'"}],
+                temperature=temperatura,
+                stream=True,
+                timeout=timeout
+            )
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                frammento = chunk.choices[0].delta.content
+                if frammento:
+                    frammenti.append(frammento)
+                    yield frammento
+    except Exception:
+        if traffico is not None and not frammenti:
+            traffico.restituisci(secchio)
+        raise
+
+    risposta = "".join(frammenti).strip()
+    if cache is not None and risposta:
+        cache.scrivi(chiave, risposta)
+
+
+def riscrivi_motivazione_stream(client: OpenAI, testo_grezzo: str, **opzioni) -> Iterator[str]:
+    """
+    Trasforma testo informale in burocratese restituendo il testo a frammenti.
+    Le eccezioni non vengono convertite in messaggio: il chiamante decide se
+    ripiegare sulla chiamata non in streaming.
+    """
+    return _completamento_stream(
+        client, "riscrivi_motivazione", PROMPT_MOTIVAZIONE, "Testo", testo_grezzo, 0.7, **opzioni
+    )
+
+
+def genera_oggetto_e_cpv(client: OpenAI, testo_motivazione: str, **opzioni) -> Tuple[str, str]:
+    """
+    Versione sincrona di genera_oggetto_e_cpv_async, per il client condiviso
+    di crea_client: le due chiamate girano in due thread sulle stesse
+    connessioni keep-alive. Restituisce (oggetto, cpv); un errore su una
+    delle due diventa il suo messaggio e non blocca l'altra.
+    """
+    def esegui(funzione: str, prompt: str, etichetta: str, temperatura: float) -> str:
+        try:
+            return completamento(client, funzione, prompt, etichetta, testo_motivazione, temperatura, **opzioni)
+        except CHIAMATE_RIFIUTATE as e:
+            return str(e)
+        except Exception as e:
+            return f"Errore AI: {str(e)}"
+
+    with ThreadPoolExecutor(max_workers=2) as esecutore:
+        oggetto = esecutore.submit(esegui, "genera_oggetto", PROMPT_OGGETTO, "Testo", 0.5)
+        cpv = esecutore.submit(esegui, "trova_cpv", PROMPT_CPV, "Oggetto", 0.3)
+        return oggetto.result(), cpv.result()
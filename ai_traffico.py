@@ -0,0 +1,176 @@
+"""
+DETERMINAFACILE - Traffico AI v1.0
+Regola le chiamate al modello che non trovano la risposta in cache:
+- accorpamento (single-flight): richieste identiche (stessa chiave di
+  ai_cache.chiave_risposta) arrivate mentre la prima è ancora in corso
+  non partono, attendono e ricevono il suo stesso risultato o errore;
+  vale anche tra la versione sincrona e quella asincrona delle chiamate
+- limite per sessione (token bucket): ogni sessione ha un secchio di
+  gettoni, una chiamata al modello ne consuma uno; le risposte in cache e
+  le richieste accorpate non consumano gettoni
+- contatori di processo: chiamate inoltrate, accorpate e limitate
+Non dipende da openai né da Streamlit.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+
+# Richieste consentite di fila a una sessione e gettoni restituiti al minuto
+GETTONI_SESSIONE = 5
+GETTONI_AL_MINUTO = 6
+
+
+class LimiteRichiesteAI(Exception):
+    """La sessione ha esaurito i gettoni: la chiamata al modello non è stata tentata."""
+
+
+class SecchioGettoni:
+    """
+    Token bucket di una sessione: fino a `capacita` richieste di fila, poi
+    una ogni 60 / `al_minuto` secondi. Non è thread-safe da solo: i prelievi
+    passano da TrafficoAI, che li esegue sotto il suo lock.
+    """
+
+    def __init__(self, capacita: int = GETTONI_SESSIONE, al_minuto: float = GETTONI_AL_MINUTO,
+                 orologio: Callable[[], float] = time.monotonic):
+        self.capacita = capacita
+        self.al_secondo = al_minuto / 60
+        self._orologio = orologio
+        self._gettoni = float(capacita)
+        self._aggiornato = orologio()
+
+    def preleva(self) -> float:
+        """Consuma un gettone e restituisce 0; se non ce n'è, i secondi da attendere."""
+        adesso = self._orologio()
+        self._gettoni = min(self.capacita, self._gettoni + (adesso - self._aggiornato) * self.al_secondo)
+        self._aggiornato = adesso
+        if self._gettoni >= 1:
+            self._gettoni -= 1
+            return 0.0
+        return (1 - self._gettoni) / self.al_secondo
+
+    def restituisci(self) -> None:
+        """Rende il gettone di una chiamata fallita prima di produrre qualcosa."""
+        self._gettoni = min(self.capacita, self._gettoni + 1)
+
+
+class TrafficoAI:
+    """
+    Richieste al modello in corso nel processo e contatori condivisi da
+    tutte le sessioni.
+
+    Args:
+        capacita: Gettoni del secchio di ogni sessione (vedi secchio())
+        al_minuto: Gettoni restituiti al minuto
+    """
+
+    def __init__(self, capacita: int = GETTONI_SESSIONE, al_minuto: float = GETTONI_AL_MINUTO):
+        self.capacita = capacita
+        self.al_minuto = al_minuto
+        self._lock = threading.Lock()
+        self._in_corso: Dict[str, Future] = {}
+        self.inoltrate = 0
+        self.accorpate = 0
+        self.limitate = 0
+
+    def secchio(self) -> SecchioGettoni:
+        """Nuovo secchio per una sessione, con i limiti del processo."""
+        return SecchioGettoni(self.capacita, self.al_minuto)
+
+    def _preleva(self, secchio: Optional[SecchioGettoni]) -> None:
+        # Da chiamare con il lock acquisito
+        attesa = secchio.preleva() if secchio is not None else 0.0
+        if attesa:
+            self.limitate += 1
+            raise LimiteRichiesteAI(
+                f"Troppe richieste AI da questa sessione: riprova tra {max(1, round(attesa))} secondi."
+            )
+
+    def preleva(self, secchio: Optional[SecchioGettoni]) -> None:
+        """
+        Consuma un gettone per una chiamata che non si può accorpare (es. lo
+        streaming); solleva LimiteRichiesteAI se il secchio è vuoto.
+        """
+        with self._lock:
+            self._preleva(secchio)
+            self.inoltrate += 1
+
+    def restituisci(self, secchio: Optional[SecchioGettoni]) -> None:
+        """
+        Rende il gettone prelevato con preleva() quando la chiamata fallisce
+        prima del primo frammento: il chiamante ripiega sulla chiamata
+        normale, che preleva il proprio.
+        """
+        if secchio is not None:
+            with self._lock:
+                secchio.restituisci()
+
+    def _partecipa(self, chiave: str, secchio: Optional[SecchioGettoni]) -> Tuple[Future, bool]:
+        """Il Future della richiesta `chiave` e True se tocca al chiamante eseguirla."""
+        with self._lock:
+            futuro = self._in_corso.get(chiave)
+            if futuro is not None:
+                self.accorpate += 1
+                return futuro, False
+            self._preleva(secchio)
+            futuro = self._in_corso[chiave] = Future()
+            # In esecuzione: chi attende non può annullarlo per tutti
+            futuro.set_running_or_notify_cancel()
+            self.inoltrate += 1
+            return futuro, True
+
+    def _concludi(self, chiave: str, futuro: Future, risultato=None,
+                  errore: Optional[BaseException] = None) -> None:
+        with self._lock:
+            del self._in_corso[chiave]
+        if errore is None:
+            futuro.set_result(risultato)
+        elif isinstance(errore, Exception):
+            futuro.set_exception(errore)
+        else:
+            # Interruzione di chi eseguiva (es. task cancellato): agli altri arriva un errore
+            futuro.set_exception(RuntimeError("richiesta AI interrotta"))
+
+    def esegui(self, chiave: str, calcola: Callable[[], str],
+               secchio: Optional[SecchioGettoni] = None) -> str:
+        """
+        Esegue `calcola()` o, se la stessa richiesta è già in corso, ne
+        attende il risultato (le eccezioni sono propagate a tutti).
+        """
+        futuro, esegue = self._partecipa(chiave, secchio)
+        if not esegue:
+            return futuro.result()
+        try:
+            risultato = calcola()
+        except BaseException as e:
+            self._concludi(chiave, futuro, errore=e)
+            raise
+        self._concludi(chiave, futuro, risultato)
+        return risultato
+
+    async def esegui_async(self, chiave: str, calcola: Callable[[], Awaitable[str]],
+                           secchio: Optional[SecchioGettoni] = None) -> str:
+        """Come esegui, per le coroutine: l'attesa non blocca l'event loop."""
+        futuro, esegue = self._partecipa(chiave, secchio)
+        if not esegue:
+            return await asyncio.wrap_future(futuro)
+        try:
+            risultato = await calcola()
+        except BaseException as e:
+            self._concludi(chiave, futuro, errore=e)
+            raise
+        self._concludi(chiave, futuro, risultato)
+        return risultato
+
+    def statistiche(self) -> dict:
+        with self._lock:
+            return {
+                "inoltrate": self.inoltrate,
+                "accorpate": self.accorpate,
+                "limitate": self.limitate,
+                "in_corso": len(self._in_corso),
+            }
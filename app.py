@@ -5,23 +5,38 @@ Versione: 4.1 (Fix scope variabili expander)
 """
 
 import streamlit as st
+from collections.abc import Callable
 from datetime import datetime, date
 from decimal import Decimal
 import io
+import logging
+import sqlite3
+import tempfile
 import time
-
-# Integrazione OpenAI
-from openai import OpenAI
+import typing
 
 # Import moduli locali
 from logic_engine import (
-    genera_testo_completo, 
     valida_dati, 
     calcola_importi, 
     formatta_importo,
     formatta_data
 )
-from document_generator import esporta_determina_rtf
+from importi import formatta_aliquota, riepilogo_iva
+from render_cache import CacheRender, hash_dati
+from document_generator import FORMATI, esporta_determina, genera_nome_file
+from archivio import PERCORSO_PREDEFINITO as PERCORSO_ARCHIVIO, ArchivioDetermine
+from accesso import ente_sessione, modulo_accesso
+from rotazione import IndiceRotazione
+from spesa import AggregatiSpesa
+from esportazione import scrivi_zip
+from cpv_index import indice_predefinito as indice_cpv
+from ai_cache import PERCORSO_PREDEFINITO as PERCORSO_CACHE_AI, CacheRisposteAI
+import pagina
+# openai e ai_helpers sono importati solo al primo uso di un pulsante AI
+# (l'import di openai costa più di quello di Streamlit)
+
+log = logging.getLogger("determinafacile")
 
 
 # =============================================================================
@@ -33,56 +48,176 @@ try:
 except (FileNotFoundError, KeyError):
     OPENAI_API_KEY = None
 
-client = None
-if OPENAI_API_KEY:
+
+@st.cache_resource
+def get_client_ai():
+    """
+    Client OpenAI condiviso dal processo, creato al primo uso (None senza
+    API Key): le connessioni keep-alive si riusano tra le esecuzioni dello
+    script e tra le sessioni.
+    """
+    if not OPENAI_API_KEY:
+        return None
     try:
-        client = OpenAI(api_key=OPENAI_API_KEY)
+        from ai_helpers import crea_client
+        return crea_client(OPENAI_API_KEY)
     except Exception as e:
-        print(f"Errore inizializzazione client AI: {e}")
+        log.warning("Errore inizializzazione client AI: %s", e)
+        return None
+
+
+@st.cache_resource
+def get_circuito_ai():
+    """Interruttore di circuito condiviso: con l'API in errore le funzioni AI rispondono subito."""
+    from ai_helpers import CircuitoAI
+    return CircuitoAI()
+
+
+@st.cache_resource
+def get_traffico_ai():
+    """Accorpamento delle richieste AI identiche in corso e contatori, per tutte le sessioni."""
+    from ai_traffico import TrafficoAI
+    return TrafficoAI()
 
 
 # =============================================================================
 # FUNZIONI AI (HELPER)
 # =============================================================================
 
+@st.cache_resource
+def get_cache_ai() -> CacheRisposteAI:
+    """
+    Cache delle risposte AI, solo in memoria: il file SQLite condiviso tra
+    le sessioni, che conserva le motivazioni fino alla scadenza, si attiva
+    con DETERMINAFACILE_AI_CACHE.
+    """
+    if not PERCORSO_CACHE_AI:
+        return CacheRisposteAI(percorso_db=None)
+    try:
+        return CacheRisposteAI(PERCORSO_CACHE_AI)
+    except (OSError, sqlite3.Error) as e:
+        log.warning("Cache AI su disco non disponibile, uso solo la memoria: %s", e)
+        return CacheRisposteAI(percorso_db=None)
+
+def _opzioni_ai():
+    """
+    Cache, circuito e traffico condivisi, più il secchio di gettoni della
+    sessione (limite di chiamate al modello), creato al primo uso.
+    """
+    if "secchio_ai" not in st.session_state:
+        st.session_state["secchio_ai"] = get_traffico_ai().secchio()
+    return {"cache": get_cache_ai(), "circuito": get_circuito_ai(),
+            "traffico": get_traffico_ai(), "secchio": st.session_state["secchio_ai"]}
+
+def _completamento_ai(funzione, prompt, etichetta, testo, temperatura):
+    """Chiamata al modello con cache delle risposte (gli errori non vengono memorizzati)."""
+    from ai_helpers import completamento
+    return completamento(get_client_ai(), funzione, prompt, etichetta, testo, temperatura, **_opzioni_ai())
+
+def _messaggio_errore_ai(e):
+    """Testo mostrato all'utente per un errore AI (circuito aperto e limite hanno già il loro messaggio)."""
+    from ai_helpers import CHIAMATE_RIFIUTATE
+    return str(e) if isinstance(e, CHIAMATE_RIFIUTATE) else f"Errore AI: {str(e)}"
+
 def riscrivi_motivazione_ai(testo_grezzo):
     """Trasforma testo informale in burocratese."""
+    if not get_client_ai(): return "Errore: API Key mancante."
+    from ai_helpers import PROMPT_MOTIVAZIONE
+    try:
+        return _completamento_ai("riscrivi_motivazione", PROMPT_MOTIVAZIONE, "Testo", testo_grezzo, 0.7)
+    except Exception as e: return _messaggio_errore_ai(e)
+
+def riscrivi_motivazione_ai_stream(testo_grezzo, area):
+    """
+    Come riscrivi_motivazione_ai ma mostra il testo in `area` man mano che
+    viene generato. Senza st.write_stream (Streamlit < 1.31), o se lo stream
+    fallisce prima del primo frammento, ripiega sulla chiamata normale
+    (non se la chiamata è stata rifiutata: circuito aperto o limite della
+    sessione).
+    """
+    client = get_client_ai()
     if not client: return "Errore: API Key mancante."
-    prompt = "Sei un esperto funzionario della P.A. Riscrivi il testo dell'utente in linguaggio amministrativo formale per la premessa di una Determina. Usa termini come 'preso atto', 'verificata', 'ritenuto'. Non aggiungere saluti."
+    if not hasattr(area, "write_stream"):
+        with st.spinner("AI al lavoro..."):
+            return riscrivi_motivazione_ai(testo_grezzo)
+    from ai_helpers import CHIAMATE_RIFIUTATE, riscrivi_motivazione_stream
+    ricevuti = []
+    def frammenti():
+        for frammento in riscrivi_motivazione_stream(client, testo_grezzo, **_opzioni_ai()):
+            ricevuti.append(frammento)
+            yield frammento
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "system", "content": prompt}, {"role": "user", "content": f"Testo: '{testo_grezzo}'"}],
-            temperature=0.7
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e: return f"Errore AI: {str(e)}"
+        testo = area.write_stream(frammenti())
+    except Exception as e:
+        if ricevuti or isinstance(e, CHIAMATE_RIFIUTATE): return _messaggio_errore_ai(e)
+        with st.spinner("AI al lavoro..."):
+            return riscrivi_motivazione_ai(testo_grezzo)
+    finally:
+        area.empty()
+    return testo.strip()
 
 def genera_oggetto_ai(testo_motivazione):
     """Sintetizza la motivazione in un Oggetto maiuscolo."""
-    if not client: return "Errore: API Key mancante."
-    prompt = "Sei un esperto amministrativo. Sintetizza il testo fornito in un OGGETTO DI DETERMINA. Regole: 1. Massimo 15 parole. 2. Tutto MAIUSCOLO. 3. Stile telegrafico. 4. Niente punto finale."
+    if not get_client_ai(): return "Errore: API Key mancante."
+    from ai_helpers import PROMPT_OGGETTO
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "system", "content": prompt}, {"role": "user", "content": f"Testo: '{testo_motivazione}'"}],
-            temperature=0.5
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e: return f"Errore AI: {str(e)}"
+        return _completamento_ai("genera_oggetto", PROMPT_OGGETTO, "Testo", testo_motivazione, 0.5)
+    except Exception as e: return _messaggio_errore_ai(e)
 
 def trova_cpv_ai(descrizione_oggetto):
     """Trova il codice CPV più probabile."""
-    if not client: return "Errore: API Key mancante."
-    prompt = "Identifica il codice CPV (Common Procurement Vocabulary) più idoneo per l'oggetto fornito. Restituisci SOLO il codice numerico e la descrizione sintetica."
+    if not get_client_ai(): return "Errore: API Key mancante."
+    from ai_helpers import PROMPT_CPV
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "system", "content": prompt}, {"role": "user", "content": f"Oggetto: '{descrizione_oggetto}'"}],
-            temperature=0.3
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e: return f"Errore AI: {str(e)}"
+        return _completamento_ai("trova_cpv", PROMPT_CPV, "Oggetto", descrizione_oggetto, 0.3)
+    except Exception as e: return _messaggio_errore_ai(e)
+
+def genera_oggetto_e_cpv_ai(testo_motivazione):
+    """Oggetto e CPV dalla motivazione, con le due chiamate in parallelo sul client condiviso."""
+    client = get_client_ai()
+    if not client: return ("Errore: API Key mancante.",) * 2
+    from ai_helpers import genera_oggetto_e_cpv
+    return genera_oggetto_e_cpv(client, testo_motivazione, **_opzioni_ai())
+
+
+# =============================================================================
+# CACHE DI RENDERING E ARCHIVIO (condivisi tra le sessioni del processo)
+# =============================================================================
+
+@st.cache_resource
+def get_cache_render() -> CacheRender:
+    return CacheRender(max_voci=256, max_bytes=64 * 1024 * 1024)
+
+
+@st.cache_resource
+def get_archivio():
+    """Archivio delle determine generate (None se disattivato)."""
+    return ArchivioDetermine(PERCORSO_ARCHIVIO) if PERCORSO_ARCHIVIO else None
+
+
+@st.cache_resource
+def get_indice_rotazione() -> IndiceRotazione:
+    """Affidamenti recenti per la verifica della rotazione, caricati una volta dall'archivio."""
+    archivio = get_archivio()
+    return IndiceRotazione.da_archivio(archivio) if archivio is not None else IndiceRotazione()
+
+
+# =============================================================================
+# OFFERTA SU PIÙ RIGHE
+# =============================================================================
+
+ALIQUOTE_IVA = [22, 10, 5, 4, 0]
+
+def righe_compilate(righe):
+    """Righe del data_editor che hanno un prezzo, senza le celle vuote (None/NaN)."""
+    if hasattr(righe, "to_dict"):
+        righe = righe.to_dict("records")
+    compilate = []
+    for riga in righe:
+        riga = {k: v for k, v in riga.items() if v is not None and v == v and v != ""}
+        if "prezzo_unitario" in riga:
+            compilate.append(riga)
+    return compilate
 
 
 # =============================================================================
@@ -101,201 +236,137 @@ st.set_page_config(
 )
 
 # CSS INIETTATO CON FORZATURA ESTREMA
-st.markdown("""
-<style>
-    /* ================= TEMA GLOBALE ================= */
-    .stApp {
-        background-color: #ffffff;
-    }
-
-    /* BARRA LATERALE (SIDEBAR) */
-    [data-testid="stSidebar"] {
-        background-color: #eef4f9 !important;
-        border-right: 2px solid #d0e0f0 !important;
-    }
-    /* Testi nella sidebar più grandi */
-    [data-testid="stSidebar"] .stMarkdown p, 
-    [data-testid="stSidebar"] .stTextInput label, 
-    [data-testid="stSidebar"] .stSelectbox label {
-        font-size: 1rem !important;
-        color: #003366 !important;
-    }
+st.markdown(pagina.CSS, unsafe_allow_html=True)
 
-    /* ================= FIX BORDI INPUT (Il trucco è qui) ================= */
-    /* Invece di colorare l'input interno, coloriamo il contenitore (wrapper) */
-    
-    div[data-baseweb="input"], div[data-baseweb="textarea"], div[data-baseweb="select"] > div {
-        border: 1px solid #003366 !important;
-        border-radius: 6px !important;
-        background-color: white !important;
-    }
-    
-    /* Rimuoviamo il bordo dall'input interno per evitare doppi bordi o glitch */
-    .stTextInput input, .stTextArea textarea {
-        border: none !important;
-        box-shadow: none !important;
-    }
 
-    /* Etichette (Labels) */
-    .stTextInput label, .stTextArea label, .stSelectbox label, .stNumberInput label, .stDateInput label, .stCheckbox label {
-        font-size: 1.05rem !important;
-        font-weight: 600 !important;
-        color: #003366 !important;
-    }
-
-    /* ================= COMPONENTI GRAFICI ================= */
-
-    /* HERO CONTAINER */
-    div.hero-container {
-        background-color: #003366 !important;
-        background-image: linear-gradient(180deg, #004080 0%, #003366 100%) !important;
-        color: white !important;
-        padding: 2.5rem 2rem;
-        border-radius: 10px;
-        text-align: center;
-        margin-bottom: 2rem;
-        box-shadow: 0 4px 10px rgba(0, 51, 102, 0.2);
-    }
-    h1.hero-title {
-        color: white !important;
-        font-family: 'Helvetica Neue', sans-serif;
-        font-weight: 800 !important;
-    }
-    p.hero-subtitle { color: #dceefb !important; font-size: 1.25rem !important; }
-
-    /* BADGE GRATIS */
-    div.free-badge {
-        background-color: #FFC107 !important;
-        color: #003366 !important;
-        padding: 8px 18px;
-        border-radius: 20px;
-        font-weight: 900;
-        font-size: 1rem !important;
-        display: inline-block;
-        margin-top: 15px;
-        box-shadow: 0 2px 5px rgba(0,0,0,0.2);
-    }
+# =============================================================================
+# HEADER & LANDING
+# =============================================================================
 
-    /* CARD VANTAGGI */
-    div.feature-card {
-        background-color: white !important;
-        padding: 1.5rem;
-        border-radius: 8px;
-        border: 1px solid #dae1e7;
-        text-align: center;
-        height: 100%;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.03);
-        transition: transform 0.2s;
-    }
-    div.feature-card:hover {
-        transform: translateY(-3px);
-        border-color: #003366 !important;
-    }
-    div.feature-title {
-        color: #003366 !important;
-        font-weight: 700;
-        margin-top: 10px;
-        font-size: 1.2rem !important;
-    }
-    div.feature-card p { font-size: 1rem !important; line-height: 1.5; }
-
-    /* PULSANTI STANDARD */
-    div.stButton > button:first-child {
-        background-color: #003366 !important;
-        color: white !important;
-        border: 1px solid #002244 !important;
-        font-weight: 600;
-        font-size: 1.1rem !important;
-        padding: 0.7rem 1rem !important;
-    }
-    div.stButton > button:first-child:hover {
-        background-color: #002244 !important;
-        color: #FFC107 !important;
-        border-color: #FFC107 !important;
-    }
+st.markdown(pagina.INTESTAZIONE, unsafe_allow_html=True)
 
-    /* BOX AI */
-    div.ai-box {
-        background-color: #eef6fc !important;
-        border-left: 5px solid #0055A4 !important;
-        padding: 15px;
-        border-radius: 4px;
-        margin-bottom: 15px;
-    }
+# VANTAGGI
+for colonna, scheda in zip(st.columns(3), pagina.SCHEDE_VANTAGGI):
+    with colonna:
+        st.markdown(scheda, unsafe_allow_html=True)
 
-    /* SEO BOX FOOTER */
-    div.seo-box {
-        background-color: #f9f9f9 !important;
-        padding: 2rem;
-        border-top: 3px solid #003366;
-        margin-top: 3rem;
-    }
-    div.seo-box h2 { color: #003366 !important; }
-    div.seo-box p, div.seo-box li { font-size: 1rem !important; line-height: 1.6; }
-
-    /* DISCLAIMER */
-    div.disclaimer-alert {
-        background-color: #fffde7 !important;
-        border-left: 6px solid #ffc107 !important;
-        padding: 1.2rem !important;
-        color: #333 !important;
-        font-size: 1rem !important;
-    }
-    
-    .stCaption { font-size: 0.95rem !important; color: #555 !important; }
-    div[data-testid="stExpander"] p { font-size: 1rem !important; }
-</style>
-""", unsafe_allow_html=True)
+if not OPENAI_API_KEY:
+    st.warning("⚠️ API Key non rilevata. Le funzioni 'Magic Writer' sono disabilitate.")
 
 
 # =============================================================================
-# HEADER & LANDING
+# SEZIONI DEL MODULO
 # =============================================================================
 
-st.markdown("""
-<div class="hero-container">
-    <h1 class="hero-title">DeterminaFacile</h1>
-    <p class="hero-subtitle">Crea la tua <strong>Determina di Affidamento Diretto</strong> (Art. 50) in 2 minuti.<br>Conforme al D.Lgs 36/2023, con assistenza AI.</p>
-    <div class="free-badge">✨ 100% GRATUITO & OPEN SOURCE</div>
-</div>
-""", unsafe_allow_html=True)
+# Ogni sezione è un frammento: un widget riesegue solo la propria sezione,
+# non l'intero script (CSS, intestazione, testi SEO, validazione). Con
+# Streamlit senza st.fragment (< 1.37) le sezioni sono normali funzioni.
+FRAMMENTI = hasattr(st, "fragment")
+frammento = st.fragment if FRAMMENTI else (lambda funzione: funzione)
 
-# VANTAGGI
-c1, c2, c3 = st.columns(3)
-with c1:
-    st.markdown("""
-    <div class="feature-card">
-        <div style="font-size: 2.5rem;">⚡</div>
-        <div class="feature-title">Più veloce di un Fac-simile</div>
-        <p>Non perdere tempo a cancellare dati vecchi da modelli Word obsoleti. Genera una determina pulita e pronta in pochi click.</p>
-    </div>
-    """, unsafe_allow_html=True)
-with c2:
-    st.markdown("""
-    <div class="feature-card">
-        <div style="font-size: 2.5rem;">⚖️</div>
-        <div class="feature-title">Conforme Art. 50 D.Lgs 36/2023</div>
-        <p>Include automaticamente le clausole per l'affidamento diretto sottosoglia e la deroga alla rotazione (Art. 49) per importi < 5.000€.</p>
-    </div>
-    """, unsafe_allow_html=True)
-with c3:
-    st.markdown("""
-    <div class="feature-card">
-        <div style="font-size: 2.5rem;">✨</div>
-        <div class="feature-title">AI Magic Writer</div>
-        <p>Non sai come scrivere la motivazione? L'Intelligenza Artificiale trasforma la tua idea in linguaggio amministrativo formale.</p>
-    </div>
-    """, unsafe_allow_html=True)
 
-if not OPENAI_API_KEY:
-    st.warning("⚠️ API Key non rilevata. Le funzioni 'Magic Writer' sono disabilitate.")
+def _download_differito() -> bool:
+    """True se download_button accetta una funzione (data=callable) eseguita solo al clic."""
+    try:
+        tipo = typing.get_type_hints(st.download_button)["data"]
+    except Exception:
+        return False
+    return any(typing.get_origin(t) is Callable for t in typing.get_args(tipo))
+
+
+DOWNLOAD_DIFFERITO = _download_differito()
+
+# Valori letti da altre sezioni: data, CPV e CIG per la rotazione
+# (sezione_fornitore); fornitore, CPV e RUP predefinito per la spesa
+# cumulata (sezione_economica)
+DIPENDENZE = {"data_atto", "codice_cpv", "cig", "piva_cf", "nome_responsabile"}
+
+
+def salva_sezione(nome: str, **valori) -> None:
+    """
+    Conserva gli ultimi valori dei widget di una sezione. Un frammento
+    riesegue solo la propria sezione: se cambia un valore letto da un'altra
+    sezione, o se è visibile il DOWNLOAD di dati ormai modificati, si
+    riesegue tutta la pagina.
+    """
+    sezioni = st.session_state.setdefault("sezioni", {})
+    precedenti = sezioni.get(nome)
+    sezioni[nome] = valori
+    if not FRAMMENTI or precedenti is None or precedenti == valori:
+        return
+    cambiati = {chiave for chiave, valore in valori.items() if precedenti.get(chiave) != valore}
+    if cambiati & DIPENDENZE or st.session_state.get("download_attivo"):
+        st.session_state["download_attivo"] = False
+        st.rerun(scope="app")
+
+
+def valori_modulo() -> dict:
+    """Valori di tutte le sezioni (per le sezioni che dipendono da altre e per la generazione)."""
+    valori = {}
+    for sezione in st.session_state.get("sezioni", {}).values():
+        valori.update(sezione)
+    return valori
+
+
+def alle_zero(giorno):
+    return datetime.combine(giorno, datetime.min.time()) if giorno else None
+
+
+def dati_determina(v: dict) -> dict:
+    """Dizionario `dati` per logic_engine, costruito solo quando si genera."""
+    imponibile = v["imponibile"]
+    return {
+        "comune": v["comune"], "provincia": v["provincia"], "area_settore": v["area_settore"],
+        "nome_responsabile": v["nome_responsabile"], "titolo_responsabile": v["titolo_responsabile"],
+        "qualifica_responsabile": v["qualifica_responsabile"], "decreto_funzioni": v["decreto_funzioni"],
+        "regolamento_comunale": v["regolamento_comunale"],
+        "num_determina_generale": v["num_determina_generale"], "num_determina_settore": v["num_determina_settore"],
+        "data_atto": alle_zero(v["data_atto"]),
+        "oggetto": v["oggetto"], "motivazione": v["motivazione"], "finalita": v["finalita"], "durata_servizio": v["durata_servizio"],
+        "ragione_sociale": v["ragione_sociale"], "indirizzo": v["indirizzo"], "cap": v["cap"], "citta": v["citta"],
+        "provincia_fornitore": v["provincia_fornitore"], "piva_cf": v["piva_cf"], "tipo_documento": v["tipo_documento"],
+        "numero_preventivo": v["numero_preventivo"],
+        "data_preventivo": alle_zero(v["data_preventivo"]),
+        "criterio_scelta": v["criterio_scelta"], "operatore_uscente": v["operatore_uscente"],
+        "imponibile": imponibile, "aliquota_iva": v["aliquota_iva"], "righe_offerta": v["righe_offerta"] or None, "cig": v["cig"],
+        "capitolo_bilancio": v["capitolo_bilancio"], "esercizio_finanziario": v["esercizio_finanziario"],
+        "rup_nome": v["rup_nome"], "rup_cognome": "", "rup_qualifica": v["qualifica_responsabile"],
+        "importo_sotto_5000": imponibile < 5000,
+        "usa_mepa": v["usa_mepa"], "piccola_fornitura": v["piccola_fornitura"],
+        # === NUOVI CAMPI: DELIBERE BILANCIO ===
+        "dup_num": v["dup_num"],
+        "dup_data": alle_zero(v["dup_data"]),
+        "dup_periodo": v["dup_periodo"],
+        "nota_dup_num": v["nota_dup_num"],
+        "nota_dup_data": alle_zero(v["nota_dup_data"]),
+        "bilancio_num": v["bilancio_num"],
+        "bilancio_data": alle_zero(v["bilancio_data"]),
+        "bilancio_triennio": v["bilancio_triennio"],
+        "peg_num": v["peg_num"],
+        "peg_data": alle_zero(v["peg_data"]),
+        "peg_periodo": v["peg_periodo"],
+        # === NUOVI CAMPI: DURC ===
+        "durc_protocollo": v["durc_protocollo"],
+        "durc_esito": v["durc_esito"],
+        "durc_scadenza": alle_zero(v["durc_scadenza"]),
+        # === NUOVI CAMPI: VISTO REGOLARITA' CONTABILE ===
+        "visto_nome": v["visto_nome"],
+        "visto_qualifica": v["visto_qualifica"],
+        "includi_visto": v["includi_visto"],
+        # === NUOVI CAMPI: RICORSI E TRASPARENZA ===
+        "tar_competente": v["tar_competente"],
+        "includi_ricorsi": v["includi_ricorsi"],
+        "includi_conflitto": v["includi_conflitto"],
+        "codice_cpv": v["codice_cpv"]
+    }
 
 
 # =============================================================================
 # SIDEBAR
 # =============================================================================
 
-with st.sidebar:
+@frammento
+def sezione_ente():
     st.header("🏛️ Dati Ente")
     comune = st.text_input("Ente", placeholder="es. Comune di Milano")
     provincia = st.text_input("Provincia", placeholder="MI")
@@ -308,20 +379,39 @@ with st.sidebar:
     st.markdown("---")
     usa_regolamento = st.checkbox("Cita Regolamento")
     regolamento_riferimento = st.text_input("Estremi Regolamento") if usa_regolamento else ""
+    salva_sezione(
+        "ente", comune=comune, provincia=provincia, titolo_responsabile=titolo_responsabile,
+        nome_responsabile=nome_responsabile, qualifica_responsabile=qualifica_responsabile,
+        decreto_funzioni=decreto_funzioni,
+        regolamento_comunale=regolamento_riferimento if usa_regolamento else None,
+    )
+
+
+with st.sidebar:
+    sezione_ente()
     st.markdown("---")
+    if get_archivio() is not None:
+        modulo_accesso()
+        st.markdown("---")
     st.caption("ℹ️ Licenza: **Open Source (Gratis)**")
+    if OPENAI_API_KEY:
+        with st.expander("📊 Uso AI (tutte le sessioni)"):
+            traffico = get_traffico_ai().statistiche()
+            cache = get_cache_ai().statistiche()
+            st.caption(
+                f"Chiamate al modello: **{traffico['inoltrate']}** · "
+                f"accorpate: **{traffico['accorpate']}** · "
+                f"limitate: **{traffico['limitate']}** · "
+                f"risposte dalla cache: **{cache['hit_memoria'] + cache['hit_disco']}**"
+            )
 
 
 # =============================================================================
 # FORM PRINCIPALE
 # =============================================================================
 
-st.markdown("---")
-st.markdown("### 🛠️ Compila la tua Determina")
-
-col_left, col_right = st.columns([2, 1])
-
-with col_left:
+@frammento
+def sezione_oggetto():
     st.markdown("#### 1. Oggetto e Motivazione")
     
     # --- BOX AI 1: MOTIVAZIONE ---
@@ -330,11 +420,11 @@ with col_left:
     col_in_ai, col_btn_ai = st.columns([3,1])
     with col_in_ai:
         input_motivazione_grezza = st.text_input("Cosa devi acquistare?", placeholder="es. servono pc nuovi...", label_visibility="collapsed")
+        anteprima_ai = st.empty()
     with col_btn_ai:
         if st.button("🪄 Riscrivi", use_container_width=True):
-            with st.spinner("AI al lavoro..."):
-                testo_formale = riscrivi_motivazione_ai(input_motivazione_grezza)
-                st.session_state['motivazione_ai'] = testo_formale
+            testo_formale = riscrivi_motivazione_ai_stream(input_motivazione_grezza, anteprima_ai)
+            st.session_state['motivazione_ai'] = testo_formale
     st.markdown('</div>', unsafe_allow_html=True)
 
     motivazione = st.text_area("Motivazione (Narrativa)", value=st.session_state.get('motivazione_ai', ""), height=120)
@@ -349,6 +439,14 @@ with col_left:
                     ogg_ai = genera_oggetto_ai(motivazione)
                     st.session_state['oggetto_ai'] = ogg_ai
             else: st.warning("Scrivi prima la motivazione!")
+        if st.button("✨ Oggetto + CPV", help="Genera oggetto e codice CPV in parallelo"):
+            if not get_client_ai(): st.warning("Errore: API Key mancante.")
+            elif motivazione and len(motivazione) > 10:
+                with st.spinner("Sintesi e ricerca CPV..."):
+                    ogg_ai, cpv_ai = genera_oggetto_e_cpv_ai(motivazione)
+                    st.session_state['oggetto_ai'] = ogg_ai
+                    st.session_state['cpv_ai'] = cpv_ai
+            else: st.warning("Scrivi prima la motivazione!")
     
     oggetto = st.text_area("Testo Oggetto (Maiuscolo)", value=st.session_state.get('oggetto_ai', ""), height=70, label_visibility="collapsed")
     
@@ -359,13 +457,28 @@ with col_left:
     with col_cpv_btn:
         st.write("")
         st.write("")
-        if st.button("🔍 Trova CPV"):
-            txt = oggetto if oggetto else motivazione
+        txt = oggetto if oggetto else motivazione
+        if st.button("🔍 Trova CPV", help="Cerca nel vocabolario CPV (senza AI)"):
+            if txt:
+                candidati = indice_cpv().cerca(txt)
+                st.session_state['cpv_candidati'] = [str(c) for c in candidati]
+                if candidati: st.session_state['cpv_ai'] = str(candidati[0])
+                else: st.info("Nessun codice trovato nel vocabolario: prova con l'AI.")
+            else: st.warning("Serve Oggetto o Motivazione")
+        if OPENAI_API_KEY and st.button("🤖 CPV con AI", help="Chiede il codice CPV al modello"):
             if txt:
                 with st.spinner("Ricerca..."):
                     st.session_state['cpv_ai'] = trova_cpv_ai(txt)
             else: st.warning("Serve Oggetto o Motivazione")
+    if st.session_state.get('cpv_candidati'):
+        def _scegli_cpv():
+            st.session_state['cpv_ai'] = st.session_state['cpv_scelto']
+        st.selectbox("Altri codici dal vocabolario CPV", st.session_state['cpv_candidati'], key='cpv_scelto', on_change=_scegli_cpv)
+    salva_sezione("oggetto", motivazione=motivazione, oggetto=oggetto, codice_cpv=codice_cpv)
+
 
+@frammento
+def sezione_amministrativa():
     st.markdown("#### 2. Dati Amministrativi")
     c1, c2, c3 = st.columns(3)
     with c1: num_determina_settore = st.text_input("N. Det. Settore")
@@ -401,9 +514,40 @@ with col_left:
     with peg1: peg_num = st.text_input("N. Delibera G.C. (PEG)", placeholder="es. 112")
     with peg2: peg_data = st.date_input("Data Delibera PEG", value=None, key="peg_data")
     peg_periodo = st.text_input("Periodo PEG", placeholder="es. 2025/2027")
-
+    salva_sezione(
+        "amministrativa", num_determina_settore=num_determina_settore,
+        num_determina_generale=num_determina_generale, data_atto=data_atto, area_settore=area_settore,
+        finalita=finalita, durata_servizio=durata_servizio,
+        dup_num=dup_num, dup_data=dup_data, dup_periodo=dup_periodo,
+        nota_dup_num=nota_dup_num, nota_dup_data=nota_dup_data,
+        bilancio_num=bilancio_num, bilancio_data=bilancio_data, bilancio_triennio=bilancio_triennio,
+        peg_num=peg_num, peg_data=peg_data, peg_periodo=peg_periodo,
+    )
+
+
+@frammento
+def sezione_fornitore():
+    v = valori_modulo()
     st.markdown("#### 3. Fornitore")
     ragione_sociale = st.text_input("Ragione Sociale")
+    piva_cf = st.text_input("P.IVA / CF")
+    
+    # Principio di rotazione: affidamenti precedenti allo stesso operatore
+    # negli atti archiviati dall'ente (escluse le bozze di questa sessione e
+    # quelle con lo stesso CIG)
+    ente = ente_sessione()
+    rotazione = get_indice_rotazione().verifica(
+        ente or "", piva_cf, v.get("codice_cpv", ""), v.get("data_atto") or date.today(),
+        cig=st.session_state.get("cig_atto", ""),
+        escludi=st.session_state.get("atti_archiviati", ()),
+    )
+    if rotazione.operatore_uscente:
+        ultimo = rotazione.precedenti[0]
+        ambito = f"nella categoria CPV {rotazione.categoria}" if rotazione.categoria_verificata else "(CPV non indicato: tutte le categorie)"
+        st.info(
+            f"🔁 Operatore già affidatario dell'ente {ambito}: {len(rotazione.precedenti)} atti "
+            f"dal {rotazione.dal:%d/%m/%Y}, l'ultimo del {ultimo.data_atto:%d/%m/%Y} ({ultimo.oggetto[:80]})."
+        )
     sel1, sel2 = st.columns(2)
     with sel1:
         criterio_scelta = st.selectbox("Criterio Scelta", [
@@ -413,14 +557,15 @@ with col_left:
             "continuità operativa",
             "affidabilità pregressa"
         ])
-    with sel2: operatore_uscente = st.checkbox("È gestore uscente?")
+    with sel2: operatore_uscente = st.checkbox("È gestore uscente?", value=rotazione.operatore_uscente)
+    if rotazione.deroga_mancante(operatore_uscente):
+        st.warning("Operatore uscente non dichiarato: la determina non conterrà la motivazione della deroga al principio di rotazione (art. 49 D.Lgs. 36/2023).")
     
     indirizzo = st.text_input("Indirizzo")
     cc1, cc2, cc3 = st.columns([1,2,1])
     with cc1: cap = st.text_input("CAP", max_chars=5)
     with cc2: citta = st.text_input("Città")
     with cc3: provincia_forn = st.text_input("PR", max_chars=2)
-    piva_cf = st.text_input("P.IVA / CF")
     
     # === NUOVA SEZIONE: DURC ===
     st.markdown("**DURC - Documento Unico Regolarità Contributiva**")
@@ -434,26 +579,78 @@ with col_left:
     with p1: tipo_doc = st.selectbox("Tipo", ["preventivo", "offerta"])
     with p2: num_prev = st.text_input("N. Doc")
     with p3: data_prev = st.date_input("Data Doc")
-
+    salva_sezione(
+        "fornitore", ragione_sociale=ragione_sociale, piva_cf=piva_cf, criterio_scelta=criterio_scelta,
+        operatore_uscente=operatore_uscente, indirizzo=indirizzo, cap=cap, citta=citta,
+        provincia_fornitore=provincia_forn, durc_protocollo=durc_protocollo, durc_esito=durc_esito,
+        durc_scadenza=durc_scadenza, tipo_documento=tipo_doc, numero_preventivo=num_prev,
+        data_preventivo=data_prev,
+    )
+
+
+@frammento
+def sezione_economica():
+    v = valori_modulo()
     st.markdown("#### 4. Economico")
     e1, e2 = st.columns(2)
     with e1: imponibile = st.number_input("Imponibile €", step=100.00)
-    with e2: iva = st.selectbox("IVA %", [22, 10, 5, 4, 0])
+    with e2: iva = st.selectbox("IVA %", ALIQUOTE_IVA)
     
-    if imponibile > 0:
+    with st.expander("🧾 Offerta su più righe (IVA per aliquota)"):
+        st.caption("Se compilate, le righe sostituiscono imponibile e IVA indicati sopra.")
+        righe_editor = st.data_editor(
+            [{"descrizione": "", "quantita": 1.0, "prezzo_unitario": None, "aliquota_iva": 22}],
+            num_rows="dynamic", use_container_width=True, key="editor_righe_offerta",
+            column_config={
+                "descrizione": st.column_config.TextColumn("Descrizione"),
+                "quantita": st.column_config.NumberColumn("Quantità", min_value=0, default=1.0),
+                "prezzo_unitario": st.column_config.NumberColumn("Prezzo unitario €", format="%.2f"),
+                "aliquota_iva": st.column_config.SelectboxColumn("IVA %", options=ALIQUOTE_IVA, default=22),
+            },
+        )
+    righe_offerta = righe_compilate(righe_editor)
+    
+    if righe_offerta:
+        riepilogo = riepilogo_iva(righe_offerta)
+        imponibile = float(riepilogo["imponibile"])
+        st.info(f"Imponibile: **{formatta_importo(riepilogo['imponibile'])}** · Totale: **{formatta_importo(riepilogo['totale'])}**")
+        st.caption(" · ".join(
+            f"IVA {formatta_aliquota(voce['aliquota'])}%: {formatta_importo(voce['iva'])} su {formatta_importo(voce['imponibile'])}"
+            for voce in riepilogo["per_aliquota"]
+        ))
+    elif imponibile > 0:
         tot = calcola_importi(imponibile, iva)
         st.info(f"Totale: **{formatta_importo(tot['totale'])}**")
         
-    cig = st.text_input("CIG (SmartCIG)")
+    cig = st.text_input("CIG (SmartCIG)", key="cig_atto")
     capitolo = st.text_input("Capitolo Bilancio")
     esercizio = st.number_input("Anno", value=2025)
-    rup = st.text_input("RUP (Se diverso)", value=nome_responsabile)
+    
+    # Frazionamento: spesa già impegnata nell'esercizio con lo stesso
+    # fornitore, nella stessa categoria CPV e sullo stesso capitolo, negli
+    # atti archiviati dall'ente
+    archivio, ente = get_archivio(), ente_sessione()
+    if archivio is not None and ente and imponibile > 0:
+        for avviso in AggregatiSpesa(archivio).avvisi(
+            ente, esercizio, imponibile, v.get("piva_cf", ""),
+            v.get("codice_cpv", ""), capitolo, cig=cig,
+        ):
+            st.warning(avviso.messaggio)
+    rup = st.text_input("RUP (Se diverso)", value=v.get("nome_responsabile", ""))
     
     st.markdown("#### 5. Opzioni")
     o1, o2 = st.columns(2)
     with o1: mepa = st.checkbox("Acquisto su MEPA", value=(imponibile>=5000))
     with o2: no_garanzia = st.checkbox("Esenzione Garanzia (Art. 53)", value=True)
-    
+    salva_sezione(
+        "economica", imponibile=imponibile, aliquota_iva=iva, righe_offerta=righe_offerta, cig=cig,
+        capitolo_bilancio=capitolo, esercizio_finanziario=esercizio, rup_nome=rup,
+        usa_mepa=mepa, piccola_fornitura=no_garanzia,
+    )
+
+
+@frammento
+def sezione_trasparenza():
     # === NUOVA SEZIONE: VISTO REGOLARITA' CONTABILE ===
     st.markdown("#### 6. Visto Regolarità Contabile")
     st.caption("Dati per il visto di regolarità contabile ex art. 183 c.7 D.Lgs. 267/2000")
@@ -467,117 +664,144 @@ with col_left:
     tar_competente = st.text_input("TAR Competente", placeholder="es. TAR Marche")
     includi_ricorsi = st.checkbox("Includi sezione ricorsi nel documento", value=True)
     includi_conflitto = st.checkbox("Includi attestazione conflitto interessi", value=True)
+    salva_sezione(
+        "trasparenza", visto_nome=visto_nome, visto_qualifica=visto_qualifica, includi_visto=includi_visto,
+        tar_competente=tar_competente, includi_ricorsi=includi_ricorsi, includi_conflitto=includi_conflitto,
+    )
+
+
+st.markdown("---")
+st.markdown("### 🛠️ Compila la tua Determina")
+
+col_left, col_right = st.columns([2, 1])
+
+with col_left:
+    sezione_oggetto()
+    sezione_amministrativa()
+    sezione_fornitore()
+    sezione_economica()
+    sezione_trasparenza()
 
 
 # =============================================================================
 # COLONNA DESTRA (AZIONI)
 # =============================================================================
 
+def documento_differito(dati_form: dict, formato: str):
+    """
+    Funzione senza argomenti per download_button: genera il documento,
+    lo registra nell'archivio dell'ente (solo dopo l'accesso con il codice
+    ente) e ne restituisce i byte. Streamlit la esegue al clic, fuori dallo
+    script: cache, archivio ed ente sono letti qui, e gli errori finiscono
+    nel log e in `problemi_download`, mostrati da pannello_genera.
+    """
+    cache, archivio, indice = get_cache_render(), get_archivio(), get_indice_rotazione()
+    archiviati = st.session_state.setdefault("atti_archiviati", set())
+    problemi = st.session_state.setdefault("problemi_download", [])
+    ente = ente_sessione()
+
+    def genera() -> bytes:
+        try:
+            documento = cache.genera(dati_form)
+            if archivio is not None and ente:
+                try:
+                    id_atto = archivio.archivia(dati_form, documento, ente=ente)
+                    indice.registra(id_atto, dict(dati_form, comune=ente))
+                    archiviati.add(id_atto)
+                except sqlite3.Error as e:
+                    log.exception("Archiviazione non riuscita (CIG %s)", dati_form.get("cig"))
+                    problemi.append(f"La determina (CIG {dati_form.get('cig')}) è stata scaricata "
+                                    f"ma non archiviata: {e}")
+            if formato == "rtf":
+                return documento.rtf
+            return esporta_determina(dati_form, documento.premesse, documento.dispositivo, formato)[0]
+        except Exception as e:
+            log.exception("Generazione non riuscita (CIG %s)", dati_form.get("cig"))
+            problemi.append(f"Generazione della determina (CIG {dati_form.get('cig')}) non riuscita: {e}")
+            raise
+    return genera
+
+
+@frammento
+def pannello_genera():
+    # I dati si leggono e si validano solo all'invio; il DOWNLOAD resta
+    # visibile finché non cambiano (vedi salva_sezione)
+    st.session_state["download_attivo"] = False
+    with st.form("genera_determina"):
+        formato = st.radio("Formato", list(FORMATI), format_func=str.upper, horizontal=True)
+        inviato = st.form_submit_button("GENERA DETERMINA", type="primary")
+    if inviato:
+        dati_form = dati_determina(valori_modulo())
+        valido, errori = valida_dati(dati_form)
+        if valido:
+            # Per lo ZIP di fine sessione bastano i dati: i documenti si rigenerano
+            st.session_state.setdefault("determine_sessione", {})[hash_dati(dati_form)] = dati_form
+            _, estensione, mime = FORMATI[formato]
+            nome_file = f"{genera_nome_file(dati_form)}.{estensione}"
+            genera = documento_differito(dati_form, formato)
+            if DOWNLOAD_DIFFERITO:
+                st.download_button("📥 DOWNLOAD", data=genera, file_name=nome_file, mime=mime, on_click="ignore")
+                st.session_state["download_attivo"] = True
+                st.balloons()
+            else:
+                try:
+                    st.download_button("📥 DOWNLOAD", data=genera(), file_name=nome_file, mime=mime)
+                    st.session_state["download_attivo"] = True
+                    st.balloons()
+                except Exception: pass  # mostrato sotto, da problemi_download
+        else:
+            st.warning("Compila i campi obbligatori.")
+            if errori: st.caption(f"Mancano: {', '.join(errori)}")
+
+    # Errori di generazione e archiviazione dei download precedenti
+    problemi = st.session_state.get("problemi_download")
+    while problemi:
+        st.error(problemi.pop(0))
+
+    # Tutte le determine scaricate nella sessione in un unico ZIP, con l'elenco CSV
+    determine_sessione = st.session_state.get("determine_sessione")
+    if determine_sessione:
+        with st.expander(f"📦 Determine della sessione ({len(determine_sessione)})"):
+            st.caption("Un unico ZIP con tutti gli atti nel formato scelto e l'elenco CSV (file, CIG, fornitore, importi).")
+            z1, z2 = st.columns(2)
+            with z1:
+                if st.button("Prepara ZIP", key="prepara_zip"):
+                    # I documenti sono scritti uno alla volta in un file temporaneo su disco;
+                    # in memoria resta solo lo ZIP compresso, e il file si chiude subito
+                    with tempfile.TemporaryFile() as file_zip:
+                        elenco = scrivi_zip(determine_sessione.values(), file_zip, formato)
+                        file_zip.seek(0)
+                        contenuto_zip = file_zip.read()
+                    st.download_button(
+                        "📥 DOWNLOAD ZIP", data=contenuto_zip, mime="application/zip",
+                        file_name=f"determine_{datetime.now():%Y%m%d_%H%M}.zip",
+                    )
+                    scartati = [riga for riga in elenco if riga["errore"]]
+                    if scartati:
+                        st.caption(f"Atti non generati: {len(scartati)} (vedi elenco CSV).")
+            with z2:
+                if st.button("Svuota elenco", key="svuota_zip"):
+                    st.session_state["determine_sessione"] = {}
+                    st.rerun()
+
+
 with col_right:
     st.markdown("### 🚀 Genera")
-    
-    dati_form = {
-        "comune": comune, "provincia": provincia, "area_settore": area_settore,
-        "nome_responsabile": nome_responsabile, "titolo_responsabile": titolo_responsabile,
-        "qualifica_responsabile": qualifica_responsabile, "decreto_funzioni": decreto_funzioni,
-        "regolamento_comunale": regolamento_riferimento if usa_regolamento else None,
-        "num_determina_generale": num_determina_generale, "num_determina_settore": num_determina_settore,
-        "data_atto": datetime.combine(data_atto, datetime.min.time()),
-        "oggetto": oggetto, "motivazione": motivazione, "finalita": finalita, "durata_servizio": durata_servizio,
-        "ragione_sociale": ragione_sociale, "indirizzo": indirizzo, "cap": cap, "citta": citta,
-        "provincia_fornitore": provincia_forn, "piva_cf": piva_cf, "tipo_documento": tipo_doc,
-        "numero_preventivo": num_prev, 
-        "data_preventivo": datetime.combine(data_prev, datetime.min.time()),
-        "criterio_scelta": criterio_scelta, "operatore_uscente": operatore_uscente,
-        "imponibile": imponibile, "aliquota_iva": iva, "cig": cig,
-        "capitolo_bilancio": capitolo, "esercizio_finanziario": esercizio,
-        "rup_nome": rup, "rup_cognome": "", "rup_qualifica": qualifica_responsabile,
-        "importo_sotto_5000": imponibile < 5000,
-        "usa_mepa": mepa, "piccola_fornitura": no_garanzia,
-        # === NUOVI CAMPI: DELIBERE BILANCIO ===
-        "dup_num": dup_num, 
-        "dup_data": datetime.combine(dup_data, datetime.min.time()) if dup_data else None,
-        "dup_periodo": dup_periodo,
-        "nota_dup_num": nota_dup_num,
-        "nota_dup_data": datetime.combine(nota_dup_data, datetime.min.time()) if nota_dup_data else None,
-        "bilancio_num": bilancio_num,
-        "bilancio_data": datetime.combine(bilancio_data, datetime.min.time()) if bilancio_data else None,
-        "bilancio_triennio": bilancio_triennio,
-        "peg_num": peg_num,
-        "peg_data": datetime.combine(peg_data, datetime.min.time()) if peg_data else None,
-        "peg_periodo": peg_periodo,
-        # === NUOVI CAMPI: DURC ===
-        "durc_protocollo": durc_protocollo,
-        "durc_esito": durc_esito,
-        "durc_scadenza": datetime.combine(durc_scadenza, datetime.min.time()) if durc_scadenza else None,
-        # === NUOVI CAMPI: VISTO REGOLARITA' CONTABILE ===
-        "visto_nome": visto_nome,
-        "visto_qualifica": visto_qualifica,
-        "includi_visto": includi_visto,
-        # === NUOVI CAMPI: RICORSI E TRASPARENZA ===
-        "tar_competente": tar_competente,
-        "includi_ricorsi": includi_ricorsi,
-        "includi_conflitto": includi_conflitto
-    }
-    
-    valido, errori = valida_dati(dati_form)
-    
-    if valido:
-        if st.button("SCARICA DETERMINA (.RTF)", type="primary"):
-            try:
-                p, d = genera_testo_completo(dati_form)
-                if codice_cpv: p += f"\nVISTO il codice CPV individuato: {codice_cpv};\n"
-                rtf_data, nome_file = esporta_determina_rtf(dati_form, p, d)
-                st.download_button("📥 DOWNLOAD", data=rtf_data.encode('cp1252', errors='replace'), file_name=nome_file, mime="application/rtf")
-                st.balloons()
-            except Exception as e: st.error(str(e))
-    else:
-        st.warning("Compila i campi obbligatori.")
-        if errori: st.caption(f"Mancano: {', '.join(errori)}")
+    pannello_genera()
 
     st.markdown("---")
-    st.markdown("""
-    <div class="disclaimer-alert">
-    <strong>⚠️ DISCLAIMER LEGALE</strong><br>
-    Questo strumento genera bozze di atti amministrativi. L'utente (RUP/Istruttore) è l'unico responsabile della verifica di correttezza formale, sostanziale e contabile prima della sottoscrizione.
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(pagina.DISCLAIMER, unsafe_allow_html=True)
 
 
 # =============================================================================
 # SEZIONE SEO & FOOTER
 # =============================================================================
 
-st.markdown("""
-<div class="seo-box">
-<h2>Domande Frequenti su DeterminaFacile</h2>
-
-<h3>Cerchi un Fac-simile di Determina Aggiornato al 2025?</h3>
-<p>Molti RUP cercano <em>modelli Word statici</em> che rischiano di avere riferimenti normativi vecchi. DeterminaFacile non è un semplice fac-simile, ma un <strong>generatore intelligente gratuito</strong> che compila per te l'atto citando correttamente il <strong>Nuovo Codice Appalti (D.Lgs 36/2023)</strong>.</p>
-
-<h3>È davvero gratuito?</h3>
-<p>Sì. DeterminaFacile è un progetto <strong>Open Source</strong> senza fini di lucro, nato per semplificare la burocrazia. Non ci sono costi nascosti né abbonamenti.</p>
-
-<h3>Come gestire l'Affidamento Diretto Sottosoglia (Art. 50)?</h3>
-<p>Il software crea automaticamente la struttura per gli affidamenti diretti di servizi e forniture sotto i 140.000€, inserendo le clausole corrette per l'<strong>Art. 50 comma 1 lett. b)</strong>.</p>
-</div>
-""", unsafe_allow_html=True)
+st.markdown(pagina.DOMANDE_FREQUENTI, unsafe_allow_html=True)
 
 st.markdown("---")
 
 with st.expander("⚖️ Note Legali, Privacy Policy e Cookie"):
-    st.markdown("""
-    ### 1. Termini e Condizioni
-    L'applicazione "DeterminaFacile" è fornita "così com'è" (as-is). L'autore non si assume responsabilità per errori o omissioni negli atti generati.
-    ### 2. Privacy Policy AI
-    I dati inseriti nei campi assistiti dall'Intelligenza Artificiale vengono elaborati da OpenAI. **NON inserire dati personali** (nomi di persone fisiche, dati sanitari) nei prompt dell'AI.
-    Tutti i dati inseriti nel modulo vengono cancellati al termine della sessione (chiusura pagina).
-    ### 3. Cookie Policy
-    Questo sito utilizza esclusivamente **Cookie Tecnici** necessari al funzionamento. Non viene effettuata profilazione pubblicitaria.
-    """)
-
-st.markdown("""
-<div style="text-align: center; margin-top: 2rem; color: #888; font-size: 0.8rem;">
-    <p><strong>DeterminaFacile.it</strong> © 2025 - Piattaforma Open Source per la P.A.</p>
-</div>
-""", unsafe_allow_html=True)
+    st.markdown(pagina.NOTE_LEGALI)
+
+st.markdown(pagina.PIE_DI_PAGINA, unsafe_allow_html=True)
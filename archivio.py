@@ -0,0 +1,518 @@
+"""
+DETERMINAFACILE - Archivio Determine v1.0
+Archivio locale (SQLite) delle determine generate, per ritrovare un atto
+dopo la fine della sessione: "l'affidamento al fornitore X di marzo".
+- Colonne strutturate e indicizzate: ente, CIG, P.IVA/CF, ragione sociale,
+  capitolo, esercizio, importi (in centesimi) e data dell'atto
+- Indice full-text FTS5 su oggetto, motivazione e testo completo: parole
+  intere (o prefissi, con 'parola*') senza distinzione di maiuscole e accenti
+- RTF conservato compresso, per riscaricare l'atto così come è stato emesso
+- Spesa cumulata per ente ed esercizio (fornitore, categoria CPV, capitolo)
+  mantenuta dai trigger a ogni atto, per i controlli sul frazionamento
+Una determina generata più volte con gli stessi dati è archiviata una volta
+sola (chiave: hash canonico dei dati, come in render_cache, e dell'ente).
+
+L'archivio è disattivato finché DETERMINAFACILE_ARCHIVIO non indica il file
+SQLite. Ogni atto appartiene all'ente che lo ha archiviato: l'app passa
+l'ente riconosciuto dal codice di accesso (accesso.py, ente_autorizzato)
+e legge solo i suoi atti.
+"""
+
+import hashlib
+import hmac
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from importi import da_centesimi, in_centesimi
+from logic_engine import contesto
+from render_cache import DeterminaGenerata, hash_dati
+from rotazione import categoria_cpv
+
+
+# File dell'archivio; vuoto (predefinito) = archivio disattivato
+PERCORSO_PREDEFINITO = os.environ.get("DETERMINAFACILE_ARCHIVIO", "")
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS atti ("
+    " id INTEGER PRIMARY KEY,"
+    " hash TEXT NOT NULL UNIQUE,"
+    " ente TEXT NOT NULL,"
+    " cig TEXT NOT NULL,"
+    " piva_cf TEXT NOT NULL,"
+    " ragione_sociale TEXT NOT NULL,"
+    " capitolo TEXT NOT NULL,"
+    " esercizio TEXT NOT NULL,"
+    " imponibile INTEGER NOT NULL,"
+    " totale INTEGER NOT NULL,"
+    " data_atto TEXT,"
+    " oggetto TEXT NOT NULL,"
+    " motivazione TEXT NOT NULL,"
+    " testo TEXT NOT NULL,"
+    " nome_file TEXT NOT NULL,"
+    " rtf BLOB,"
+    " archiviato REAL NOT NULL,"
+    " codice_cpv TEXT NOT NULL DEFAULT '',"
+    " categoria_cpv TEXT NOT NULL DEFAULT '',"
+    " corrente INTEGER NOT NULL DEFAULT 1)",
+    # Indici per le ricerche tipiche: per fornitore, per CIG, per ente e
+    # bilancio; la data in coda permette l'ordinamento senza sort
+    "CREATE INDEX IF NOT EXISTS idx_atti_piva ON atti(piva_cf, data_atto)",
+    "CREATE INDEX IF NOT EXISTS idx_atti_cig ON atti(cig, ente)",
+    "CREATE INDEX IF NOT EXISTS idx_atti_ragione ON atti(ragione_sociale COLLATE NOCASE, data_atto)",
+    "CREATE INDEX IF NOT EXISTS idx_atti_ente ON atti(ente COLLATE NOCASE, esercizio, capitolo, data_atto)",
+    "CREATE INDEX IF NOT EXISTS idx_atti_data ON atti(data_atto)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS atti_fts USING fts5("
+    " oggetto, motivazione, testo,"
+    " content='atti', content_rowid='id',"
+    " tokenize='unicode61 remove_diacritics 2')",
+    # L'indice full-text non duplica i testi (content='atti'): i trigger lo
+    # tengono allineato alla tabella
+    # Vocabolario dell'indice, per espandere le ricerche per prefisso
+    "CREATE VIRTUAL TABLE IF NOT EXISTS atti_fts_vocab USING fts5vocab(atti_fts, 'row')",
+    "CREATE TRIGGER IF NOT EXISTS atti_ai AFTER INSERT ON atti BEGIN"
+    " INSERT INTO atti_fts(rowid, oggetto, motivazione, testo)"
+    " VALUES (new.id, new.oggetto, new.motivazione, new.testo); END",
+    "CREATE TRIGGER IF NOT EXISTS atti_ad AFTER DELETE ON atti BEGIN"
+    " INSERT INTO atti_fts(atti_fts, rowid, oggetto, motivazione, testo)"
+    " VALUES ('delete', old.id, old.oggetto, old.motivazione, old.testo); END",
+    # Solo i testi indicizzati: l'aggiornamento di `corrente` non tocca l'indice
+    "CREATE TRIGGER IF NOT EXISTS atti_au AFTER UPDATE OF oggetto, motivazione, testo ON atti BEGIN"
+    " INSERT INTO atti_fts(atti_fts, rowid, oggetto, motivazione, testo)"
+    " VALUES ('delete', old.id, old.oggetto, old.motivazione, old.testo);"
+    " INSERT INTO atti_fts(rowid, oggetto, motivazione, testo)"
+    " VALUES (new.id, new.oggetto, new.motivazione, new.testo); END",
+)
+
+# Spesa cumulata per (ente, esercizio) e fornitore, categoria CPV o capitolo,
+# aggiornata dai trigger a ogni atto: tre UPSERT per atto, lettura per chiave
+# primaria. Conta solo la versione corrente di ogni CIG (le bozze
+# rigenerate con lo stesso CIG sostituiscono la precedente)
+SCHEMA_SPESA = (
+    "CREATE TABLE IF NOT EXISTS spesa ("
+    " ente TEXT NOT NULL COLLATE NOCASE,"
+    " esercizio TEXT NOT NULL,"
+    " dimensione TEXT NOT NULL,"
+    " chiave TEXT NOT NULL,"
+    " imponibile INTEGER NOT NULL,"
+    " atti INTEGER NOT NULL,"
+    " PRIMARY KEY (ente, esercizio, dimensione, chiave)) WITHOUT ROWID",
+    "CREATE TRIGGER IF NOT EXISTS spesa_ai AFTER INSERT ON atti WHEN new.corrente BEGIN"
+    " INSERT INTO spesa (ente, esercizio, dimensione, chiave, imponibile, atti)"
+    " SELECT new.ente, new.esercizio, d, k, new.imponibile, 1 FROM ("
+    "  SELECT 'fornitore' AS d, new.piva_cf AS k UNION ALL"
+    "  SELECT 'cpv', new.categoria_cpv UNION ALL SELECT 'capitolo', new.capitolo)"
+    " WHERE k <> ''"
+    " ON CONFLICT (ente, esercizio, dimensione, chiave) DO UPDATE SET"
+    " imponibile = imponibile + excluded.imponibile, atti = atti + 1; END",
+    "CREATE TRIGGER IF NOT EXISTS spesa_au AFTER UPDATE OF corrente ON atti"
+    " WHEN old.corrente <> new.corrente BEGIN"
+    " INSERT INTO spesa (ente, esercizio, dimensione, chiave, imponibile, atti)"
+    " SELECT new.ente, new.esercizio, d, k, 0, 0 FROM ("
+    "  SELECT 'fornitore' AS d, new.piva_cf AS k UNION ALL"
+    "  SELECT 'cpv', new.categoria_cpv UNION ALL SELECT 'capitolo', new.capitolo)"
+    " WHERE k <> ''"
+    " ON CONFLICT (ente, esercizio, dimensione, chiave) DO UPDATE SET"
+    " imponibile = imponibile + (CASE WHEN new.corrente THEN new.imponibile ELSE -new.imponibile END),"
+    " atti = atti + (CASE WHEN new.corrente THEN 1 ELSE -1 END); END",
+    "CREATE TRIGGER IF NOT EXISTS spesa_ad AFTER DELETE ON atti WHEN old.corrente BEGIN"
+    " UPDATE spesa SET imponibile = imponibile - old.imponibile, atti = atti - 1"
+    " WHERE ente = old.ente AND esercizio = old.esercizio AND ("
+    "  (dimensione = 'fornitore' AND chiave = old.piva_cf) OR"
+    "  (dimensione = 'cpv' AND chiave = old.categoria_cpv) OR"
+    "  (dimensione = 'capitolo' AND chiave = old.capitolo)); END",
+)
+
+# Colonne restituite dalle ricerche (il testo completo e l'RTF solo con leggi())
+_COLONNE = ("a.id, a.ente, a.cig, a.piva_cf, a.ragione_sociale, a.capitolo, a.esercizio,"
+            " a.imponibile, a.totale, a.data_atto, a.oggetto, a.nome_file, a.archiviato")
+
+_RE_PAROLE = re.compile(r"(\w+)(\*?)", re.UNICODE)
+
+# Oltre questo numero di corrispondenze full-text (parole presenti in quasi
+# tutti gli atti, es. 'fornitura') l'ordinamento per pertinenza costerebbe
+# troppo: i risultati sono ordinati dal più recente
+MAX_ORDINAMENTO_PERTINENZA = 20000
+
+# Termini dell'indice considerati per ogni prefisso ('forn*')
+MAX_ESPANSIONE_PREFISSO = 50
+
+
+@dataclass(frozen=True)
+class AttoArchiviato:
+    """Una determina dell'archivio. `testo` e `rtf` sono valorizzati solo da leggi()."""
+    id: int
+    ente: str
+    cig: str
+    piva_cf: str
+    ragione_sociale: str
+    capitolo: str
+    esercizio: str
+    imponibile: Decimal
+    totale: Decimal
+    data_atto: Optional[str]
+    oggetto: str
+    nome_file: str
+    archiviato: float
+    estratto: str = ""
+    testo: str = ""
+    rtf: bytes = b""
+
+
+def _data_iso(valore) -> Optional[str]:
+    if isinstance(valore, (datetime, date)):
+        return valore.strftime("%Y-%m-%d")
+    return str(valore) if valore else None
+
+
+def ente_autorizzato(codice: str, enti: Mapping[str, str]) -> Optional[str]:
+    """
+    Ente a cui appartiene il codice di accesso, None se nessuno. `enti`
+    associa il nome dell'ente all'impronta SHA-256 (esadecimale) del codice.
+    """
+    impronta = hashlib.sha256((codice or "").strip().encode("utf-8")).hexdigest()
+    for ente, atteso in enti.items():
+        if hmac.compare_digest(impronta, str(atteso).strip().lower()):
+            return ente
+    return None
+
+
+def termini_ricerca(testo: str) -> List[Tuple[str, bool]]:
+    """
+    Parole del testo dell'utente come (termine, prefisso), già in minuscolo
+    e senza accenti come nell'indice; 'forn*' è cercato per prefisso. Gli
+    operatori FTS5 digitati dall'utente non vengono interpretati.
+    """
+    termini = []
+    for parola, stella in _RE_PAROLE.findall(testo or ""):
+        decomposta = unicodedata.normalize("NFKD", parola.lower())
+        termini.append(("".join(c for c in decomposta if not unicodedata.combining(c)), bool(stella)))
+    return termini
+
+
+class ArchivioDetermine:
+    """
+    Archivio SQLite delle determine generate.
+
+    Args:
+        percorso_db: File SQLite (':memory:' per un archivio temporaneo)
+        conserva_rtf: Se False l'RTF non viene memorizzato (solo testi e metadati)
+    """
+
+    def __init__(self, percorso_db: str = PERCORSO_PREDEFINITO, conserva_rtf: bool = True):
+        self.conserva_rtf = conserva_rtf
+        self._lock = threading.Lock()
+        cartella = os.path.dirname(percorso_db) if percorso_db != ":memory:" else ""
+        if cartella:
+            os.makedirs(cartella, exist_ok=True)
+        self._db = sqlite3.connect(percorso_db, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for istruzione in SCHEMA:
+            self._db.execute(istruzione)
+        self._aggiorna_schema()
+        self._db.commit()
+
+    def _aggiorna_schema(self) -> None:
+        """Porta gli archivi creati da versioni precedenti allo schema attuale."""
+        colonne = {riga[1] for riga in self._db.execute("PRAGMA table_info(atti)")}
+        # CPV, usato dall'indice di rotazione
+        if "codice_cpv" not in colonne:
+            self._db.execute("ALTER TABLE atti ADD COLUMN codice_cpv TEXT NOT NULL DEFAULT ''")
+        # Categoria CPV e versione corrente per CIG, usate dalla spesa cumulata
+        if "categoria_cpv" not in colonne:
+            self._db.execute("ALTER TABLE atti ADD COLUMN categoria_cpv TEXT NOT NULL DEFAULT ''")
+            self._db.executemany(
+                "UPDATE atti SET categoria_cpv = ? WHERE id = ?",
+                [(categoria_cpv(cpv), id_atto) for id_atto, cpv in
+                 self._db.execute("SELECT id, codice_cpv FROM atti WHERE codice_cpv <> ''").fetchall()]
+            )
+        if "corrente" not in colonne:
+            self._db.execute("ALTER TABLE atti ADD COLUMN corrente INTEGER NOT NULL DEFAULT 1")
+            self._db.execute(
+                "UPDATE atti SET corrente = 0 WHERE cig <> '' AND id < "
+                "(SELECT MAX(b.id) FROM atti b WHERE b.cig = atti.cig AND b.ente = atti.ente)"
+            )
+        nuova = self._db.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'spesa'"
+        ).fetchone()[0] == 0
+        for istruzione in SCHEMA_SPESA:
+            self._db.execute(istruzione)
+        if nuova:
+            # Spesa degli atti già archiviati (una tantum, poi la aggiornano i trigger)
+            for dimensione, colonna in (("fornitore", "piva_cf"), ("cpv", "categoria_cpv"), ("capitolo", "capitolo")):
+                self._db.execute(
+                    "INSERT INTO spesa (ente, esercizio, dimensione, chiave, imponibile, atti)"
+                    f" SELECT ente, esercizio, ?, {colonna}, SUM(imponibile), COUNT(*) FROM atti"
+                    f" WHERE corrente AND {colonna} <> '' GROUP BY ente COLLATE NOCASE, esercizio, {colonna}"
+                    " ON CONFLICT DO NOTHING",
+                    (dimensione,)
+                )
+
+    # -------------------------------------------------------------------------
+    # Scrittura
+    # -------------------------------------------------------------------------
+
+    def archivia(self, dati: Dict, documento: DeterminaGenerata, ente: Optional[str] = None) -> int:
+        """
+        Archivia la determina generata da `dati` per `ente` (se None, l'ente
+        indicato nei dati) e restituisce il suo id. Se gli stessi dati sono
+        già in archivio per lo stesso ente restituisce l'id esistente.
+        """
+        ctx = contesto(dati)
+        ente = ((ctx.comune if ente is None else ente) or "").strip()
+        cig = (ctx.cig or "").strip()
+        chiave = hash_dati({"ente": ente, "dati": dati})
+        riga = (
+            chiave, ente, cig, (ctx.piva_cf or "").strip().upper(),
+            ctx.ragione_sociale or "", str(ctx.capitolo_bilancio or ""), str(ctx.esercizio_finanziario or ""),
+            in_centesimi(ctx.importi["imponibile"]), in_centesimi(ctx.importi["totale"]),
+            _data_iso(ctx.data_atto), ctx.oggetto or "", ctx.motivazione or "",
+            f"{documento.premesse}\n{documento.dispositivo}", documento.nome_file,
+            zlib.compress(documento.rtf, 6) if self.conserva_rtf else None, time.time(),
+            ctx.codice_cpv or "", categoria_cpv(ctx.codice_cpv),
+        )
+        with self._lock:
+            cursore = self._db.execute(
+                "INSERT OR IGNORE INTO atti (hash, ente, cig, piva_cf, ragione_sociale, capitolo,"
+                " esercizio, imponibile, totale, data_atto, oggetto, motivazione, testo, nome_file,"
+                " rtf, archiviato, codice_cpv, categoria_cpv)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", riga
+            )
+            if cursore.rowcount:
+                id_atto = cursore.lastrowid
+            else:
+                id_atto = self._db.execute("SELECT id FROM atti WHERE hash = ?", (chiave,)).fetchone()[0]
+            if cig:
+                # L'ultima versione archiviata di un CIG sostituisce le precedenti
+                self._db.execute(
+                    "UPDATE atti SET corrente = (id = ?) WHERE cig = ? AND ente = ?", (id_atto, cig, ente)
+                )
+            self._db.commit()
+            return id_atto
+
+    def elimina(self, id_atto: int) -> bool:
+        with self._lock:
+            riga = self._db.execute(
+                "SELECT ente, cig, corrente FROM atti WHERE id = ?", (id_atto,)
+            ).fetchone()
+            cursore = self._db.execute("DELETE FROM atti WHERE id = ?", (id_atto,))
+            if riga and riga[1] and riga[2]:
+                # Torna corrente la versione precedente dello stesso CIG, se c'è
+                self._db.execute(
+                    "UPDATE atti SET corrente = 1 WHERE id = "
+                    "(SELECT MAX(id) FROM atti WHERE cig = ? AND ente = ?)", (riga[1], riga[0])
+                )
+            self._db.commit()
+            return cursore.rowcount > 0
+
+    # -------------------------------------------------------------------------
+    # Ricerca
+    # -------------------------------------------------------------------------
+
+    def cerca(self, testo: str = "", *, ente: str = "", cig: str = "", piva_cf: str = "",
+              ragione_sociale: str = "", capitolo: str = "", esercizio=None,
+              dal=None, al=None, importo_min=None, importo_max=None,
+              limite: int = 50, offset: int = 0) -> List[AttoArchiviato]:
+        """
+        Cerca nell'archivio. `testo` è cercato con l'indice full-text su
+        oggetto, motivazione e testo (risultati per pertinenza); gli altri
+        filtri sono esatti, tranne ragione_sociale (prefisso, senza
+        distinzione di maiuscole). Gli importi si riferiscono al totale IVA
+        inclusa. Senza testo i risultati sono dal più recente, come quando
+        il testo compare in troppi atti per ordinarli per pertinenza.
+        """
+        condizioni, parametri = [], []
+        for colonna, valore in (("a.cig", cig), ("a.capitolo", capitolo)):
+            if valore:
+                condizioni.append(f"{colonna} = ?")
+                parametri.append(str(valore).strip())
+        if piva_cf:
+            condizioni.append("a.piva_cf = ?")
+            parametri.append(piva_cf.strip().upper())
+        if ente:
+            condizioni.append("a.ente = ? COLLATE NOCASE")
+            parametri.append(ente.strip())
+        if esercizio:
+            condizioni.append("a.esercizio = ?")
+            parametri.append(str(esercizio))
+        if ragione_sociale:
+            # Prefisso con LIKE: usa l'indice NOCASE (case_sensitive_like disattivo)
+            condizioni.append("a.ragione_sociale LIKE ? ESCAPE '\\'")
+            prefisso = ragione_sociale.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            parametri.append(prefisso + "%")
+        if dal:
+            condizioni.append("a.data_atto >= ?")
+            parametri.append(_data_iso(dal))
+        if al:
+            condizioni.append("a.data_atto <= ?")
+            parametri.append(_data_iso(al))
+        if importo_min is not None:
+            condizioni.append("a.totale >= ?")
+            parametri.append(in_centesimi(importo_min))
+        if importo_max is not None:
+            condizioni.append("a.totale <= ?")
+            parametri.append(in_centesimi(importo_max))
+
+        filtri = "".join(f" AND {c}" for c in condizioni)
+        with self._lock:
+            query = self._query_fts(testo)
+            if query is None:
+                return []
+            if not query:
+                righe = self._db.execute(
+                    f"SELECT {_COLONNE} FROM atti a WHERE 1{filtri}"
+                    " ORDER BY a.data_atto DESC, a.id DESC LIMIT ? OFFSET ?",
+                    parametri + [limite, offset]
+                ).fetchall()
+                return [self._atto(riga) for riga in righe]
+
+            if cig or piva_cf or ragione_sociale:
+                # Filtri molto selettivi: si parte dall'indice di `atti` e si
+                # verifica il testo solo sugli atti trovati (CROSS JOIN fissa
+                # l'ordine del join). Niente bm25, che leggerebbe comunque
+                # tutte le corrispondenze per le sue statistiche
+                sorgente = "atti a CROSS JOIN atti_fts ON atti_fts.rowid = a.id"
+                ordine = "a.data_atto DESC, a.id DESC"
+            else:
+                sorgente = "atti_fts JOIN atti a ON a.id = atti_fts.rowid"
+                corrispondenze = self._db.execute(
+                    "SELECT COUNT(*) FROM (SELECT 1 FROM atti_fts WHERE atti_fts MATCH ? LIMIT ?)",
+                    (query, MAX_ORDINAMENTO_PERTINENZA + 1)
+                ).fetchone()[0]
+                if corrispondenze > MAX_ORDINAMENTO_PERTINENZA:
+                    ordine = "atti_fts.rowid DESC"
+                else:
+                    ordine = "bm25(atti_fts, 10.0, 3.0, 1.0), a.id DESC"
+            righe = self._db.execute(
+                f"SELECT {_COLONNE} FROM {sorgente} WHERE atti_fts MATCH ?{filtri}"
+                f" ORDER BY {ordine} LIMIT ? OFFSET ?",
+                [query] + parametri + [limite, offset]
+            ).fetchall()
+
+            # Estratti calcolati solo per la pagina restituita
+            estratti = {}
+            if righe:
+                segnaposto = ", ".join("?" * len(righe))
+                estratti = dict(self._db.execute(
+                    "SELECT rowid, snippet(atti_fts, -1, '[', ']', '…', 12) FROM atti_fts"
+                    f" WHERE atti_fts MATCH ? AND rowid IN ({segnaposto})",
+                    [query] + [riga[0] for riga in righe]
+                ).fetchall())
+        return [self._atto(riga, estratto=estratti.get(riga[0], "")) for riga in righe]
+
+    def _query_fts(self, testo: str) -> Optional[str]:
+        """
+        Query FTS5 per `testo`: termini obbligatori, ogni prefisso espanso nei
+        termini dell'indice che lo completano (le query per prefisso dirette
+        sono lente su indici grandi). "" senza parole, None se un prefisso
+        non corrisponde a nessun termine.
+        """
+        parti = []
+        for termine, prefisso in termini_ricerca(testo):
+            if not prefisso:
+                parti.append(f'"{termine}"')
+                continue
+            completamenti = [riga[0] for riga in self._db.execute(
+                "SELECT term FROM atti_fts_vocab WHERE term >= ? AND term < ? LIMIT ?",
+                (termine, termine + "\U0010ffff", MAX_ESPANSIONE_PREFISSO)
+            )]
+            if not completamenti:
+                return None
+            parti.append("(" + " OR ".join(f'"{t}"' for t in completamenti) + ")")
+        return " AND ".join(parti)
+
+    def leggi(self, id_atto: int, ente: Optional[str] = None) -> Optional[AttoArchiviato]:
+        """Atto completo, con testo e RTF (vuoto se non conservato); con `ente`, solo se è suo."""
+        sql, parametri = f"SELECT {_COLONNE}, a.testo, a.rtf FROM atti a WHERE a.id = ?", (id_atto,)
+        if ente is not None:
+            sql += " AND a.ente = ? COLLATE NOCASE"
+            parametri += (ente.strip(),)
+        with self._lock:
+            riga = self._db.execute(sql, parametri).fetchone()
+        if riga is None:
+            return None
+        rtf = zlib.decompress(riga[-1]) if riga[-1] else b""
+        return self._atto(riga[:-2], testo=riga[-2], rtf=rtf)
+
+    def affidamenti(self, dal=None) -> List[Tuple]:
+        """
+        (id, ente, piva_cf, codice_cpv, data_atto, cig, oggetto, totale) degli atti
+        con data dell'atto da `dal` in poi (tutti se None), in ordine di data,
+        per l'indice di rotazione.
+        """
+        sql = "SELECT id, ente, piva_cf, codice_cpv, data_atto, cig, oggetto, totale FROM atti"
+        parametri = ()
+        if dal:
+            sql += " WHERE data_atto >= ?"
+            parametri = (_data_iso(dal),)
+        sql += " ORDER BY data_atto"
+        with self._lock:
+            righe = self._db.execute(sql, parametri).fetchall()
+        return [riga[:7] + (da_centesimi(riga[7]),) for riga in righe]
+
+    def spesa(self, ente: str, esercizio, chiavi: Dict[str, str]) -> Dict[str, Tuple[int, int]]:
+        """
+        Spesa cumulata dell'ente nell'esercizio per le chiavi richieste,
+        es. {'fornitore': '01234567890', 'cpv': '302'}: restituisce
+        {dimensione: (imponibile in centesimi, numero di atti)}.
+        """
+        risultato = {}
+        with self._lock:
+            for dimensione, chiave in chiavi.items():
+                if not chiave:
+                    continue
+                riga = self._db.execute(
+                    "SELECT imponibile, atti FROM spesa WHERE ente = ? AND esercizio = ?"
+                    " AND dimensione = ? AND chiave = ?",
+                    ((ente or "").strip(), str(esercizio or ""), dimensione, chiave)
+                ).fetchone()
+                risultato[dimensione] = riga or (0, 0)
+        return risultato
+
+    def atto_corrente(self, ente: str, cig: str) -> Optional[Tuple]:
+        """(id, piva_cf, categoria_cpv, capitolo, esercizio, imponibile) della versione corrente del CIG."""
+        if not cig:
+            return None
+        with self._lock:
+            return self._db.execute(
+                "SELECT id, piva_cf, categoria_cpv, capitolo, esercizio, imponibile FROM atti"
+                " WHERE cig = ? AND ente = ? AND corrente",
+                (cig.strip(), (ente or "").strip())
+            ).fetchone()
+
+    def conta(self, ente: Optional[str] = None) -> int:
+        sql, parametri = "SELECT COUNT(*) FROM atti", ()
+        if ente is not None:
+            sql, parametri = sql + " WHERE ente = ? COLLATE NOCASE", (ente.strip(),)
+        with self._lock:
+            return self._db.execute(sql, parametri).fetchone()[0]
+
+    def ottimizza(self) -> None:
+        """Compatta l'indice full-text e aggiorna le statistiche del planner (da eseguire ogni tanto)."""
+        with self._lock:
+            self._db.execute("INSERT INTO atti_fts(atti_fts) VALUES ('optimize')")
+            self._db.execute("ANALYZE")
+            self._db.commit()
+
+    def chiudi(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    @staticmethod
+    def _atto(riga, **extra) -> AttoArchiviato:
+        (id_atto, ente, cig, piva_cf, ragione_sociale, capitolo, esercizio,
+         imponibile, totale, data_atto, oggetto, nome_file, archiviato) = riga
+        return AttoArchiviato(
+            id_atto, ente, cig, piva_cf, ragione_sociale, capitolo, esercizio,
+            da_centesimi(imponibile), da_centesimi(totale), data_atto, oggetto,
+            nome_file, archiviato, **extra
+        )
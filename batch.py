@@ -0,0 +1,294 @@
+"""
+DETERMINAFACILE - Generazione Batch v1.0
+Modulo per la generazione massiva di determine da file CSV o JSONL.
+Ogni riga del file contiene un dizionario `dati` con le stesse chiavi
+costruite da app.py in `dati_form`; per ogni riga viene prodotto un RTF
+(oppure un DOCX o un ODT con --formato).
+Le righe di un'offerta (`righe_offerta`) sono una lista nel JSONL e un
+testo JSON nella colonna omonima del CSV.
+
+Uso:
+    python batch.py affidamenti.csv -o determine/ --processi 8 --formato docx
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from importi import riepilogo_iva
+from logic_engine import valida_dati
+from render_incrementale import RenderIncrementale
+from document_generator import FORMATI, genera_nome_file
+
+
+# =============================================================================
+# NORMALIZZAZIONE DEI DATI IN INGRESSO
+# =============================================================================
+
+CAMPI_DATA = (
+    "data_atto", "data_preventivo", "dup_data", "nota_dup_data",
+    "bilancio_data", "peg_data", "durc_scadenza",
+)
+
+CAMPI_BOOLEANI = (
+    "operatore_uscente", "usa_mepa", "piccola_fornitura",
+    "includi_visto", "includi_ricorsi", "includi_conflitto",
+)
+
+CAMPI_DECIMALI = ("imponibile", "aliquota_iva")
+
+FORMATI_DATA = ("%Y-%m-%d", "%d/%m/%Y", "%Y-%m-%dT%H:%M:%S")
+
+VALORI_VERI = {"1", "true", "vero", "si", "sì", "s", "x", "yes", "y"}
+
+
+def _converti_data(valore) -> Optional[datetime]:
+    """Converte una data testuale ('2025-03-14' o '14/03/2025') in datetime."""
+    if valore is None or isinstance(valore, datetime):
+        return valore
+    testo = str(valore).strip()
+    if not testo:
+        return None
+    if len(testo) == 10 and testo[4] == "-":
+        # AAAA-MM-GG senza strptime (che al primo uso importa _strptime e locale)
+        try:
+            return datetime.fromisoformat(testo)
+        except ValueError:
+            pass
+    for formato in FORMATI_DATA:
+        try:
+            return datetime.strptime(testo, formato)
+        except ValueError:
+            continue
+    raise ValueError(f"Data non riconosciuta: '{testo}'")
+
+
+def _converti_booleano(valore) -> bool:
+    if isinstance(valore, bool):
+        return valore
+    if valore is None:
+        return False
+    return str(valore).strip().lower() in VALORI_VERI
+
+
+def normalizza_dati(riga: Dict) -> Dict:
+    """
+    Converte una riga letta da CSV/JSONL nel dizionario atteso dal motore,
+    replicando le conversioni che app.py applica a `dati_form`.
+    """
+    dati = {k: v for k, v in riga.items() if k is not None}
+
+    for campo in CAMPI_DATA:
+        if campo in dati:
+            dati[campo] = _converti_data(dati[campo])
+
+    for campo in CAMPI_BOOLEANI:
+        if campo in dati:
+            dati[campo] = _converti_booleano(dati[campo])
+
+    for campo in CAMPI_DECIMALI:
+        valore = dati.get(campo)
+        if isinstance(valore, str):
+            valore = valore.strip().replace(",", ".")
+            dati[campo] = float(valore) if valore else None
+
+    if isinstance(dati.get("aliquota_iva"), float) and dati["aliquota_iva"].is_integer():
+        dati["aliquota_iva"] = int(dati["aliquota_iva"])
+
+    esercizio = dati.get("esercizio_finanziario")
+    if isinstance(esercizio, str) and esercizio.strip().isdigit():
+        dati["esercizio_finanziario"] = int(esercizio)
+
+    if not dati.get("regolamento_comunale"):
+        dati["regolamento_comunale"] = None
+
+    # Nei CSV le righe dell'offerta arrivano come testo JSON
+    righe = dati.get("righe_offerta")
+    if isinstance(righe, str):
+        dati["righe_offerta"] = json.loads(righe) if righe.strip() else None
+    if dati.get("righe_offerta"):
+        dati["imponibile"] = float(riepilogo_iva(dati["righe_offerta"])["imponibile"])
+
+    if dati.get("imponibile") is not None:
+        dati["importo_sotto_5000"] = dati["imponibile"] < 5000
+
+    return dati
+
+
+# =============================================================================
+# LETTURA IN STREAMING
+# =============================================================================
+
+class RigaIllegibile(ValueError):
+    """Riga del file che non contiene dati leggibili (es. JSON malformato)."""
+
+
+def leggi_righe(percorso: str, delimitatore: Optional[str] = None
+                ) -> Iterator[Tuple[int, Union[Dict, RigaIllegibile]]]:
+    """
+    Legge il file riga per riga restituendo coppie (numero_riga, dati), dove
+    numero_riga è la riga del file (nel CSV quella in cui il record termina).
+    Una riga JSONL malformata non interrompe il batch: al posto dei dati
+    c'è un RigaIllegibile con l'errore.
+    Il formato è dedotto dall'estensione (.jsonl/.ndjson oppure .csv).
+    """
+    estensione = os.path.splitext(percorso)[1].lower()
+
+    with open(percorso, encoding="utf-8-sig", newline="") as f:
+        if estensione in (".jsonl", ".ndjson"):
+            for numero, linea in enumerate(f, start=1):
+                if not linea.strip():
+                    continue
+                try:
+                    dati = json.loads(linea)
+                except ValueError as e:
+                    colonna = f" (colonna {e.colno})" if isinstance(e, json.JSONDecodeError) else ""
+                    yield numero, RigaIllegibile(f"JSON non valido{colonna}: {getattr(e, 'msg', e)}")
+                    continue
+                if not isinstance(dati, dict):
+                    dati = RigaIllegibile(f"la riga non è un oggetto JSON ({type(dati).__name__})")
+                yield numero, dati
+            return
+
+        if delimitatore is None:
+            # Il separatore è quello più frequente nella riga di intestazione
+            intestazione = f.readline()
+            f.seek(0)
+            delimitatore = max(",;\t", key=intestazione.count)
+
+        # line_num conta le righe del file, anche quelle dei campi su più righe
+        lettore = csv.DictReader(f, delimiter=delimitatore)
+        for riga in lettore:
+            yield lettore.line_num, riga
+
+
+# =============================================================================
+# ELABORAZIONE DI UNA RIGA (ESEGUITA NEI PROCESSI WORKER)
+# =============================================================================
+
+# Un renderer per processo: le righe consecutive di un file differiscono
+# spesso in pochi campi, e solo le sezioni che li usano vengono rigenerate
+_render = RenderIncrementale()
+
+
+def elabora_riga(numero: int, riga: Union[Dict, RigaIllegibile], cartella_output: str,
+                 formato: str = "rtf") -> Tuple[int, Optional[str], List[str]]:
+    """
+    Valida, genera e scrive su disco la determina di una singola riga.
+    Restituisce (numero_riga, nome_file, errori).
+    """
+    if isinstance(riga, RigaIllegibile):
+        return numero, None, [str(riga)]
+    try:
+        dati = normalizza_dati(riga)
+        valido, errori = valida_dati(dati)
+        if not valido:
+            return numero, None, errori
+
+        p, d = _render.genera(dati)
+        codice_cpv = dati.get("codice_cpv")
+        if codice_cpv:
+            p += f"\nVISTO il codice CPV individuato: {codice_cpv};\n"
+
+        # Il numero di riga nel nome evita collisioni tra atti omonimi
+        scrittore, estensione, _ = FORMATI[formato]
+        nome_file = f"{numero:06d}_{genera_nome_file(dati)}.{estensione}"
+        with open(os.path.join(cartella_output, nome_file), "wb") as f:
+            scrittore(dati, p, d, f)
+        return numero, nome_file, []
+    except Exception as e:
+        return numero, None, [f"{type(e).__name__}: {e}"]
+
+
+# =============================================================================
+# ESECUZIONE BATCH
+# =============================================================================
+
+def esegui_batch(percorso: str, cartella_output: str, processi: int = 0,
+                 delimitatore: Optional[str] = None, in_volo: int = 0,
+                 formato: str = "rtf") -> Dict:
+    """
+    Elabora tutte le righe del file distribuendole su un pool di processi.
+    Al più `in_volo` righe sono in memoria contemporaneamente.
+
+    Returns:
+        Dizionario con il riepilogo (righe, generate, errori, secondi, righe_al_secondo)
+    """
+    os.makedirs(cartella_output, exist_ok=True)
+    processi = processi or os.cpu_count() or 1
+    in_volo = in_volo or processi * 4
+
+    riepilogo = {"righe": 0, "generate": 0, "errori": 0}
+    inizio = time.perf_counter()
+
+    def registra(esito):
+        numero, nome_file, errori = esito
+        riepilogo["righe"] += 1
+        if errori:
+            riepilogo["errori"] += 1
+            print(f"Riga {numero}: {'; '.join(errori)}", file=sys.stderr)
+        else:
+            riepilogo["generate"] += 1
+
+    righe = leggi_righe(percorso, delimitatore)
+
+    if processi == 1:
+        for numero, riga in righe:
+            registra(elabora_riga(numero, riga, cartella_output, formato))
+    else:
+        # Importato qui: chi usa solo normalizza_dati non carica multiprocessing
+        from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+        with ProcessPoolExecutor(max_workers=processi) as pool:
+            pendenti = set()
+            for numero, riga in righe:
+                if len(pendenti) >= in_volo:
+                    completati, pendenti = wait(pendenti, return_when=FIRST_COMPLETED)
+                    for futuro in completati:
+                        registra(futuro.result())
+                pendenti.add(pool.submit(elabora_riga, numero, riga, cartella_output, formato))
+            for futuro in wait(pendenti).done:
+                registra(futuro.result())
+
+    secondi = time.perf_counter() - inizio
+    riepilogo["secondi"] = round(secondi, 3)
+    riepilogo["righe_al_secondo"] = round(riepilogo["righe"] / secondi, 1) if secondi > 0 else 0.0
+    return riepilogo
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Genera in blocco le determine (RTF, DOCX o ODT) da un file CSV o JSONL."
+    )
+    parser.add_argument("file", help="File di input (.csv, .jsonl)")
+    parser.add_argument("-o", "--output", default="determine",
+                        help="Cartella di destinazione dei documenti (default: determine)")
+    parser.add_argument("-p", "--processi", type=int, default=0,
+                        help="Numero di processi worker (default: numero di CPU)")
+    parser.add_argument("-d", "--delimitatore", default=None,
+                        help="Separatore CSV (default: rilevato automaticamente)")
+    parser.add_argument("--in-volo", type=int, default=0,
+                        help="Righe in elaborazione contemporanea (default: 4 x processi)")
+    parser.add_argument("-f", "--formato", choices=list(FORMATI), default="rtf",
+                        help="Formato dei documenti (default: rtf)")
+    args = parser.parse_args(argv)
+
+    riepilogo = esegui_batch(args.file, args.output, args.processi,
+                             args.delimitatore, args.in_volo, args.formato)
+
+    print(
+        f"Righe: {riepilogo['righe']} - Generate: {riepilogo['generate']} - "
+        f"Errori: {riepilogo['errori']} - {riepilogo['secondi']} s "
+        f"({riepilogo['righe_al_secondo']} righe/s)",
+        file=sys.stderr,
+    )
+    return 1 if riepilogo["errori"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
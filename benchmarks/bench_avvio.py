@@ -0,0 +1,185 @@
+"""
+DETERMINAFACILE - Benchmark dei tempi di import
+Misura quanto costa importare i punti di ingresso (lo script Streamlit
+app.py, la riga di comando, il servizio HTTP) e i moduli pesanti che
+caricano, ognuno in un interprete nuovo. Per ogni caso riporta:
+- il tempo complessivo del processo (interprete compreso), minimo e mediana
+- il tempo di import misurato da `python -X importtime`, contando solo gli
+  import eseguiti dal caso (non quelli dell'avvio dell'interprete)
+- i pacchetti più pesanti, con il loro tempo cumulativo
+
+Il caso "app/import" esegue gli import in cima ad app.py, letti dal
+sorgente: se qualcuno reintroduce un import di openai a livello di modulo
+il confronto con la baseline lo segnala. "app/primo_uso_ai" è il costo
+pagato una volta per processo al primo pulsante AI.
+
+I risultati si salvano e si confrontano come in bench_suite.py (stesso
+formato JSON, stesso host); il confronto usa `import_min_ms`.
+
+Uso:
+    python benchmarks/bench_avvio.py
+    python benchmarks/bench_avvio.py -n 20 --pesanti 8
+    python benchmarks/bench_avvio.py --salva benchmarks/avvio.json
+    python benchmarks/bench_avvio.py --confronta benchmarks/avvio.json --tolleranza 0.25
+"""
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+RADICE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_suite import salva_baseline  # noqa: E402
+
+# Scritto su stderr prima degli import del caso: le righe di -X importtime
+# che lo precedono appartengono all'avvio dell'interprete
+MARCATORE = "--- inizio caso ---"
+
+
+def importazioni_app() -> str:
+    """Le istruzioni import a livello di modulo di app.py, come codice eseguibile."""
+    with open(os.path.join(RADICE, "app.py"), encoding="utf-8") as f:
+        albero = ast.parse(f.read())
+    return "\n".join(ast.unparse(nodo) for nodo in albero.body
+                     if isinstance(nodo, (ast.Import, ast.ImportFrom)))
+
+
+def casi() -> List[Tuple[str, str]]:
+    """Elenco (nome, codice eseguito nel processo figlio)."""
+    return [
+        ("interprete", "pass"),
+        ("streamlit", "import streamlit"),
+        ("app/import", importazioni_app()),
+        ("app/primo_uso_ai", "import ai_helpers\nfrom openai import OpenAI"),
+        ("pagina", "import pagina"),
+        ("determinafacile", "import determinafacile"),
+        ("servizio", "import servizio"),
+    ]
+
+
+# =============================================================================
+# MISURA
+# =============================================================================
+
+def leggi_importtime(stderr: str) -> Tuple[int, Dict[str, int]]:
+    """
+    Dall'output di -X importtime successivo al marcatore: tempo totale (us)
+    e tempo cumulativo di ogni import di primo livello (pacchetto -> us).
+    """
+    _, _, dopo = stderr.partition(MARCATORE)
+    radici: Dict[str, int] = {}
+    for riga in dopo.splitlines():
+        if not riga.startswith("import time:"):
+            continue
+        _, cumulativo, nome = riga[len("import time:"):].split("|", 2)
+        if nome.startswith("  "):
+            continue  # import annidato: è già nel cumulativo del genitore
+        nome = nome.strip()
+        radici[nome] = radici.get(nome, 0) + int(cumulativo)
+    return sum(radici.values()), radici
+
+
+def misura(codice: str, ripetizioni: int) -> Dict[str, object]:
+    """Esegue `codice` in `ripetizioni` interpreti nuovi con -X importtime."""
+    preambolo = f"import sys\nsys.stderr.write({MARCATORE!r} + '\\n')\nsys.stderr.flush()\n"
+    comando = [sys.executable, "-X", "importtime", "-c", preambolo + codice]
+    processi_ms, import_us, pesanti = [], [], {}
+    for _ in range(ripetizioni):
+        inizio = time.perf_counter()
+        esito = subprocess.run(comando, cwd=RADICE, capture_output=True, text=True)
+        processi_ms.append((time.perf_counter() - inizio) * 1000)
+        if esito.returncode != 0:
+            raise RuntimeError(esito.stderr.strip().splitlines()[-1])
+        totale, radici = leggi_importtime(esito.stderr)
+        import_us.append(totale)
+        # Pacchetti della ripetizione più veloce: la meno disturbata
+        if totale == min(import_us):
+            pesanti = radici
+    return {
+        "ripetizioni": ripetizioni,
+        "processo_min_ms": round(min(processi_ms), 1),
+        "processo_p50_ms": round(statistics.median(processi_ms), 1),
+        "import_min_ms": round(min(import_us) / 1000, 1),
+        "import_p50_ms": round(statistics.median(import_us) / 1000, 1),
+        "pesanti_ms": {nome: round(us / 1000, 1) for nome, us in
+                       sorted(pesanti.items(), key=lambda v: -v[1])},
+    }
+
+
+def esegui(filtro: str = "", ripetizioni: int = 10, n_pesanti: int = 5) -> Dict[str, Dict[str, object]]:
+    risultati = {}
+    for nome, codice in casi():
+        if filtro and filtro not in nome:
+            continue
+        r = misura(codice, ripetizioni)
+        r["pesanti_ms"] = dict(list(r["pesanti_ms"].items())[:n_pesanti])
+        risultati[nome] = r
+        print(f"{nome:20s} processo {r['processo_min_ms']:>7.1f} ms (p50 {r['processo_p50_ms']:>7.1f})  "
+              f"import {r['import_min_ms']:>7.1f} ms (p50 {r['import_p50_ms']:>7.1f})")
+        for pacchetto, ms in r["pesanti_ms"].items():
+            print(f"{'':22s}{pacchetto:30s} {ms:>7.1f} ms")
+    return risultati
+
+
+# =============================================================================
+# CONFRONTO
+# =============================================================================
+
+def confronta(baseline: Dict[str, Dict[str, object]], attuali: Dict[str, Dict[str, object]],
+              tolleranza: float, scarto_ms: float = 5.0) -> List[str]:
+    """
+    Regressioni del tempo di import (import_min_ms) oltre la tolleranza.
+    Sotto `scarto_ms` di differenza assoluta il peggioramento è rumore.
+    """
+    regressioni = []
+    for nome, attuale in attuali.items():
+        riferimento = baseline.get(nome)
+        if riferimento is None:
+            continue
+        atteso, misurato = riferimento["import_min_ms"], attuale["import_min_ms"]
+        if misurato - atteso > scarto_ms and misurato > atteso * (1 + tolleranza):
+            nuovi = sorted(set(attuale["pesanti_ms"]) - set(riferimento.get("pesanti_ms", {})))
+            nota = f" nuovi: {', '.join(nuovi)}" if nuovi else ""
+            regressioni.append(f"{nome}: import {atteso:.1f} -> {misurato:.1f} ms "
+                               f"(+{(misurato / atteso - 1) * 100:.0f}%){nota}")
+    return regressioni
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Tempi di import dei punti di ingresso (-X importtime).")
+    parser.add_argument("-k", "--filtro", default="", help="Misura solo i casi il cui nome contiene il testo")
+    parser.add_argument("-n", "--ripetizioni", type=int, default=10, help="Interpreti avviati per caso")
+    parser.add_argument("--pesanti", type=int, default=5, help="Pacchetti più pesanti da mostrare per caso")
+    parser.add_argument("--salva", metavar="JSON", help="Salva i risultati come baseline")
+    parser.add_argument("--confronta", metavar="JSON", help="Confronta con una baseline salvata")
+    parser.add_argument("--tolleranza", type=float, default=0.25,
+                        help="Peggioramento massimo ammesso del tempo di import (0.25 = +25%%)")
+    args = parser.parse_args(argv)
+
+    risultati = esegui(args.filtro, args.ripetizioni, args.pesanti)
+
+    if args.salva:
+        salva_baseline(args.salva, risultati)
+        print(f"Baseline salvata in {args.salva}")
+
+    if args.confronta:
+        with open(args.confronta, encoding="utf-8") as f:
+            baseline = json.load(f)["risultati"]
+        regressioni = confronta(baseline, risultati, args.tolleranza)
+        if regressioni:
+            print(f"\nREGRESSIONI (tolleranza {args.tolleranza:.0%}):", file=sys.stderr)
+            for riga in regressioni:
+                print(f"  {riga}", file=sys.stderr)
+            return 1
+        print(f"\nNessuna regressione rispetto a {args.confronta}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
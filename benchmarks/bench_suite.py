@@ -0,0 +1,314 @@
+"""
+DETERMINAFACILE - Suite di micro-benchmark
+Misura le funzioni principali del logic engine e del generatore RTF su
+input rappresentativi e casi limite (tutte le sezioni opzionali attive,
+motivazioni molto lunghe, testo pieno di caratteri non ASCII, importi a
+cavallo della soglia dei 5.000 €, offerte su più righe e aliquote).
+
+Per ogni caso riporta ops/s, percentili di latenza (p50/p90/p99) e il
+picco di memoria allocata per chiamata; i casi sono misurati in più giri
+alternati per ridurre l'effetto del rumore della macchina. I risultati si salvano in JSON
+come baseline; in modalità confronto il comando termina con codice 1 se
+una funzione peggiora oltre la tolleranza. Le baseline dipendono dalla
+macchina: vanno salvate e confrontate sullo stesso host.
+
+Uso:
+    python benchmarks/bench_suite.py
+    python benchmarks/bench_suite.py --salva benchmarks/baseline.json
+    python benchmarks/bench_suite.py --confronta benchmarks/baseline.json --tolleranza 0.2
+    python benchmarks/bench_suite.py -k escape_rtf --durata 1
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+RADICE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RADICE)
+
+from logic_engine import assembla_visti, genera_premesse, genera_testo_completo  # noqa: E402
+from document_generator import escape_rtf, genera_rtf, numero_in_lettere  # noqa: E402
+from importi import riepilogo_iva  # noqa: E402
+from render_incrementale import RenderIncrementale  # noqa: E402
+from bench_template import DATI_ESEMPIO  # noqa: E402
+
+
+# =============================================================================
+# INPUT
+# =============================================================================
+
+TESTO_NON_ASCII = (
+    "Fornitura «urgente» di attrezzature per l’ufficio “Attività produttive” — "
+    "perché è già scaduto il contratto; più di 10 unità €, Ω, ĉ, 漢字, 😀. "
+)
+
+DATI_MINIMI = {
+    "ragione_sociale": "Alfa S.r.l.", "piva_cf": "01234567890", "imponibile": 1000,
+    "cig": "Z123456789", "capitolo_bilancio": "1043", "oggetto": "Fornitura di PC",
+    "motivazione": "Servono nuovi computer.", "durata_servizio": "30 giorni",
+    "data_atto": datetime(2025, 3, 14),
+}
+
+DATI_COMPLETI = dict(DATI_ESEMPIO, usa_mepa=True, includi_visto=True,
+                     includi_ricorsi=True, includi_conflitto=True,
+                     operatore_uscente=True, piccola_fornitura=True)
+
+DATI_MOTIVAZIONE_LUNGA = dict(DATI_COMPLETI, motivazione=(
+    "Considerata la necessità di garantire la continuità dei servizi erogati. " * 2000
+))
+
+DATI_NON_ASCII = dict(DATI_COMPLETI, oggetto=TESTO_NON_ASCII * 3,
+                      motivazione=TESTO_NON_ASCII * 40,
+                      ragione_sociale="Società Cooperativa «L’Aquilone» a r.l.")
+
+
+def righe_offerta(n: int) -> List[dict]:
+    """Offerta di `n` righe ripartite sulle aliquote 22, 10, 5 e 4%."""
+    aliquote = (22, 10, 5, 4)
+    return [
+        {"descrizione": f"Articolo {i}", "quantita": 1 + i % 7,
+         "prezzo_unitario": round(3.5 + (i * 37 % 1000) / 7, 2), "aliquota_iva": aliquote[i % 4]}
+        for i in range(n)
+    ]
+
+
+# Importi a cavallo della soglia che cambia i VISTI (MEPA / deroga rotazione)
+CASI_DATI: Dict[str, dict] = {
+    "minimo": DATI_MINIMI,
+    "tipico": DATI_ESEMPIO,
+    "completo": DATI_COMPLETI,
+    "motivazione_lunga": DATI_MOTIVAZIONE_LUNGA,
+    "non_ascii": DATI_NON_ASCII,
+    "soglia_4999.99": dict(DATI_COMPLETI, imponibile=4999.99),
+    "soglia_5000": dict(DATI_COMPLETI, imponibile=5000),
+    "soglia_5000.01": dict(DATI_COMPLETI, imponibile=5000.01),
+    "offerta_200_righe": dict(DATI_COMPLETI, righe_offerta=righe_offerta(200)),
+}
+
+
+def _modifica_un_campo(campo: str) -> Callable[[], object]:
+    """Rendering incrementale di DATI_COMPLETI con `campo` diverso a ogni chiamata."""
+    render = RenderIncrementale()
+    dati = dict(DATI_COMPLETI, durc_protocollo="INPS_1")
+    valori = [f"{dati.get(campo) or ''} {i}" for i in range(2)]
+    contatore = [0]
+
+    def esegui():
+        contatore[0] ^= 1
+        dati[campo] = valori[contatore[0]]
+        return render.genera(dati)
+    return esegui
+
+
+def casi() -> List[Tuple[str, Callable[[], object]]]:
+    """Elenco (nome, funzione senza argomenti) dei casi da misurare."""
+    elenco = []
+    for nome, dati in CASI_DATI.items():
+        elenco.append((f"genera_testo_completo/{nome}", lambda d=dati: genera_testo_completo(d)))
+        elenco.append((f"genera_premesse/{nome}", lambda d=dati: genera_premesse(d)))
+        elenco.append((f"assembla_visti/{nome}", lambda d=dati: assembla_visti(d)))
+
+    for nome in ("tipico", "motivazione_lunga", "non_ascii"):
+        dati = CASI_DATI[nome]
+        premesse, dispositivo = genera_testo_completo(dati)
+        elenco.append((f"genera_rtf/{nome}", lambda d=dati, p=premesse, t=dispositivo: genera_rtf(d, p, t)))
+
+    testi_rtf = {
+        "breve_ascii": "Fornitura di PC per gli uffici comunali {art. 50}\n",
+        "non_ascii": TESTO_NON_ASCII * 40,
+        "motivazione_lunga": DATI_MOTIVAZIONE_LUNGA["motivazione"],
+        "premesse_completo": genera_testo_completo(DATI_COMPLETI)[0],
+    }
+    for nome, testo in testi_rtf.items():
+        elenco.append((f"escape_rtf/{nome}", lambda t=testo: escape_rtf(t)))
+
+    # Rendering incrementale: a ogni chiamata cambia un solo campo
+    for nome, campo in (("durc", "durc_protocollo"), ("visto", "visto_nome"), ("motivazione", "motivazione")):
+        elenco.append((f"render_incrementale/{nome}", _modifica_un_campo(campo)))
+
+    for n in (10, 1000, 10_000):
+        elenco.append((f"riepilogo_iva/{n}_righe", lambda r=righe_offerta(n): riepilogo_iva(r)))
+
+    for n in (0, 21, 4999, 5000, 5001, 128_918, 999_999_999):
+        elenco.append((f"numero_in_lettere/{n}", lambda n=n: numero_in_lettere(n)))
+    return elenco
+
+
+# =============================================================================
+# MISURA
+# =============================================================================
+
+def percentile(valori: List[float], p: float) -> float:
+    """Percentile con interpolazione lineare su valori già ordinati."""
+    if len(valori) == 1:
+        return valori[0]
+    posizione = (len(valori) - 1) * p
+    basso = int(posizione)
+    alto = min(basso + 1, len(valori) - 1)
+    return valori[basso] + (valori[alto] - valori[basso]) * (posizione - basso)
+
+
+def cronometra(funzione: Callable[[], object], durata: float, min_ripetizioni: int) -> List[int]:
+    """Tempi (ns) delle singole chiamate per almeno `durata` secondi, con il GC sospeso."""
+    tempi = []
+    orologio = time.perf_counter_ns
+    gc_attivo = gc.isenabled()
+    gc.disable()
+    try:
+        fine = orologio() + int(durata * 1e9)
+        while len(tempi) < min_ripetizioni or orologio() < fine:
+            inizio = orologio()
+            funzione()
+            tempi.append(orologio() - inizio)
+    finally:
+        if gc_attivo:
+            gc.enable()
+    return tempi
+
+
+def picco_memoria(funzione: Callable[[], object], ripetizioni: int = 3) -> int:
+    """
+    Picco di memoria (bytes) allocata da una chiamata, misurato a parte con
+    tracemalloc: rallenta l'esecuzione e falserebbe i tempi.
+    """
+    tracemalloc.start()
+    try:
+        picco = 0
+        for _ in range(ripetizioni):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            funzione()
+            picco = max(picco, tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    return picco
+
+
+def esegui(filtro: str = "", durata: float = 0.3, giri: int = 5,
+           min_ripetizioni: int = 20) -> Dict[str, Dict[str, float]]:
+    """
+    Misura i casi selezionati in `giri` passate alternate (ognuna lunga
+    durata/giri per caso), così un disturbo temporaneo della macchina
+    colpisce un giro e non un intero caso. Oltre ai percentili su tutte le
+    chiamate riporta `p50_min_us`, la mediana del giro migliore, che è la
+    metrica usata per il confronto con la baseline.
+    """
+    selezionati = [(nome, f) for nome, f in casi() if not filtro or filtro in nome]
+    for _, funzione in selezionati:
+        funzione()  # riscaldamento: template compilati, cache dei moduli
+
+    tempi: Dict[str, List[int]] = {nome: [] for nome, _ in selezionati}
+    mediane: Dict[str, List[float]] = {nome: [] for nome, _ in selezionati}
+    for _ in range(giri):
+        for nome, funzione in selezionati:
+            giro = cronometra(funzione, durata / giri, max(1, min_ripetizioni // giri))
+            tempi[nome].extend(giro)
+            mediane[nome].append(statistics.median(giro))
+
+    risultati = {}
+    for nome, funzione in selezionati:
+        valori = sorted(tempi[nome])
+        r = risultati[nome] = {
+            "ripetizioni": len(valori),
+            "ops_s": round(len(valori) / (sum(valori) / 1e9), 1),
+            "p50_us": round(percentile(valori, 0.50) / 1000, 3),
+            "p90_us": round(percentile(valori, 0.90) / 1000, 3),
+            "p99_us": round(percentile(valori, 0.99) / 1000, 3),
+            "media_us": round(statistics.fmean(valori) / 1000, 3),
+            "p50_min_us": round(min(mediane[nome]) / 1000, 3),
+            "picco_bytes": picco_memoria(funzione),
+        }
+        print(f"{nome:45s} {r['ops_s']:>12,.0f} ops/s  p50 {r['p50_us']:>10.2f} us  "
+              f"p99 {r['p99_us']:>10.2f} us  picco {r['picco_bytes'] / 1024:>9.1f} KiB")
+    return risultati
+
+
+# =============================================================================
+# BASELINE E CONFRONTO
+# =============================================================================
+
+def salva_baseline(percorso: str, risultati: Dict[str, Dict[str, float]]) -> None:
+    documento = {
+        "creata": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "piattaforma": platform.platform(),
+        "risultati": risultati,
+    }
+    with open(percorso, "w", encoding="utf-8") as f:
+        json.dump(documento, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+def confronta(baseline: Dict[str, Dict[str, float]], attuali: Dict[str, Dict[str, float]],
+              tolleranza: float, tolleranza_memoria: float) -> List[str]:
+    """
+    Confronta la mediana del giro migliore (p50_min_us, la metrica meno
+    sensibile al rumore della macchina) e il picco di memoria con la
+    baseline. Restituisce le regressioni oltre tolleranza.
+    """
+    regressioni = []
+    for nome, attuale in attuali.items():
+        riferimento = baseline.get(nome)
+        if riferimento is None:
+            continue
+        atteso = riferimento["p50_min_us"]
+        rapporto = attuale["p50_min_us"] / atteso if atteso else 1.0
+        if rapporto > 1 + tolleranza:
+            regressioni.append(f"{nome}: p50 {atteso:.2f} -> {attuale['p50_min_us']:.2f} us "
+                               f"(+{(rapporto - 1) * 100:.0f}%)")
+        # Sotto 1 KiB le differenze sono rumore dell'interprete
+        if max(attuale["picco_bytes"], riferimento["picco_bytes"]) >= 1024:
+            rapporto_mem = (attuale["picco_bytes"] / riferimento["picco_bytes"]
+                            if riferimento["picco_bytes"] else float("inf"))
+            if rapporto_mem > 1 + tolleranza_memoria:
+                regressioni.append(f"{nome}: picco memoria {riferimento['picco_bytes']} -> "
+                                   f"{attuale['picco_bytes']} bytes (+{(rapporto_mem - 1) * 100:.0f}%)")
+    return regressioni
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmark di logic engine e generatore RTF.")
+    parser.add_argument("-k", "--filtro", default="", help="Misura solo i casi il cui nome contiene il testo")
+    parser.add_argument("--durata", type=float, default=0.3, help="Secondi di misura per caso")
+    parser.add_argument("--giri", type=int, default=5, help="Passate alternate su tutti i casi")
+    parser.add_argument("--salva", metavar="JSON", help="Salva i risultati come baseline")
+    parser.add_argument("--confronta", metavar="JSON", help="Confronta con una baseline salvata")
+    parser.add_argument("--tolleranza", type=float, default=0.15,
+                        help="Peggioramento massimo ammesso della latenza mediana (0.15 = +15%%)")
+    parser.add_argument("--tolleranza-memoria", type=float, default=0.25,
+                        help="Peggioramento massimo ammesso del picco di memoria")
+    args = parser.parse_args(argv)
+
+    risultati = esegui(args.filtro, args.durata, args.giri)
+
+    if args.salva:
+        salva_baseline(args.salva, risultati)
+        print(f"Baseline salvata in {args.salva}")
+
+    if args.confronta:
+        with open(args.confronta, encoding="utf-8") as f:
+            baseline = json.load(f)["risultati"]
+        regressioni = confronta(baseline, risultati, args.tolleranza, args.tolleranza_memoria)
+        mancanti = sorted(set(baseline) - set(risultati)) if not args.filtro else []
+        for nome in mancanti:
+            print(f"nota: caso '{nome}' presente nella baseline ma non misurato")
+        if regressioni:
+            print(f"\nREGRESSIONI (tolleranza latenza {args.tolleranza:.0%}, "
+                  f"memoria {args.tolleranza_memoria:.0%}):", file=sys.stderr)
+            for riga in regressioni:
+                print(f"  {riga}", file=sys.stderr)
+            return 1
+        print(f"\nNessuna regressione rispetto a {args.confronta}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
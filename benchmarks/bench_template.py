@@ -0,0 +1,122 @@
+"""
+DETERMINAFACILE - Benchmark rendering testi
+Misura il throughput di genera_testo_completo su un batch di determine
+e, opzionalmente, lo confronta con il logic_engine di una revisione git
+precedente (es. quella con le sezioni costruite da template Jinja2).
+Le revisioni con i testi in templates/ vengono estratte insieme ai loro
+template.
+
+Uso:
+    python benchmarks/bench_template.py -n 20000
+    python benchmarks/bench_template.py -n 20000 --riferimento HEAD~1
+"""
+
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+RADICE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RADICE)
+
+import logic_engine  # noqa: E402
+
+
+DATI_ESEMPIO = {
+    "comune": "Comune di Città Sant'Angelo", "area_settore": "AREA TECNICA",
+    "nome_responsabile": "Mario Rossi", "regolamento_comunale": "C.C. n. 5 del 2020",
+    "data_atto": datetime(2025, 3, 14), "oggetto": "Fornitura di PC per gli uffici",
+    "motivazione": "Servono nuovi computer perché quelli attuali sono obsoleti.",
+    "finalita": "garantire l'efficienza degli uffici", "durata_servizio": "30 giorni",
+    "ragione_sociale": "Alfa S.r.l.", "indirizzo": "Via Roma 1", "cap": "65013",
+    "citta": "Pescara", "provincia_fornitore": "PE", "piva_cf": "01234567890",
+    "tipo_documento": "preventivo", "numero_preventivo": "77",
+    "data_preventivo": datetime(2025, 3, 1), "criterio_scelta": "affidabilità pregressa",
+    "operatore_uscente": True, "imponibile": 12500.5, "aliquota_iva": 22, "cig": "Z123456789",
+    "capitolo_bilancio": "1043", "esercizio_finanziario": 2025,
+    "rup_nome": "Mario Rossi", "rup_cognome": "", "rup_qualifica": "Responsabile del Settore",
+    "piccola_fornitura": True,
+    "dup_num": "28", "dup_data": datetime(2024, 7, 29), "dup_periodo": "2025/2027",
+    "nota_dup_num": "54", "nota_dup_data": datetime(2024, 11, 30),
+    "bilancio_num": "55", "bilancio_data": datetime(2024, 12, 20), "bilancio_triennio": "2025-2027",
+    "peg_num": "112", "peg_data": datetime(2025, 1, 10), "peg_periodo": "2025/2027",
+    "durc_protocollo": "INPS_47495993", "durc_esito": "REGOLARE", "durc_scadenza": datetime(2025, 6, 30),
+    "visto_nome": "Dott. Giuseppe Verdi", "includi_visto": True,
+    "tar_competente": "TAR Abruzzo", "includi_ricorsi": True, "includi_conflitto": True,
+}
+
+
+def git_show(revisione: str, percorso: str) -> bytes:
+    """Contenuto del file `percorso` alla revisione git indicata."""
+    return subprocess.run(
+        ["git", "show", f"{revisione}:{percorso}"],
+        cwd=RADICE, check=True, capture_output=True
+    ).stdout
+
+
+def carica_riferimento(revisione: str):
+    """
+    Importa il logic_engine.py della revisione git indicata come modulo
+    separato, con accanto la cartella templates/ della stessa revisione
+    (se esiste): i template sono cercati vicino al modulo.
+    """
+    cartella = tempfile.mkdtemp()
+    template = subprocess.run(
+        ["git", "ls-tree", "-r", "--name-only", revisione, "templates/"],
+        cwd=RADICE, check=True, capture_output=True, text=True
+    ).stdout.split()
+    for nome in template:
+        destinazione = os.path.join(cartella, nome)
+        os.makedirs(os.path.dirname(destinazione), exist_ok=True)
+        with open(destinazione, "wb") as f:
+            f.write(git_show(revisione, nome))
+    percorso = os.path.join(cartella, "logic_engine_riferimento.py")
+    with open(percorso, "wb") as f:
+        f.write(git_show(revisione, "logic_engine.py"))
+    spec = importlib.util.spec_from_file_location("logic_engine_riferimento", percorso)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def misura(modulo, batch: list) -> float:
+    """Restituisce le determine al secondo generate da `modulo` sul batch."""
+    modulo.genera_testo_completo(batch[0])  # riscaldamento (import pigri, compilazione template)
+    inizio = time.perf_counter()
+    for dati in batch:
+        modulo.genera_testo_completo(dati)
+    return len(batch) / (time.perf_counter() - inizio)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark di genera_testo_completo.")
+    parser.add_argument("-n", type=int, default=10000, help="Determine nel batch")
+    parser.add_argument("--riferimento", help="Revisione git da confrontare (es. HEAD~1)")
+    args = parser.parse_args()
+
+    batch = [dict(DATI_ESEMPIO, num_determina_settore=str(i), imponibile=1000 + i % 9000)
+             for i in range(args.n)]
+
+    attuale = misura(logic_engine, batch)
+    print(f"attuale:     {attuale:10.0f} determine/s")
+
+    if args.riferimento:
+        modulo_rif = carica_riferimento(args.riferimento)
+        riferimento = misura(modulo_rif, batch)
+        print(f"riferimento: {riferimento:10.0f} determine/s ({args.riferimento})")
+        print(f"speedup:     {attuale / riferimento:10.2f}x")
+
+        # Il confronto ha senso solo se i testi prodotti sono identici
+        for dati in batch[:100]:
+            if logic_engine.genera_testo_completo(dati) != modulo_rif.genera_testo_completo(dati):
+                print("ATTENZIONE: i testi generati differiscono dal riferimento", file=sys.stderr)
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+"""
+DETERMINAFACILE - Vocabolario CPV Offline v1.0
+Ricerca locale dei codici CPV (Common Procurement Vocabulary) a partire
+dall'oggetto o dalla motivazione, senza chiamate di rete.
+- Vocabolario letto da un file CSV incluso (data/cpv_it.csv) o indicato
+  con la variabile d'ambiente DETERMINAFACILE_CPV; è accettato anche
+  l'export ufficiale del vocabolario (colonne CODE / IT)
+- Indice invertito sulle descrizioni italiane con rimozione degli accenti
+  e stemming leggero
+- Trigrammi sui termini dell'indice per tollerare gli errori di battitura
+I codici restituiti provengono sempre dal vocabolario: niente testo inventato.
+"""
+
+import csv
+import heapq
+import math
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+
+PERCORSO_VOCABOLARIO = os.environ.get(
+    "DETERMINAFACILE_CPV",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cpv_it.csv")
+)
+
+
+# =============================================================================
+# NORMALIZZAZIONE DEL TESTO
+# =============================================================================
+
+PAROLE_VUOTE = frozenset((
+    "a", "ad", "al", "alla", "alle", "agli", "ai", "all", "con", "da", "dal",
+    "dalla", "dei", "del", "della", "delle", "degli", "dell", "di", "e", "ed",
+    "gli", "i", "il", "in", "la", "le", "lo", "l", "nei", "nel", "nella",
+    "nelle", "o", "per", "su", "sul", "sulla", "tra", "fra", "un", "una", "uno",
+    "non", "nonche", "escluso", "esclusi", "esclusa", "escluse", "incluso",
+    "affini", "connessi", "vari", "varie", "altri", "altre", "servono",
+    "acquisto", "fornitura", "affidamento", "comunale", "comunali",
+    "nuovo", "nuovi", "nuova", "nuove",
+))
+
+# Suffissi flessivi e derivativi, dal più lungo al più corto
+SUFFISSI = tuple(sorted((
+    "azione", "azioni", "amento", "amenti", "imento", "imenti", "mente",
+    "zione", "zioni", "ista", "iste", "isti", "iche", "ichi", "ico", "ici",
+    "ica", "ale", "ali", "are", "ere", "ire", "ato", "ati", "ata", "ate",
+    "ito", "iti", "ita", "ite", "uto", "uti", "uta", "ute", "ore", "ori",
+    "ice", "o", "i", "a", "e",
+), key=len, reverse=True))
+
+# Termini d'uso comune assenti dalle descrizioni ufficiali
+SINONIMI = {
+    "pc": "computer",
+    "notebook": "portatili",
+    "laptop": "portatili",
+    "monitor": "schermi",
+    "stampante": "stampanti",
+    "fotocopiatore": "fotocopiatrici",
+    "cancelleria": "cartoleria",
+    "sito": "siti",
+    "web": "www",
+    "mensa": "mensa ristorazione",
+    "verde": "zone verdi",
+    "neve": "sgombero neve",
+    "avvocato": "giuridica",
+    "legale": "giuridici",
+}
+
+_RE_PAROLE = re.compile(r"[a-z0-9]+")
+# Richiesta che è solo un codice, anche parziale ('30', '302131', '30213100-6')
+_RE_SOLO_CODICE = re.compile(r"\s*(\d{2,8})(?:-\d)?\s*")
+# Codice citato in un testo: almeno 5 cifre, perché '15 sedie' non è un codice
+_RE_CODICE = re.compile(r"\b(\d{5,8})(?:-\d)?\b")
+
+# Oltre questa frazione del vocabolario un termine (es. 'servizi') non
+# apre nuovi candidati: contribuisce solo al punteggio di quelli trovati
+FRAZIONE_TERMINI_COMUNI = 0.1
+
+# Somiglianza minima (Jaccard sui trigrammi) per la corrispondenza approssimata
+SOGLIA_TRIGRAMMI = 0.45
+
+
+def piega_accenti(testo: str) -> str:
+    """Minuscolo senza accenti: 'Attività' -> 'attivita'."""
+    decomposto = unicodedata.normalize("NFKD", testo.lower())
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def radice(parola: str) -> str:
+    """Stemming leggero per l'italiano: rimuove il suffisso più lungo lasciando almeno 3 lettere."""
+    for suffisso in SUFFISSI:
+        if parola.endswith(suffisso) and len(parola) - len(suffisso) >= 3:
+            return parola[:-len(suffisso)]
+    return parola
+
+
+def termini(testo: str) -> List[str]:
+    """Radici significative del testo, nell'ordine in cui compaiono."""
+    risultato = []
+    for parola in _RE_PAROLE.findall(piega_accenti(testo)):
+        for parola in SINONIMI.get(parola, parola).split():
+            if parola in PAROLE_VUOTE or (len(parola) < 2 and not parola.isdigit()):
+                continue
+            risultato.append(radice(parola))
+    return risultato
+
+
+def trigrammi(termine: str) -> frozenset:
+    """Trigrammi del termine con un delimitatore ai bordi."""
+    esteso = f"^{termine}$"
+    return frozenset(esteso[i:i + 3] for i in range(len(esteso) - 2))
+
+
+# =============================================================================
+# INDICE
+# =============================================================================
+
+@dataclass(frozen=True)
+class CandidatoCPV:
+    """Codice CPV proposto per un testo, con il punteggio di pertinenza."""
+    codice: str
+    descrizione: str
+    punteggio: float
+
+    def __str__(self) -> str:
+        return f"{self.codice} - {self.descrizione}"
+
+
+class IndiceCPV:
+    """
+    Indice invertito del vocabolario CPV.
+
+    Args:
+        voci: Coppie (codice, descrizione), es. ('30213100-6', 'Computer portatili')
+    """
+
+    def __init__(self, voci: Iterable[Tuple[str, str]]):
+        self.codici: List[str] = []
+        self.descrizioni: List[str] = []
+        self._cifre: List[str] = []
+        postings: Dict[str, List[int]] = defaultdict(list)
+        lunghezze: List[int] = []
+
+        for codice, descrizione in voci:
+            indice = len(self.codici)
+            self.codici.append(codice.strip())
+            self.descrizioni.append(descrizione.strip())
+            self._cifre.append(codice.split("-")[0].strip())
+            radici = set(termini(descrizione))
+            lunghezze.append(len(radici))
+            for termine in radici:
+                postings[termine].append(indice)
+
+        totale = max(len(self.codici), 1)
+        # Descrizioni più brevi pesano di più: 'Computer portatili' batte
+        # una descrizione lunga che cita i computer tra molte altre cose
+        self._norma = [1.0 / math.sqrt(max(n, 1)) for n in lunghezze]
+        self._postings = {t: tuple(p) for t, p in postings.items()}
+        self._idf = {t: math.log(1 + totale / len(p)) for t, p in postings.items()}
+        self._soglia_comuni = max(1, int(totale * FRAZIONE_TERMINI_COMUNI))
+        self._insiemi_comuni = {
+            t: frozenset(p) for t, p in self._postings.items() if len(p) > self._soglia_comuni
+        }
+
+        self._trigrammi: Dict[str, List[str]] = defaultdict(list)
+        self._trigrammi_termine: Dict[str, frozenset] = {}
+        for termine in self._postings:
+            grammi = trigrammi(termine)
+            self._trigrammi_termine[termine] = grammi
+            for grammo in grammi:
+                self._trigrammi[grammo].append(termine)
+
+    def __len__(self) -> int:
+        return len(self.codici)
+
+    @classmethod
+    def da_file(cls, percorso: str = PERCORSO_VOCABOLARIO) -> "IndiceCPV":
+        """Carica il vocabolario da CSV (';', ',' o tabulazione come separatore)."""
+        with open(percorso, encoding="utf-8-sig", newline="") as f:
+            intestazione = f.readline()
+            f.seek(0)
+            separatore = max(";,\t", key=intestazione.count)
+            lettore = csv.DictReader(f, delimiter=separatore)
+            colonne = {c.strip().lower(): c for c in lettore.fieldnames or ()}
+            col_codice = colonne.get("codice") or colonne.get("code")
+            col_descrizione = colonne.get("descrizione") or colonne.get("it")
+            if not col_codice or not col_descrizione:
+                raise ValueError(f"Colonne del vocabolario CPV non riconosciute: {lettore.fieldnames}")
+            return cls(
+                (riga[col_codice], riga[col_descrizione])
+                for riga in lettore if riga.get(col_codice) and riga.get(col_descrizione)
+            )
+
+    def _approssimati(self, termine: str) -> List[Tuple[str, float]]:
+        """Termini dell'indice simili a `termine` (errori di battitura, varianti)."""
+        grammi = trigrammi(termine)
+        comuni: Dict[str, int] = defaultdict(int)
+        for grammo in grammi:
+            for candidato in self._trigrammi.get(grammo, ()):
+                comuni[candidato] += 1
+        simili = []
+        for candidato, n in comuni.items():
+            somiglianza = n / (len(grammi) + len(self._trigrammi_termine[candidato]) - n)
+            if somiglianza >= SOGLIA_TRIGRAMMI:
+                simili.append((candidato, somiglianza))
+        simili.sort(key=lambda x: -x[1])
+        return simili[:3]
+
+    def _cerca_codice(self, cifre: str, limite: int) -> List[CandidatoCPV]:
+        trovati = [i for i, c in enumerate(self._cifre) if c.startswith(cifre)]
+        trovati.sort(key=lambda i: self._cifre[i])
+        return [CandidatoCPV(self.codici[i], self.descrizioni[i], 1.0) for i in trovati[:limite]]
+
+    def cerca(self, testo: str, limite: int = 5) -> List[CandidatoCPV]:
+        """
+        Restituisce i codici più pertinenti per `testo`, in ordine di punteggio.
+        Una richiesta che è solo un codice (anche parziale, es. '302131')
+        viene cercata per prefisso del codice; i codici di almeno 5 cifre
+        citati in un testo precedono i risultati della ricerca testuale.
+        """
+        if not testo:
+            return []
+        solo_codice = _RE_SOLO_CODICE.fullmatch(testo)
+        if solo_codice:
+            trovati = self._cerca_codice(solo_codice.group(1), limite)
+            if trovati:
+                return trovati
+
+        risultati: Dict[str, CandidatoCPV] = {}
+        for codice in _RE_CODICE.finditer(testo):
+            for candidato in self._cerca_codice(codice.group(1), limite):
+                risultati.setdefault(candidato.codice, candidato)
+        for candidato in self._cerca_testo(testo, limite):
+            risultati.setdefault(candidato.codice, candidato)
+        return list(risultati.values())[:limite]
+
+    def _cerca_testo(self, testo: str, limite: int) -> List[CandidatoCPV]:
+        # Ogni termine della richiesta diventa una lista di (termine indicizzato, peso)
+        richiesta: Dict[str, float] = {}
+        for termine in termini(testo):
+            if termine in self._postings:
+                richiesta[termine] = max(richiesta.get(termine, 0.0), 1.0)
+            else:
+                for simile, somiglianza in self._approssimati(termine):
+                    richiesta[simile] = max(richiesta.get(simile, 0.0), somiglianza)
+        if not richiesta:
+            return []
+
+        # Prima i termini rari, che individuano i candidati; i termini comuni
+        # aggiornano solo il punteggio dei candidati già trovati
+        ordinati = sorted(richiesta, key=lambda t: len(self._postings[t]))
+        punteggi: Dict[int, float] = defaultdict(float)
+        for termine in ordinati:
+            peso = richiesta[termine] * self._idf[termine]
+            postings = self._postings[termine]
+            if punteggi and termine in self._insiemi_comuni:
+                insieme = self._insiemi_comuni[termine]
+                for indice in punteggi:
+                    if indice in insieme:
+                        punteggi[indice] += peso
+            else:
+                for indice in postings:
+                    punteggi[indice] += peso
+
+        norma, cifre = self._norma, self._cifre
+        migliori = heapq.nsmallest(
+            limite, punteggi.items(), key=lambda x: (-x[1] * norma[x[0]], cifre[x[0]])
+        )
+        return [
+            CandidatoCPV(self.codici[i], self.descrizioni[i], round(p * self._norma[i], 4))
+            for i, p in migliori
+        ]
+
+
+@lru_cache(maxsize=1)
+def indice_predefinito() -> IndiceCPV:
+    """Indice del vocabolario incluso, costruito una sola volta per processo."""
+    return IndiceCPV.da_file(PERCORSO_VOCABOLARIO)
+
+
+def cerca_cpv(testo: str, limite: int = 5) -> List[CandidatoCPV]:
+    """Scorciatoia: cerca nel vocabolario predefinito."""
+    return indice_predefinito().cerca(testo, limite)
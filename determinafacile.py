@@ -0,0 +1,102 @@
+"""
+DETERMINAFACILE - Riga di Comando v1.0
+Genera una determina da un file JSON o YAML con il dizionario `dati` (le
+stesse chiavi di batch.py, date come '2025-03-14' o '14/03/2025'), senza
+avviare Streamlit: pensato per script di shell e cron.
+- Importa solo il motore (logic_engine, document_generator, la
+  normalizzazione di batch.py): niente streamlit né openai
+- PyYAML è richiesto (e importato) solo per i file .yaml/.yml
+
+Codici di uscita: 0 generata, 1 dati non validi, 2 file non leggibile.
+
+Uso:
+    python determinafacile.py dati.json                # ./Determina_....rtf
+    python determinafacile.py dati.yaml -o atti/       # nella cartella atti/
+    python determinafacile.py dati.json -o - > atto.rtf
+    cat dati.json | python determinafacile.py - -o -
+    python determinafacile.py dati.json --verifica     # solo valida_dati
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List, Optional
+
+from batch import normalizza_dati
+from document_generator import FORMATI, genera_nome_file
+from logic_engine import valida_dati
+from render_cache import genera_testi
+
+
+ESTENSIONI_YAML = (".yaml", ".yml")
+
+
+def leggi_dati(percorso: str) -> Dict:
+    """Dizionario `dati` da un file JSON o YAML ('-' = JSON da stdin)."""
+    if percorso == "-":
+        dati = json.load(sys.stdin)
+    elif percorso.lower().endswith(ESTENSIONI_YAML):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("Per i file YAML serve PyYAML (pip install pyyaml)") from None
+        with open(percorso, encoding="utf-8-sig") as f:
+            dati = yaml.safe_load(f)
+    else:
+        with open(percorso, encoding="utf-8-sig") as f:
+            dati = json.load(f)
+    if not isinstance(dati, dict):
+        raise ValueError("Il file deve contenere un oggetto con i dati della determina")
+    return normalizza_dati(dati)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="determinafacile",
+        description="Genera una determina (RTF, DOCX o ODT) da un file JSON o YAML.",
+    )
+    parser.add_argument("file", help="File dei dati (.json, .yaml, .yml; '-' = JSON da stdin)")
+    parser.add_argument("-o", "--output", default=".",
+                        help="File o cartella di destinazione, '-' = stdout (default: cartella corrente)")
+    parser.add_argument("-f", "--formato", choices=list(FORMATI), default="rtf",
+                        help="Formato del documento (default: rtf)")
+    parser.add_argument("--verifica", action="store_true",
+                        help="Valida i dati senza generare il documento")
+    args = parser.parse_args(argv)
+
+    try:
+        dati = leggi_dati(args.file)
+    except (OSError, ValueError) as e:
+        print(f"{args.file}: {e}", file=sys.stderr)
+        return 2
+
+    valido, errori = valida_dati(dati)
+    for errore in errori:
+        print(errore, file=sys.stderr)
+    if not valido or args.verifica:
+        return 0 if valido else 1
+
+    premesse, dispositivo = genera_testi(dati)
+    scrittore, estensione, _ = FORMATI[args.formato]
+    if args.output == "-":
+        try:
+            scrittore(dati, premesse, dispositivo, sys.stdout.buffer)
+            sys.stdout.buffer.flush()
+        except BrokenPipeError:
+            # Es. `| head`: chi legge ha chiuso, niente traceback all'uscita
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 1
+        return 0
+
+    destinazione = args.output
+    if os.path.isdir(destinazione):
+        destinazione = os.path.join(destinazione, f"{genera_nome_file(dati)}.{estensione}")
+    with open(destinazione, "wb") as f:
+        scrittore(dati, premesse, dispositivo, f)
+    print(destinazione, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
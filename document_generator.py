@@ -1,129 +1,179 @@
 """
 REGOLA Standalone v1.0 - Document Generator
-Modulo per la generazione di documenti RTF formattati.
+Modulo per la generazione di documenti RTF, DOCX e ODT formattati.
 Gestisce correttamente i caratteri speciali italiani.
+DOCX e ODT sono scritti senza Word né LibreOffice: le parti XML sono
+prodotte come testo e scritte in streaming nel file zip, senza DOM.
 """
 
 from datetime import datetime
-from typing import Dict
+from typing import BinaryIO, Dict, List, Tuple, Union
 from decimal import Decimal
+import codecs
+import io
 import re
 
+from strumentazione import sezione
+
 
 # =============================================================================
 # GESTIONE CARATTERI SPECIALI RTF
 # =============================================================================
 
+class _TabellaEscapeRTF(dict):
+    """
+    Tabella di traduzione (codice Unicode -> escape RTF) per i caratteri non ASCII.
+    I caratteri della code page 1252 sono precaricati all'import come \\'hh;
+    tutti gli altri vengono convertiti al primo incontro in \\uN? (con '?'
+    come sostituto per i lettori senza Unicode, coerente con \\uc1 nell'header)
+    e memorizzati, così ogni carattere distinto è calcolato una sola volta.
+    """
+
+    def __missing__(self, codice: int) -> str:
+        # RTF usa interi a 16 bit con segno; fuori dal BMP servono i surrogati
+        unita = chr(codice).encode("utf-16-le")
+        escape = "".join(
+            "\\u%d?" % (u - 0x10000 if u >= 0x8000 else u)
+            for u in (int.from_bytes(unita[i:i + 2], "little")
+                      for i in range(0, len(unita), 2))
+        )
+        self[codice] = escape
+        return escape
+
+
+def _crea_tabella_escape() -> _TabellaEscapeRTF:
+    tabella = _TabellaEscapeRTF()
+    # Accentate, €, virgolette tipografiche, trattini, spazio non separabile, ...
+    for byte in range(0x80, 0x100):
+        try:
+            carattere = bytes([byte]).decode("cp1252")
+        except UnicodeDecodeError:
+            continue
+        tabella[ord(carattere)] = "\\'%02x" % byte
+    return tabella
+
+
+_TABELLA_ESCAPE_RTF = _crea_tabella_escape()
+
+
+def _escape_non_ascii(errore: UnicodeEncodeError) -> tuple:
+    """Gestore d'errore del codec: converte ogni sequenza di caratteri non ASCII."""
+    sequenza = errore.object[errore.start:errore.end]
+    return sequenza.translate(_TABELLA_ESCAPE_RTF), errore.end
+
+
+codecs.register_error("determinafacile.rtf", _escape_non_ascii)
+
+
+@sezione("escape_rtf")
 def escape_rtf(text: str) -> str:
     """
     Converte i caratteri speciali italiani e altri caratteri in escape RTF.
     
+    Il testo ASCII viene copiato dal codec in C; solo le sequenze di caratteri
+    non ASCII passano dalla tabella di traduzione, per cui il costo resta
+    lineare anche su campi narrativi di diversi megabyte.
+    
     Args:
         text: Testo da convertire
     
     Returns:
-        Testo con escape RTF
+        Testo con escape RTF (solo caratteri ASCII)
     """
     if not text:
         return ""
     
-    # Prima escape dei caratteri RTF speciali
-    text = text.replace("\\", "\\\\")
-    text = text.replace("{", "\\{")
-    text = text.replace("}", "\\}")
-    
-    # Mappa caratteri italiani -> codici RTF
-    char_map = {
-        # Vocali accentate minuscole
-        'à': "\\'e0",
-        'è': "\\'e8",
-        'é': "\\'e9",
-        'ì': "\\'ec",
-        'ò': "\\'f2",
-        'ù': "\\'f9",
-        # Vocali accentate maiuscole
-        'À': "\\'c0",
-        'È': "\\'c8",
-        'É': "\\'c9",
-        'Ì': "\\'cc",
-        'Ò': "\\'d2",
-        'Ù': "\\'d9",
-        # Altri caratteri comuni
-        '€': "\\'80",
-        '°': "\\'b0",
-        '§': "\\'a7",
-        '©': "\\'a9",
-        '®': "\\'ae",
-        '–': "\\'96",  # En dash
-        '—': "\\'97",  # Em dash
-        '"': "\\'93",  # Left double quote
-        '"': "\\'94",  # Right double quote
-        ''': "\\'91",  # Left single quote
-        ''': "\\'92",  # Right single quote
-        '…': "\\'85",  # Ellipsis
-    }
-    
-    for char, escape in char_map.items():
-        text = text.replace(char, escape)
-    
-    # Gestione newline
-    text = text.replace("\n\n", "\\par\\par ")
-    text = text.replace("\n", "\\par ")
+    # Prima escape dei caratteri RTF speciali e dei newline
+    text = (
+        text.replace("\\", "\\\\")
+        .replace("{", "\\{")
+        .replace("}", "\\}")
+        .replace("\n", "\\par ")
+    )
     
-    return text
+    return text.encode("ascii", "determinafacile.rtf").decode("ascii")
 
 
 # =============================================================================
 # TEMPLATE RTF
 # =============================================================================
 
-def genera_rtf(dati: Dict, testo_premesse: str, testo_dispositivo: str) -> str:
+# Header RTF con font e impostazioni pagina
+RTF_HEADER = rb"""{\rtf1\ansi\ansicpg1252\deff0\deflang1040
+{\fonttbl
+{\f0\froman\fcharset0 Times New Roman;}
+{\f1\fswiss\fcharset0 Arial;}
+}
+{\colortbl;\red0\green0\blue0;\red128\green128\blue128;}
+\paperw11906\paperh16838\margl1417\margr1417\margt1417\margb1134
+\viewkind4\uc1"""
+
+# Footer RTF
+RTF_FOOTER = rb"""
+}"""
+
+# Caratteri di testo convertiti e scritti per ogni blocco dei campi lunghi
+DIMENSIONE_BLOCCO = 64 * 1024
+
+
+def _scrivi_testo(destinazione: BinaryIO, testo: str) -> int:
+    """
+    Scrive un testo lungo con escape RTF a blocchi, senza crearne la copia
+    convertita per intero. L'escape è carattere per carattere, quindi i
+    blocchi possono essere tagliati in qualunque punto.
+    """
+    scritti = 0
+    for inizio in range(0, len(testo), DIMENSIONE_BLOCCO):
+        blocco = escape_rtf(testo[inizio:inizio + DIMENSIONE_BLOCCO])
+        scritti += destinazione.write(blocco.encode("cp1252"))
+    return scritti
+
+
+@sezione("scrivi_rtf")
+def scrivi_rtf(dati: Dict, testo_premesse: str, testo_dispositivo: str,
+               destinazione: BinaryIO) -> int:
     """
-    Genera il documento RTF completo della determina.
+    Scrive il documento RTF della determina, sezione per sezione, come bytes
+    cp1252 su un oggetto binario (file, io.BytesIO, socket.makefile('wb'), ...).
+    Ogni campo viene convertito una sola volta e il documento completo non
+    viene mai costruito in memoria.
     
     Args:
         dati: Dizionario con tutti i dati del form
         testo_premesse: Testo delle premesse generato da logic_engine
         testo_dispositivo: Testo del dispositivo generato da logic_engine
+        destinazione: Oggetto binario con metodo write()
     
     Returns:
-        Stringa con il documento RTF completo
+        Numero di bytes scritti
     """
     # Dati formattati
-    comune = escape_rtf(dati.get("comune", ""))
+    comune = escape_rtf(str(dati.get("comune") or ""))
     provincia = escape_rtf(dati.get("provincia", ""))
     area_settore = escape_rtf(dati.get("area_settore", ""))
     oggetto = escape_rtf(dati.get("oggetto", "").upper())
     
-    num_det_generale = dati.get("num_determina_generale", "______")
-    num_det_settore = dati.get("num_determina_settore", "______")
+    num_det_generale = escape_rtf(str(dati.get("num_determina_generale", "______")))
+    num_det_settore = escape_rtf(str(dati.get("num_determina_settore", "______")))
     
     data_atto = dati.get("data_atto")
     if isinstance(data_atto, datetime):
         data_str = data_atto.strftime("%d/%m/%Y")
     else:
-        data_str = str(data_atto) if data_atto else "___/___/_____"
+        data_str = escape_rtf(str(data_atto)) if data_atto else "___/___/_____"
     
     responsabile = escape_rtf(dati.get("nome_responsabile", ""))
     titolo_resp = escape_rtf(dati.get("titolo_responsabile", ""))
     qualifica_resp = escape_rtf(dati.get("qualifica_responsabile", ""))
     
-    # Escape dei testi lunghi
-    premesse_rtf = escape_rtf(testo_premesse)
-    dispositivo_rtf = escape_rtf(testo_dispositivo)
+    # La prima riga del dispositivo ("D E T E R M I N A") è il titolo centrato
+    titolo_dispositivo, _, corpo_dispositivo = testo_dispositivo.partition("\n")
     
-    # Header RTF con font e impostazioni pagina
-    rtf_header = r"""{\rtf1\ansi\ansicpg1252\deff0\deflang1040
-{\fonttbl
-{\f0\froman\fcharset0 Times New Roman;}
-{\f1\fswiss\fcharset0 Arial;}
-}
-{\colortbl;\red0\green0\blue0;\red128\green128\blue128;}
-\paperw11906\paperh16838\margl1417\margr1417\margt1417\margb1134
-\viewkind4\uc1"""
+    scrivi = destinazione.write
+    scritti = scrivi(RTF_HEADER)
 
     # Intestazione documento
-    intestazione = rf"""
+    scritti += scrivi(rf"""
 \pard\qc\f1\fs28\b COMUNE DI {comune}\b0\par
 \fs22 Provincia di {provincia}\par
 \par
@@ -131,33 +181,37 @@ def genera_rtf(dati: Dict, testo_premesse: str, testo_dispositivo: str) -> str:
 \par
 \pard\qc\b DETERMINAZIONE N. {num_det_settore} del {data_str}\b0\par
 \fs20 (Registro Generale n. {num_det_generale})\par
-\par"""
+\par""".encode("cp1252"))
 
     # Oggetto
-    oggetto_section = rf"""
+    scritti += scrivi(rf"""
 \pard\ql\f0\fs24\par
 \b OGGETTO: \b0 {oggetto}\par
 \par
-\pard\qj\fs22"""
+\pard\qj\fs22""".encode("cp1252"))
 
     # Premesse (con "IL RESPONSABILE DEL SETTORE")
-    premesse_section = rf"""
+    scritti += scrivi(rb"""
 \pard\qc\b IL RESPONSABILE DEL SETTORE\b0\par
 \par
 \pard\qj\fs22
-{premesse_rtf}
-\par\par"""
+""")
+    scritti += _scrivi_testo(destinazione, testo_premesse)
+    scritti += scrivi(rb"""
+\par\par""")
 
     # Dispositivo
-    dispositivo_section = rf"""
-\pard\qc\b\fs24 {dispositivo_rtf.split(chr(92)+'par')[0]}\b0\par
+    scritti += scrivi(rf"""
+\pard\qc\b\fs24 {escape_rtf(titolo_dispositivo)}\b0\par
 \par
 \pard\qj\fs22
-{escape_rtf(chr(10).join(testo_dispositivo.split(chr(10))[1:]))}
-\par\par"""
+""".encode("cp1252"))
+    scritti += _scrivi_testo(destinazione, corpo_dispositivo)
+    scritti += scrivi(rb"""
+\par\par""")
 
     # Firma
-    firma_section = rf"""
+    scritti += scrivi(rf"""
 \pard\qr\fs22\par
 \par
 Il Responsabile del Settore\par
@@ -165,24 +219,362 @@ Il Responsabile del Settore\par
 {qualifica_resp}\par
 \par
 \fs18\i (Documento informatico firmato digitalmente ai sensi del D.Lgs. 82/2005 e ss.mm.ii.)\i0\par
-"""
+""".encode("cp1252"))
 
-    # Footer RTF
-    rtf_footer = r"""
-}"""
+    scritti += scrivi(RTF_FOOTER)
+    return scritti
 
-    # Assemblaggio documento completo
-    documento = (
-        rtf_header +
-        intestazione +
-        oggetto_section +
-        premesse_section +
-        dispositivo_section +
-        firma_section +
-        rtf_footer
-    )
+
+@sezione("genera_rtf")
+def genera_rtf(dati: Dict, testo_premesse: str, testo_dispositivo: str) -> str:
+    """
+    Genera il documento RTF completo della determina come stringa.
+    Per file e download usare scrivi_rtf o esporta_determina_rtf, che
+    producono direttamente i bytes.
     
-    return documento
+    Args:
+        dati: Dizionario con tutti i dati del form
+        testo_premesse: Testo delle premesse generato da logic_engine
+        testo_dispositivo: Testo del dispositivo generato da logic_engine
+    
+    Returns:
+        Stringa con il documento RTF completo
+    """
+    buffer = io.BytesIO()
+    scrivi_rtf(dati, testo_premesse, testo_dispositivo, buffer)
+    return buffer.getvalue().decode("cp1252")
+
+
+# =============================================================================
+# IMPAGINAZIONE COMUNE A DOCX E ODT
+# =============================================================================
+
+# Stili di paragrafo, con la stessa resa dell'RTF: corpo in mezzi punti
+# (come \fs), allineamento, grassetto/corsivo e font (Times New Roman se None)
+STILI_PARAGRAFO = {
+    "Ente": {"allinea": "centro", "corpo": 28, "grassetto": True, "font": "Arial"},
+    "Provincia": {"allinea": "centro", "corpo": 22, "font": "Arial"},
+    "Settore": {"allinea": "sinistra", "corpo": 24, "grassetto": True},
+    "Numero": {"allinea": "centro", "corpo": 24, "grassetto": True},
+    "Registro": {"allinea": "centro", "corpo": 20},
+    "Oggetto": {"allinea": "sinistra", "corpo": 24},
+    "Responsabile": {"allinea": "centro", "corpo": 22, "grassetto": True},
+    "Titolo": {"allinea": "centro", "corpo": 24, "grassetto": True},
+    "Testo": {"allinea": "giustificato", "corpo": 22},
+    "Firma": {"allinea": "destra", "corpo": 22},
+    "Nota": {"allinea": "destra", "corpo": 18, "corsivo": True},
+}
+
+# Un paragrafo è (stile, frammenti) con frammenti = [(testo, grassetto)];
+# per premesse e dispositivo è (stile, testo), un paragrafo per ogni riga
+Paragrafo = Tuple[str, Union[List[Tuple[str, bool]], str]]
+
+_RE_CARATTERI_NON_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+def escape_xml(testo: str) -> str:
+    """Escape di &, < e >, senza i caratteri di controllo non ammessi in XML."""
+    testo = testo.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    if _RE_CARATTERI_NON_XML.search(testo):
+        testo = _RE_CARATTERI_NON_XML.sub("", testo)
+    return testo
+
+
+def impaginazione(dati: Dict, testo_premesse: str, testo_dispositivo: str) -> List[Paragrafo]:
+    """
+    Paragrafi della determina nell'ordine e con gli stili dell'RTF:
+    intestazione, oggetto, premesse, dispositivo e firma.
+    """
+    data_atto = dati.get("data_atto")
+    if isinstance(data_atto, datetime):
+        data_str = data_atto.strftime("%d/%m/%Y")
+    else:
+        data_str = str(data_atto) if data_atto else "___/___/_____"
+    num_det_generale = str(dati.get("num_determina_generale", "______"))
+    num_det_settore = str(dati.get("num_determina_settore", "______"))
+    titolo_dispositivo, _, corpo_dispositivo = testo_dispositivo.partition("\n")
+    responsabile = f"{dati.get('titolo_responsabile') or ''} {dati.get('nome_responsabile') or ''}"
+
+    vuoto = []
+    return [
+        ("Ente", [(f"COMUNE DI {dati.get('comune') or ''}", False)]),
+        ("Provincia", [(f"Provincia di {dati.get('provincia') or ''}", False)]),
+        ("Provincia", vuoto),
+        ("Settore", [(dati.get("area_settore") or "", False)]),
+        ("Settore", vuoto),
+        ("Numero", [(f"DETERMINAZIONE N. {num_det_settore} del {data_str}", False)]),
+        ("Registro", [(f"(Registro Generale n. {num_det_generale})", False)]),
+        ("Registro", vuoto),
+        ("Oggetto", vuoto),
+        ("Oggetto", [("OGGETTO: ", True), ((dati.get("oggetto") or "").upper(), False)]),
+        ("Oggetto", vuoto),
+        ("Responsabile", [("IL RESPONSABILE DEL SETTORE", False)]),
+        ("Responsabile", vuoto),
+        ("Testo", testo_premesse),
+        ("Testo", vuoto),
+        ("Titolo", [(titolo_dispositivo, False)]),
+        ("Titolo", vuoto),
+        ("Testo", corpo_dispositivo),
+        ("Testo", vuoto),
+        ("Firma", vuoto),
+        ("Firma", vuoto),
+        ("Firma", [("Il Responsabile del Settore", False)]),
+        ("Firma", [(responsabile, True)]),
+        ("Firma", [(dati.get("qualifica_responsabile") or "", False)]),
+        ("Firma", vuoto),
+        ("Nota", [("(Documento informatico firmato digitalmente ai sensi del D.Lgs. 82/2005 e ss.mm.ii.)", False)]),
+    ]
+
+
+# Data fissa delle parti nello zip: stessi dati, stessi bytes
+_DATA_ZIP = (1980, 1, 1, 0, 0, 0)
+
+# zipfile è importato dagli scrittori DOCX e ODT: chi genera solo RTF (es.
+# determinafacile.py) non ne paga l'import all'avvio
+
+
+def _parte_zip(nome: str, compressa: bool = True):
+    import zipfile
+
+    info = zipfile.ZipInfo(nome, date_time=_DATA_ZIP)
+    info.compress_type = zipfile.ZIP_DEFLATED if compressa else zipfile.ZIP_STORED
+    return info
+
+
+def _scrivi_paragrafi(parte: BinaryIO, paragrafi: List[Paragrafo], apri: Dict[str, str],
+                      chiudi: str, frammento, a_capo: Dict[str, str], speciali) -> None:
+    """
+    Scrive i paragrafi in una parte XML. I testi lunghi sono convertiti a
+    blocchi: ogni a capo chiude il paragrafo e ne apre un altro con lo
+    stesso stile, senza dividere il testo in righe.
+    """
+    for stile, contenuto in paragrafi:
+        parte.write(apri[stile].encode("utf-8"))
+        if isinstance(contenuto, str):
+            for inizio in range(0, len(contenuto), DIMENSIONE_BLOCCO):
+                blocco = escape_xml(contenuto[inizio:inizio + DIMENSIONE_BLOCCO].replace("\r", ""))
+                parte.write(speciali(blocco).replace("\n", a_capo[stile]).encode("utf-8"))
+        else:
+            for testo, grassetto in contenuto:
+                if testo:
+                    parte.write(frammento(speciali(escape_xml(testo)), grassetto).encode("utf-8"))
+        parte.write(chiudi.encode("utf-8"))
+
+
+# =============================================================================
+# DOCX (Office Open XML)
+# =============================================================================
+
+_XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+_DOCX_CONTENT_TYPES = (
+    _XML + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/word/styles.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+    '</Types>'
+).encode("utf-8")
+
+_DOCX_RELS = (
+    _XML + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+    'relationships/officeDocument" Target="word/document.xml"/></Relationships>'
+).encode("utf-8")
+
+_DOCX_DOCUMENT_RELS = (
+    _XML + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+    'relationships/styles" Target="styles.xml"/></Relationships>'
+).encode("utf-8")
+
+_DOCX_ALLINEA = {"sinistra": "left", "centro": "center", "destra": "right", "giustificato": "both"}
+
+
+def _docx_stili() -> bytes:
+    stili = []
+    for nome, s in STILI_PARAGRAFO.items():
+        font = s.get("font")
+        stili.append(
+            f'<w:style w:type="paragraph" w:customStyle="1" w:styleId="Determina{nome}">'
+            f'<w:name w:val="Determina {nome}"/><w:basedOn w:val="Normal"/><w:qFormat/>'
+            f'<w:pPr><w:jc w:val="{_DOCX_ALLINEA[s["allinea"]]}"/></w:pPr><w:rPr>'
+            + (f'<w:rFonts w:ascii="{font}" w:hAnsi="{font}" w:cs="{font}"/>' if font else "")
+            + ("<w:b/>" if s.get("grassetto") else "")
+            + ("<w:i/>" if s.get("corsivo") else "")
+            + f'<w:sz w:val="{s["corpo"]}"/><w:szCs w:val="{s["corpo"]}"/></w:rPr></w:style>'
+        )
+    return (
+        _XML + f'<w:styles xmlns:w="{_W}"><w:docDefaults><w:rPrDefault><w:rPr>'
+        '<w:rFonts w:ascii="Times New Roman" w:hAnsi="Times New Roman" w:cs="Times New Roman"'
+        ' w:eastAsia="Times New Roman"/><w:sz w:val="24"/><w:szCs w:val="24"/>'
+        '<w:lang w:val="it-IT"/></w:rPr></w:rPrDefault><w:pPrDefault><w:pPr>'
+        '<w:spacing w:after="0" w:line="240" w:lineRule="auto"/></w:pPr></w:pPrDefault>'
+        '</w:docDefaults><w:style w:type="paragraph" w:default="1" w:styleId="Normal">'
+        '<w:name w:val="Normal"/><w:qFormat/></w:style>' + "".join(stili) + "</w:styles>"
+    ).encode("utf-8")
+
+
+_DOCX_STYLES = _docx_stili()
+_DOCX_APRI = {
+    nome: f'<w:p><w:pPr><w:pStyle w:val="Determina{nome}"/></w:pPr><w:r><w:t xml:space="preserve">'
+    for nome in STILI_PARAGRAFO
+}
+_DOCX_CHIUDI = "</w:t></w:r></w:p>"
+_DOCX_A_CAPO = {nome: _DOCX_CHIUDI + apri for nome, apri in _DOCX_APRI.items()}
+
+
+def _docx_frammento(testo: str, grassetto: bool) -> str:
+    if not grassetto:
+        return testo
+    return f'</w:t></w:r><w:r><w:rPr><w:b/></w:rPr><w:t xml:space="preserve">{testo}</w:t></w:r><w:r><w:t xml:space="preserve">'
+
+
+def _docx_speciali(testo: str) -> str:
+    return testo.replace("\t", '</w:t><w:tab/><w:t xml:space="preserve">') if "\t" in testo else testo
+
+
+@sezione("scrivi_docx")
+def scrivi_docx(dati: Dict, testo_premesse: str, testo_dispositivo: str,
+                destinazione: BinaryIO) -> None:
+    """
+    Scrive la determina come documento Word (.docx) su un oggetto binario,
+    con la stessa impaginazione dell'RTF e uno stile di paragrafo per
+    ogni elemento (modificabile poi in Word). Il document.xml è scritto a
+    blocchi direttamente nello zip.
+    """
+    import zipfile
+
+    with zipfile.ZipFile(destinazione, "w") as zip_:
+        zip_.writestr(_parte_zip("[Content_Types].xml"), _DOCX_CONTENT_TYPES)
+        zip_.writestr(_parte_zip("_rels/.rels"), _DOCX_RELS)
+        zip_.writestr(_parte_zip("word/_rels/document.xml.rels"), _DOCX_DOCUMENT_RELS)
+        zip_.writestr(_parte_zip("word/styles.xml"), _DOCX_STYLES)
+        with zip_.open(_parte_zip("word/document.xml"), "w") as parte:
+            parte.write(f'{_XML}<w:document xmlns:w="{_W}"><w:body>'.encode("utf-8"))
+            _scrivi_paragrafi(
+                parte, impaginazione(dati, testo_premesse, testo_dispositivo),
+                _DOCX_APRI, _DOCX_CHIUDI, _docx_frammento, _DOCX_A_CAPO, _docx_speciali,
+            )
+            # A4 con i margini dell'RTF (twip)
+            parte.write(
+                b'<w:sectPr><w:pgSz w:w="11906" w:h="16838"/><w:pgMar w:top="1417" w:right="1417"'
+                b' w:bottom="1134" w:left="1417" w:header="708" w:footer="708" w:gutter="0"/>'
+                b'</w:sectPr></w:body></w:document>'
+            )
+
+
+# =============================================================================
+# ODT (OpenDocument Text)
+# =============================================================================
+
+_ODT_NS = (
+    'xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+    'xmlns:style="urn:oasis:names:tc:opendocument:xmlns:style:1.0" '
+    'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0" '
+    'xmlns:fo="urn:oasis:names:tc:opendocument:xmlns:xsl-fo-compatible:1.0" '
+    'xmlns:svg="urn:oasis:names:tc:opendocument:xmlns:svg-compatible:1.0" '
+    'office:version="1.3"'
+)
+
+_ODT_MANIFEST = (
+    _XML + '<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0"'
+    ' manifest:version="1.3">'
+    '<manifest:file-entry manifest:full-path="/" manifest:version="1.3"'
+    ' manifest:media-type="application/vnd.oasis.opendocument.text"/>'
+    '<manifest:file-entry manifest:full-path="content.xml" manifest:media-type="text/xml"/>'
+    '<manifest:file-entry manifest:full-path="styles.xml" manifest:media-type="text/xml"/>'
+    '</manifest:manifest>'
+).encode("utf-8")
+
+_ODT_ALLINEA = {"sinistra": "start", "centro": "center", "destra": "end", "giustificato": "justify"}
+_ODT_GRASSETTO = 'fo:font-weight="bold" style:font-weight-asian="bold" style:font-weight-complex="bold"'
+
+
+def _odt_stili() -> bytes:
+    stili = []
+    for nome, s in STILI_PARAGRAFO.items():
+        corpo = f'{s["corpo"] / 2:g}pt'
+        stili.append(
+            f'<style:style style:name="Determina_{nome}" style:display-name="Determina {nome}"'
+            f' style:family="paragraph" style:parent-style-name="Standard">'
+            f'<style:paragraph-properties fo:text-align="{_ODT_ALLINEA[s["allinea"]]}"/>'
+            f'<style:text-properties fo:font-size="{corpo}" style:font-size-complex="{corpo}"'
+            + (f' style:font-name="{s["font"]}"' if s.get("font") else "")
+            + (f" {_ODT_GRASSETTO}" if s.get("grassetto") else "")
+            + (' fo:font-style="italic" style:font-style-complex="italic"' if s.get("corsivo") else "")
+            + "/></style:style>"
+        )
+    return (
+        _XML + f"<office:document-styles {_ODT_NS}><office:font-face-decls>"
+        '<style:font-face style:name="Times New Roman" svg:font-family="\'Times New Roman\'"'
+        ' style:font-family-generic="roman"/>'
+        '<style:font-face style:name="Arial" svg:font-family="Arial" style:font-family-generic="swiss"/>'
+        "</office:font-face-decls><office:styles>"
+        '<style:default-style style:family="paragraph"><style:text-properties'
+        ' style:font-name="Times New Roman" fo:font-size="12pt" fo:language="it" fo:country="IT"/>'
+        "</style:default-style>"
+        '<style:style style:name="Standard" style:family="paragraph" style:class="text"/>'
+        + "".join(stili) +
+        "</office:styles><office:automatic-styles>"
+        '<style:page-layout style:name="A4"><style:page-layout-properties fo:page-width="21cm"'
+        ' fo:page-height="29.7cm" fo:margin-top="2.5cm" fo:margin-bottom="2cm"'
+        ' fo:margin-left="2.5cm" fo:margin-right="2.5cm"/></style:page-layout>'
+        "</office:automatic-styles><office:master-styles>"
+        '<style:master-page style:name="Standard" style:page-layout-name="A4"/>'
+        "</office:master-styles></office:document-styles>"
+    ).encode("utf-8")
+
+
+_ODT_STYLES = _odt_stili()
+_ODT_APRI = {nome: f'<text:p text:style-name="Determina_{nome}">' for nome in STILI_PARAGRAFO}
+_ODT_CHIUDI = "</text:p>"
+_ODT_A_CAPO = {nome: _ODT_CHIUDI + apri for nome, apri in _ODT_APRI.items()}
+_RE_SPAZI_ODT = re.compile(r"(?<= ) +|^ +", re.MULTILINE)
+
+
+def _odt_frammento(testo: str, grassetto: bool) -> str:
+    return f'<text:span text:style-name="Grassetto">{testo}</text:span>' if grassetto else testo
+
+
+def _odt_speciali(testo: str) -> str:
+    """In ODT gli spazi ripetuti e le tabulazioni vanno scritti come elementi."""
+    if "\t" in testo:
+        testo = testo.replace("\t", "<text:tab/>")
+    if "  " in testo or testo.startswith(" ") or "\n " in testo:
+        testo = _RE_SPAZI_ODT.sub(lambda m: f'<text:s text:c="{len(m.group())}"/>', testo)
+    return testo
+
+
+@sezione("scrivi_odt")
+def scrivi_odt(dati: Dict, testo_premesse: str, testo_dispositivo: str,
+               destinazione: BinaryIO) -> None:
+    """
+    Scrive la determina come documento OpenDocument (.odt) su un oggetto
+    binario, con la stessa impaginazione e gli stessi stili del DOCX. Il
+    file `mimetype` è il primo e non compresso, come richiesto dal formato.
+    """
+    import zipfile
+
+    with zipfile.ZipFile(destinazione, "w") as zip_:
+        zip_.writestr(_parte_zip("mimetype", compressa=False), b"application/vnd.oasis.opendocument.text")
+        zip_.writestr(_parte_zip("META-INF/manifest.xml"), _ODT_MANIFEST)
+        zip_.writestr(_parte_zip("styles.xml"), _ODT_STYLES)
+        with zip_.open(_parte_zip("content.xml"), "w") as parte:
+            parte.write(
+                f"{_XML}<office:document-content {_ODT_NS}><office:automatic-styles>"
+                f'<style:style style:name="Grassetto" style:family="text">'
+                f"<style:text-properties {_ODT_GRASSETTO}/></style:style>"
+                "</office:automatic-styles><office:body><office:text>".encode("utf-8")
+            )
+            _scrivi_paragrafi(
+                parte, impaginazione(dati, testo_premesse, testo_dispositivo),
+                _ODT_APRI, _ODT_CHIUDI, _odt_frammento, _ODT_A_CAPO, _odt_speciali,
+            )
+            parte.write(b"</office:text></office:body></office:document-content>")
 
 
 def genera_nome_file(dati: Dict) -> str:
@@ -195,7 +587,7 @@ def genera_nome_file(dati: Dict) -> str:
     Returns:
         Nome file (senza estensione)
     """
-    comune = dati.get("comune", "Comune").replace(" ", "_")
+    comune = str(dati.get("comune") or "Comune").replace(" ", "_")
     num_det = dati.get("num_determina_settore", "X")
     
     data_atto = dati.get("data_atto")
@@ -225,12 +617,39 @@ def esporta_determina_rtf(dati: Dict, testo_premesse: str, testo_dispositivo: st
         testo_dispositivo: Testo del dispositivo
     
     Returns:
-        Tupla (contenuto_rtf, nome_file)
+        Tupla (contenuto_rtf, nome_file), con il contenuto in bytes cp1252
+        pronto per il download o la scrittura su file
     """
-    contenuto = genera_rtf(dati, testo_premesse, testo_dispositivo)
+    buffer = io.BytesIO()
+    scrivi_rtf(dati, testo_premesse, testo_dispositivo, buffer)
     nome_file = genera_nome_file(dati)
     
-    return contenuto, f"{nome_file}.rtf"
+    return buffer.getvalue(), f"{nome_file}.rtf"
+
+
+# Formati di esportazione: scrittore, estensione e tipo MIME
+FORMATI = {
+    "rtf": (scrivi_rtf, "rtf", "application/rtf"),
+    "docx": (scrivi_docx, "docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    "odt": (scrivi_odt, "odt", "application/vnd.oasis.opendocument.text"),
+}
+
+
+def esporta_determina(dati: Dict, testo_premesse: str, testo_dispositivo: str,
+                      formato: str = "rtf") -> tuple:
+    """
+    Come esporta_determina_rtf, nel formato indicato ('rtf', 'docx' o 'odt').
+    
+    Returns:
+        Tupla (contenuto, nome_file) con il contenuto in bytes
+    """
+    try:
+        scrittore, estensione, _ = FORMATI[formato]
+    except KeyError:
+        raise ValueError(f"Formato non supportato: '{formato}'") from None
+    buffer = io.BytesIO()
+    scrittore(dati, testo_premesse, testo_dispositivo, buffer)
+    return buffer.getvalue(), f"{genera_nome_file(dati)}.{estensione}"
 
 
 # =============================================================================
@@ -0,0 +1,110 @@
+"""
+DETERMINAFACILE - Esportazione ZIP v1.0
+Più determine in un unico archivio ZIP, con un elenco CSV (file, CIG,
+fornitore, importi) da allegare al protocollo.
+- Ogni documento è generato e scritto direttamente nella sua voce dello
+  ZIP, uno alla volta: in memoria c'è un solo atto per volta
+- I nomi uguali prodotti da genera_nome_file ricevono un suffisso _2, _3,
+  ... nell'ordine degli atti, quindi lo stesso elenco produce sempre gli
+  stessi nomi
+
+Uso:
+    with open("determine.zip", "wb") as f:
+        scrivi_zip(elenco_dati, f, formato="docx")
+"""
+
+import csv
+import io
+import zipfile
+from decimal import Decimal
+from typing import BinaryIO, Callable, Dict, Iterable, List, Set, Tuple
+
+from document_generator import FORMATI, genera_nome_file
+from logic_engine import contesto, valida_dati
+from render_cache import genera_testi
+
+
+NOME_ELENCO = "elenco_determine.csv"
+
+COLONNE_ELENCO = (
+    "n", "file", "cig", "ragione_sociale", "piva_cf", "oggetto",
+    "imponibile", "iva", "totale", "errore",
+)
+
+
+def nome_univoco(nome: str, estensione: str, usati: Set[str]) -> str:
+    """
+    'Determina_45_...' -> 'Determina_45_....rtf', oppure '..._2.rtf', '..._3.rtf'
+    se già usato. Il confronto ignora maiuscole e minuscole (come Windows).
+    """
+    candidato = f"{nome}.{estensione}"
+    progressivo = 1
+    while candidato.casefold() in usati:
+        progressivo += 1
+        candidato = f"{nome}_{progressivo}.{estensione}"
+    usati.add(candidato.casefold())
+    return candidato
+
+
+def _importo(valore) -> str:
+    """Importo per il CSV con la virgola decimale (come lo legge Excel in italiano)."""
+    return format(Decimal(valore), ".2f").replace(".", ",") if valore is not None else ""
+
+
+def scrivi_zip(elenco_dati: Iterable[Dict], destinazione: BinaryIO, formato: str = "rtf",
+               testi: Callable[[Dict], Tuple[str, str]] = genera_testi) -> List[Dict]:
+    """
+    Scrive uno ZIP con una determina per ogni dizionario `dati` e, in coda,
+    l'elenco CSV (separatore ';', UTF-8 con BOM). Un atto che non si riesce
+    a generare non interrompe l'esportazione: compare nell'elenco con
+    l'errore e senza file; lo stesso per gli atti che non superano valida_dati.
+
+    Args:
+        elenco_dati: Dizionari `dati` come in app.py, anche da un generatore
+        destinazione: Oggetto binario (file, io.BytesIO, file temporaneo, ...)
+        formato: 'rtf', 'docx' o 'odt'
+        testi: Funzione dati -> (premesse, dispositivo)
+
+    Returns:
+        Le righe dell'elenco, come dizionari con le COLONNE_ELENCO
+    """
+    if formato not in FORMATI:
+        raise ValueError(f"Formato non supportato: '{formato}'")
+    scrittore, estensione, _ = FORMATI[formato]
+    usati = {NOME_ELENCO.casefold()}
+    elenco = []
+
+    with zipfile.ZipFile(destinazione, "w", zipfile.ZIP_DEFLATED) as zip_:
+        for numero, dati in enumerate(elenco_dati, start=1):
+            riga = {colonna: "" for colonna in COLONNE_ELENCO}
+            riga.update(
+                n=numero, cig=dati.get("cig") or "", ragione_sociale=dati.get("ragione_sociale") or "",
+                piva_cf=dati.get("piva_cf") or "", oggetto=dati.get("oggetto") or "",
+            )
+            try:
+                ctx = contesto(dati)
+                valido, errori = valida_dati(ctx)
+                if not valido:
+                    riga["errore"] = "; ".join(errori)
+                    elenco.append(riga)
+                    continue
+                importi = ctx.importi
+                riga.update(
+                    imponibile=_importo(importi.get("imponibile")),
+                    iva=_importo(importi.get("iva")), totale=_importo(importi.get("totale")),
+                )
+                premesse, dispositivo = testi(dati)
+                nome_file = nome_univoco(genera_nome_file(dati), estensione, usati)
+                with zip_.open(nome_file, "w") as voce:
+                    scrittore(dati, premesse, dispositivo, voce)
+                riga["file"] = nome_file
+            except Exception as e:
+                riga["errore"] = f"{type(e).__name__}: {e}"
+            elenco.append(riga)
+
+        with zip_.open(NOME_ELENCO, "w") as voce:
+            with io.TextIOWrapper(voce, encoding="utf-8-sig", newline="") as testo:
+                scrittore_csv = csv.DictWriter(testo, COLONNE_ELENCO, delimiter=";")
+                scrittore_csv.writeheader()
+                scrittore_csv.writerows(elenco)
+    return elenco
@@ -0,0 +1,161 @@
+"""
+DETERMINAFACILE - Importi per Aliquota v1.0
+Aggregazione delle offerte su più righe (quantità x prezzo unitario, ognuna
+con la propria aliquota IVA) in imponibile, IVA e totale per aliquota e
+complessivi.
+- Ogni riga è convertita una volta in centesimi interi; somme e IVA per
+  aliquota sono calcolate su interi, senza errori di arrotondamento dei float
+- Ogni riga è arrotondata al centesimo; l'IVA è calcolata una volta per
+  aliquota sulla somma degli imponibili (come nel riepilogo della fattura
+  elettronica), con arrotondamento commerciale (metà verso l'alto)
+- Le aliquote sono tenute in punti base (22% = 2200) per ammettere
+  aliquote non intere
+"""
+
+from array import array
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+def _decimale(valore) -> Decimal:
+    """Importo o quantità come Decimal (accetta int, float, Decimal e testo con la virgola)."""
+    if isinstance(valore, Decimal):
+        return valore
+    if isinstance(valore, bool):
+        raise ValueError(f"Valore non valido: {valore!r}")
+    if isinstance(valore, str):
+        valore = valore.strip().replace(",", ".")
+    try:
+        decimale = Decimal(str(valore))
+    except ArithmeticError:
+        raise ValueError(f"Valore non valido: {valore!r}") from None
+    if not decimale.is_finite():
+        raise ValueError(f"Valore non valido: {valore!r}")
+    return decimale
+
+
+def _centesimi_esatti(valore) -> Optional[int]:
+    """
+    Centesimi di un int o di un float che ha al più due decimali (il caso
+    comune, es. 12.5 o 1234.56), senza passare da Decimal; None altrimenti.
+    """
+    if isinstance(valore, int) and not isinstance(valore, bool):
+        return valore * 100
+    if isinstance(valore, float) and -1e9 < valore < 1e9:
+        centesimi = valore * 100
+        arrotondati = round(centesimi)
+        if abs(centesimi - arrotondati) < 1e-6:
+            return arrotondati
+    return None
+
+
+def in_centesimi(valore) -> int:
+    """
+    Converte un importo (int, float, Decimal o testo con la virgola decimale)
+    in centesimi interi, arrotondando al centesimo. Usata anche per le
+    aliquote, che diventano punti base.
+    """
+    centesimi = _centesimi_esatti(valore)
+    if centesimi is not None:
+        return centesimi
+    return int((_decimale(valore) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def da_centesimi(centesimi: int) -> Decimal:
+    return Decimal(centesimi).scaleb(-2)
+
+
+def _dividi_arrotondando(dividendo: int, divisore: int) -> int:
+    """Divisione intera con arrotondamento metà lontano da zero (come ROUND_HALF_UP)."""
+    quoziente, resto = divmod(abs(dividendo), divisore)
+    if 2 * resto >= divisore:
+        quoziente += 1
+    return quoziente if dividendo >= 0 else -quoziente
+
+
+# =============================================================================
+# RIGHE -> ARRAY DI CENTESIMI
+# =============================================================================
+
+def centesimi_righe(righe: Iterable[Dict]) -> Tuple[array, array]:
+    """
+    Converte le righe dell'offerta in due array paralleli: imponibile della
+    riga in centesimi e aliquota in punti base.
+
+    Ogni riga è un dizionario con `prezzo_unitario` (o `importo`),
+    `quantita` (predefinita 1) e `aliquota_iva` (predefinita 22).
+    """
+    imponibili = array("q")
+    aliquote = array("q")
+    for numero, riga in enumerate(righe, start=1):
+        prezzo = riga.get("prezzo_unitario", riga.get("importo"))
+        if prezzo is None or prezzo == "":
+            raise ValueError(f"Riga {numero}: prezzo mancante")
+        quantita = riga.get("quantita")
+        centesimi = _centesimi_esatti(prezzo)
+        if quantita is None or quantita == "" or quantita == 1:
+            imponibili.append(centesimi if centesimi is not None else in_centesimi(prezzo))
+        elif centesimi is not None and isinstance(quantita, int) and not isinstance(quantita, bool):
+            imponibili.append(centesimi * quantita)
+        else:
+            # Prodotto esatto, arrotondato una sola volta sul totale della riga
+            imponibili.append(in_centesimi(_decimale(prezzo) * _decimale(quantita)))
+        aliquota = riga.get("aliquota_iva")
+        aliquote.append(2200 if aliquota is None or aliquota == "" else in_centesimi(aliquota))
+    return imponibili, aliquote
+
+
+# =============================================================================
+# AGGREGAZIONE
+# =============================================================================
+
+def aggrega_centesimi(imponibili: Sequence[int], aliquote: Sequence[int]) -> Dict[int, Tuple[int, int]]:
+    """
+    Somma gli imponibili per aliquota e calcola l'IVA di ciascuna aliquota.
+    Restituisce {aliquota_punti_base: (imponibile, iva)} in centesimi.
+    """
+    somme: Dict[int, int] = {}
+    for imponibile, aliquota in zip(imponibili, aliquote):
+        somme[aliquota] = somme.get(aliquota, 0) + imponibile
+    return {
+        aliquota: (somma, _dividi_arrotondando(somma * aliquota, 10000))
+        for aliquota, somma in somme.items()
+    }
+
+
+def riepilogo_iva(righe: Iterable[Dict]) -> Dict:
+    """
+    Riepilogo dell'offerta: imponibile, iva e totale complessivi (Decimal,
+    come calcola_importi) più `per_aliquota`, la lista per aliquota
+    decrescente di dizionari con aliquota, imponibile, iva e totale.
+    """
+    per_aliquota = aggrega_centesimi(*centesimi_righe(righe))
+    voci = []
+    imponibile_totale = iva_totale = 0
+    for aliquota in sorted(per_aliquota, reverse=True):
+        imponibile, iva = per_aliquota[aliquota]
+        imponibile_totale += imponibile
+        iva_totale += iva
+        voci.append({
+            "aliquota": da_centesimi(aliquota),
+            "imponibile": da_centesimi(imponibile),
+            "iva": da_centesimi(iva),
+            "totale": da_centesimi(imponibile + iva),
+        })
+    return {
+        "imponibile": da_centesimi(imponibile_totale),
+        "iva": da_centesimi(iva_totale),
+        "totale": da_centesimi(imponibile_totale + iva_totale),
+        "per_aliquota": voci,
+    }
+
+
+def riepiloga_offerte(offerte: Iterable[Iterable[Dict]]) -> List[Dict]:
+    """Riepilogo di più offerte (es. da batch.py), nello stesso ordine."""
+    return [riepilogo_iva(righe) for righe in offerte]
+
+
+def formatta_aliquota(aliquota) -> str:
+    """'22', '5,5': l'aliquota come compare nel testo della determina."""
+    testo = format(Decimal(str(aliquota)).normalize(), "f")
+    return testo.replace(".", ",")
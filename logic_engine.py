@@ -10,13 +10,24 @@ Aggiornato con:
 - Visto di regolarità contabile (art. 183 c.7 TUEL)
 - Modalità di ricorso e conflitto interessi
 - Attestato di pubblicazione
+- Clausole normative fisse interpolate una sola volta all'import
+- Misura opzionale di tempi e dimensioni delle sezioni (strumentazione.py)
+- DeterminaContext: dati normalizzati e valori derivati calcolati una sola volta
+- Offerte su più righe con riepilogo IVA per aliquota (importi.py)
+- Chiavi di `dati` lette da ogni sezione dichiarate con @legge, per il
+  rendering incrementale (render_incrementale.py)
 ================================================================================
 """
 
+import sys
+from dataclasses import dataclass, field, fields
 from datetime import datetime
-from typing import Dict, Tuple
+from typing import Callable, Dict, List, Optional, Tuple, Union
 from decimal import Decimal, ROUND_HALF_UP
 
+from importi import centesimi_righe, formatta_aliquota, riepilogo_iva
+from strumentazione import sezione
+
 # =============================================================================
 # KNOWLEDGE BASE - CHUNK NORMATIVI
 # =============================================================================
@@ -87,104 +98,324 @@ def formatta_data_breve(data) -> str:
     return str(data)
 
 
+# Valori usati nei testi quando la chiave manca in `dati`
+# (le chiavi non elencate valgono stringa vuota)
+VALORI_PREDEFINITI = {
+    "aliquota_iva": 22,
+    "tipo_documento": "preventivo",
+    "criterio_scelta": "esperienza specifica nel settore",
+    "durata_servizio": "tempi strettamente necessari all'esecuzione",
+    "durc_esito": "REGOLARE",
+    "nome_responsabile": "il sottoscritto",
+    "tar_competente": "TAR competente per territorio",
+    "visto_nome": "[Nome Responsabile Finanziario]",
+    "visto_qualifica": "Responsabile dell'Area Economico-Finanziaria",
+}
+
+
+# =============================================================================
+# CONTESTO DELLA DETERMINA
+# =============================================================================
+
+# Soglia oltre la quale scatta l'obbligo MEPA (sotto: deroga alla rotazione)
+SOGLIA_MEPA = 5000
+
+# slots=True è disponibile da Python 3.10
+_OPZIONI_DATACLASS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**_OPZIONI_DATACLASS)
+class DeterminaContext:
+    """
+    Dati di una determina letti una sola volta, con i valori derivati
+    (importi, date formattate, soglia dei 5.000 €, ripartizione dell'IVA)
+    già calcolati. I generatori di sezione ricevono il contesto; chi ha un
+    dizionario `dati` può continuare a passarlo (vedi `contesto`).
+
+    I campi sono quelli di `dati_form` in app.py, con gli stessi predefiniti
+    usati dai testi. I valori restano come ricevuti (un None esplicito
+    resta None), tranne i flag che diventano bool: i testi prodotti sono
+    identici a quelli costruiti dal dizionario.
+    """
+    # Ente e atto
+    comune: str = "[Comune]"
+    provincia: str = ""
+    area_settore: str = ""
+    nome_responsabile: str = VALORI_PREDEFINITI["nome_responsabile"]
+    titolo_responsabile: str = ""
+    qualifica_responsabile: str = ""
+    decreto_funzioni: str = ""
+    regolamento_comunale: Optional[str] = None
+    num_determina_generale: str = ""
+    num_determina_settore: str = ""
+    data_atto: Optional[datetime] = None
+
+    # Oggetto e motivazione
+    oggetto: str = ""
+    motivazione: str = ""
+    finalita: str = ""
+    durata_servizio: str = VALORI_PREDEFINITI["durata_servizio"]
+    codice_cpv: str = ""
+
+    # Operatore economico e preventivo
+    ragione_sociale: str = ""
+    indirizzo: str = ""
+    cap: str = ""
+    citta: str = ""
+    provincia_fornitore: str = ""
+    piva_cf: str = ""
+    tipo_documento: str = VALORI_PREDEFINITI["tipo_documento"]
+    numero_preventivo: str = ""
+    data_preventivo: Optional[datetime] = None
+    criterio_scelta: str = VALORI_PREDEFINITI["criterio_scelta"]
+    operatore_uscente: bool = False
+
+    # Importi, bilancio e RUP
+    imponibile: Union[float, Decimal] = 0
+    aliquota_iva: Union[float, Decimal] = VALORI_PREDEFINITI["aliquota_iva"]
+    # Offerta su più righe (vedi importi.py): se presente, imponibile e
+    # aliquota_iva sono ricavati dalle righe
+    righe_offerta: Optional[List[Dict]] = None
+    cig: str = ""
+    capitolo_bilancio: str = ""
+    esercizio_finanziario: Union[int, str] = ""
+    rup_nome: str = ""
+    rup_cognome: str = ""
+    rup_qualifica: str = ""
+    usa_mepa: bool = False
+    piccola_fornitura: bool = False
+
+    # Delibere di bilancio
+    dup_num: str = ""
+    dup_data: Optional[datetime] = None
+    dup_periodo: str = ""
+    nota_dup_num: str = ""
+    nota_dup_data: Optional[datetime] = None
+    bilancio_num: str = ""
+    bilancio_data: Optional[datetime] = None
+    bilancio_triennio: str = ""
+    peg_num: str = ""
+    peg_data: Optional[datetime] = None
+    peg_periodo: str = ""
+
+    # DURC
+    durc_protocollo: str = ""
+    durc_esito: str = VALORI_PREDEFINITI["durc_esito"]
+    durc_scadenza: Optional[datetime] = None
+
+    # Visto contabile, ricorsi e trasparenza
+    visto_nome: str = VALORI_PREDEFINITI["visto_nome"]
+    visto_qualifica: str = VALORI_PREDEFINITI["visto_qualifica"]
+    includi_visto: bool = False
+    tar_competente: str = VALORI_PREDEFINITI["tar_competente"]
+    includi_ricorsi: bool = False
+    includi_conflitto: bool = False
+
+    # Dizionario d'origine, chiavi aggiuntive comprese (vuoto se il contesto
+    # è stato costruito direttamente dai campi)
+    dati: Dict = field(default_factory=dict, repr=False)
+
+    # Valori derivati, calcolati in __post_init__
+    importi: Dict[str, Decimal] = field(init=False, repr=False)
+    importi_testo: Dict[str, str] = field(init=False, repr=False)
+    importi_per_aliquota: List[Dict[str, Decimal]] = field(init=False, repr=False)
+    sotto_soglia_5000: bool = field(init=False)
+    data_preventivo_testo: str = field(init=False, repr=False)
+    data_atto_breve: str = field(init=False, repr=False)
+    nome_comune: str = field(init=False, repr=False)
+    ha_richiami_bilancio: bool = field(init=False, repr=False)
+    aliquota_iva_testo: str = field(init=False, repr=False)
+    ripartizione_iva: List[Dict[str, str]] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        for nome in _CAMPI_BOOLEANI:
+            setattr(self, nome, bool(getattr(self, nome)))
+
+        if self.righe_offerta:
+            riepilogo = riepilogo_iva(self.righe_offerta)
+            self.importi = {voce: riepilogo[voce] for voce in ("imponibile", "iva", "totale")}
+            self.importi_per_aliquota = riepilogo["per_aliquota"]
+            self.imponibile = riepilogo["imponibile"]
+            if len(self.importi_per_aliquota) == 1:
+                self.aliquota_iva = self.importi_per_aliquota[0]["aliquota"]
+        else:
+            self.importi = calcola_importi(self.imponibile, self.aliquota_iva)
+            self.importi_per_aliquota = []
+        self.importi_testo = {voce: formatta_importo(valore) for voce, valore in self.importi.items()}
+        self.sotto_soglia_5000 = float(self.imponibile) < SOGLIA_MEPA
+
+        data_prev = self.data_preventivo
+        self.data_preventivo_testo = formatta_data(data_prev) if isinstance(data_prev, datetime) else str(data_prev)
+        self.data_atto_breve = formatta_data_breve(self.data_atto) if self.data_atto else "[Data]"
+
+        # Solo il nome del comune, senza "Comune di" (None o un valore non
+        # testuale, es. da JSON o CSV, non devono far fallire il contesto)
+        comune = str(self.comune or "")
+        self.nome_comune = comune[10:] if comune.lower().startswith("comune di ") else comune
+
+        self.ha_richiami_bilancio = any([self.dup_num, self.bilancio_num, self.peg_num])
+
+        # Aliquota come compare nelle premesse: quella delle righe è formattata,
+        # quella inserita a mano resta come ricevuta
+        self.aliquota_iva_testo = (
+            formatta_aliquota(self.aliquota_iva) if self.righe_offerta else str(self.aliquota_iva)
+        )
+        # Ripartizione dell'IVA, solo per le offerte con più aliquote
+        self.ripartizione_iva = [
+            {
+                "aliquota": formatta_aliquota(voce["aliquota"]),
+                **{nome: formatta_importo(voce[nome]) for nome in ("imponibile", "iva", "totale")},
+            }
+            for voce in self.importi_per_aliquota
+        ] if len(self.importi_per_aliquota) > 1 else []
+
+    @classmethod
+    def da_dati(cls, dati: Dict) -> "DeterminaContext":
+        """Costruisce il contesto dal dizionario `dati` (le chiavi assenti prendono i predefiniti)."""
+        return cls(**{nome: dati[nome] for nome in _CAMPI if nome in dati}, dati=dati)
+
+
+# Campi in ingresso del contesto (esclusi `dati` e i valori derivati)
+_CAMPI = tuple(f.name for f in fields(DeterminaContext) if f.init and f.name != "dati")
+
+_CAMPI_BOOLEANI = (
+    "operatore_uscente", "usa_mepa", "piccola_fornitura",
+    "includi_visto", "includi_ricorsi", "includi_conflitto",
+)
+
+# I generatori accettano indifferentemente il contesto o il dizionario
+Dati = Union[Dict, DeterminaContext]
+
+
+def contesto(dati: Dati) -> DeterminaContext:
+    """Adattatore per l'API a dizionario: restituisce il contesto, costruendolo se serve."""
+    if isinstance(dati, DeterminaContext):
+        return dati
+    return DeterminaContext.da_dati(dati)
+
+
+# =============================================================================
+# DIPENDENZE DELLE SEZIONI
+# =============================================================================
+
+def legge(*dipendenze) -> Callable:
+    """
+    Dichiara le chiavi di `dati` da cui dipende il testo di una sezione,
+    comprese quelle lette attraverso i valori derivati del contesto (es.
+    importi_testo da imponibile, aliquota_iva e righe_offerta). Si possono
+    indicare anche altre funzioni decorate, di cui si ereditano le chiavi.
+    Le chiavi finiscono nell'attributo `chiavi` della funzione.
+    """
+    chiavi = set()
+    for dipendenza in dipendenze:
+        chiavi.update(dipendenza.chiavi if callable(dipendenza) else (dipendenza,))
+
+    def decoratore(funzione: Callable) -> Callable:
+        funzione.chiavi = frozenset(chiavi)
+        return funzione
+    return decoratore
+
+
+# Chiavi da cui dipendono importi, importi_testo e iva_per_aliquota
+CHIAVI_IMPORTI = ("imponibile", "aliquota_iva", "righe_offerta")
+
+# Operatore economico come compare in premesse e dispositivo
+CHIAVI_FORNITORE = ("ragione_sociale", "piva_cf", "indirizzo", "cap", "citta", "provincia_fornitore")
+
+# CIG, RUP e impegno di spesa, ripetuti in premesse e dispositivo
+CHIAVI_AMMINISTRATIVE = (
+    "cig", "rup_nome", "rup_cognome", "rup_qualifica", "capitolo_bilancio", "esercizio_finanziario",
+)
+
+
 # =============================================================================
 # NUOVE FUNZIONI v4.0 - SEZIONI AGGIUNTIVE
 # =============================================================================
 
-def genera_richiami_bilancio(dati: Dict) -> str:
+@sezione("genera_richiami_bilancio")
+@legge("dup_num", "dup_data", "dup_periodo", "nota_dup_num", "nota_dup_data",
+       "bilancio_num", "bilancio_data", "bilancio_triennio", "peg_num", "peg_data", "peg_periodo")
+def genera_richiami_bilancio(dati: Dati) -> str:
     """
     Genera la sezione RICHIAMATA con i riferimenti alle delibere di bilancio.
     Include: DUP, Nota aggiornamento DUP, Bilancio di previsione, PEG.
     """
-    righe = []
-    
+    ctx = contesto(dati)
+
     # Verifica se ci sono dati di bilancio da includere
-    has_bilancio = any([
-        dati.get("dup_num"),
-        dati.get("bilancio_num"),
-        dati.get("peg_num")
-    ])
-    
-    if not has_bilancio:
+    if not ctx.ha_richiami_bilancio:
         return ""
-    
-    righe.append("RICHIAMATA:")
-    
+
+    righe = ["RICHIAMATA:"]
+
     # DUP - Documento Unico di Programmazione
-    if dati.get("dup_num"):
-        dup_data_str = formatta_data_breve(dati.get("dup_data"))
-        dup_periodo = dati.get("dup_periodo", "")
+    if ctx.dup_num:
         righe.append(
-            f"- la deliberazione di Consiglio Comunale n. {dati['dup_num']} "
-            f"in data {dup_data_str}, esecutiva, con cui è stato approvato "
-            f"il documento unico di programmazione (DUP) periodo {dup_periodo};"
+            f"- la deliberazione di Consiglio Comunale n. {ctx.dup_num} "
+            f"in data {formatta_data_breve(ctx.dup_data)}, esecutiva, con cui è stato approvato "
+            f"il documento unico di programmazione (DUP) periodo {ctx.dup_periodo};"
         )
-    
+
     # Nota aggiornamento DUP (opzionale)
-    if dati.get("nota_dup_num"):
-        nota_data_str = formatta_data_breve(dati.get("nota_dup_data"))
-        dup_periodo = dati.get("dup_periodo", "")
+    if ctx.nota_dup_num:
         righe.append(
-            f"- la deliberazione di Consiglio Comunale n. {dati['nota_dup_num']} "
-            f"in data {nota_data_str}, esecutiva, con cui è stata approvata "
+            f"- la deliberazione di Consiglio Comunale n. {ctx.nota_dup_num} "
+            f"in data {formatta_data_breve(ctx.nota_dup_data)}, esecutiva, con cui è stata approvata "
             f"la nota di aggiornamento al documento unico di programmazione (DUP) "
-            f"periodo {dup_periodo};"
+            f"periodo {ctx.dup_periodo};"
         )
-    
+
     # Bilancio di previsione
-    if dati.get("bilancio_num"):
-        bil_data_str = formatta_data_breve(dati.get("bilancio_data"))
-        bil_triennio = dati.get("bilancio_triennio", "")
+    if ctx.bilancio_num:
         righe.append(
-            f"- la deliberazione di Consiglio Comunale n. {dati['bilancio_num']} "
-            f"in data {bil_data_str}, esecutiva, e successive modificazioni ed "
+            f"- la deliberazione di Consiglio Comunale n. {ctx.bilancio_num} "
+            f"in data {formatta_data_breve(ctx.bilancio_data)}, esecutiva, e successive modificazioni ed "
             f"integrazioni, con cui è stato approvato il bilancio di previsione "
-            f"finanziario per il triennio {bil_triennio};"
+            f"finanziario per il triennio {ctx.bilancio_triennio};"
         )
-    
+
     # PEG - Piano Esecutivo di Gestione
-    if dati.get("peg_num"):
-        peg_data_str = formatta_data_breve(dati.get("peg_data"))
-        peg_periodo = dati.get("peg_periodo", "")
+    if ctx.peg_num:
+        peg_periodo = ctx.peg_periodo
         righe.append(
-            f"- la deliberazione di Giunta comunale n. {dati['peg_num']} "
-            f"in data {peg_data_str}, esecutiva, con la quale è stato approvato "
+            f"- la deliberazione di Giunta comunale n. {ctx.peg_num} "
+            f"in data {formatta_data_breve(ctx.peg_data)}, esecutiva, con la quale è stato approvato "
             f"l'atto ad oggetto: \"Esercizio finanziario {peg_periodo} - "
             f"Assegnazione Fondi di bilancio ai responsabili di settore per la "
             f"realizzazione del programma di bilancio {peg_periodo} - "
             f"approvazione PEG {peg_periodo}\";"
         )
-    
+
     return "\n\n".join(righe) + "\n"
 
 
-def genera_sezione_durc(dati: Dict) -> str:
+@sezione("genera_sezione_durc")
+@legge("durc_protocollo", "durc_esito", "durc_scadenza", "ragione_sociale")
+def genera_sezione_durc(dati: Dati) -> str:
     """
     Genera la clausola DATO ATTO relativa al DURC.
     Include: protocollo, esito e scadenza validità.
     """
-    if not dati.get("durc_protocollo"):
+    ctx = contesto(dati)
+    if not ctx.durc_protocollo:
         return ""
-    
-    durc_scadenza_str = formatta_data_breve(dati.get("durc_scadenza"))
-    esito = dati.get("durc_esito", "REGOLARE")
-    ragione_sociale = dati.get('ragione_sociale', '')
-    
+
     testo = (
-        f"DATO ATTO altresì che per l'operatore economico {ragione_sociale} "
+        f"DATO ATTO altresì che per l'operatore economico {ctx.ragione_sociale} "
         f"è stato acquisito il Documento Unico di Regolarità Contributiva (DURC) "
-        f"Prot. {dati['durc_protocollo']} e che lo stesso risulta {esito}"
+        f"Prot. {ctx.durc_protocollo} e che lo stesso risulta {ctx.durc_esito}"
     )
-    
+
+    durc_scadenza_str = formatta_data_breve(ctx.durc_scadenza)
     if durc_scadenza_str:
         testo += f" con scadenza validità il {durc_scadenza_str}"
-    
-    testo += ";"
-    
-    return testo
+
+    return testo + ";"
 
 
-def genera_sezione_altre_informazioni(dati: Dict) -> str:
+@sezione("genera_sezione_altre_informazioni")
+@legge("includi_ricorsi", "includi_conflitto", "nome_responsabile", "tar_competente")
+def genera_sezione_altre_informazioni(dati: Dati) -> str:
     """
     Genera la sezione ALTRE INFORMAZIONI con:
     - Responsabile del procedimento
@@ -192,42 +423,32 @@ def genera_sezione_altre_informazioni(dati: Dict) -> str:
     - Dichiarazione conflitto interessi
     - Nota pubblicazione trasparenza
     """
-    righe = []
+    ctx = contesto(dati)
     
     # Verifica se includere la sezione
-    includi_ricorsi = dati.get("includi_ricorsi", False)
-    includi_conflitto = dati.get("includi_conflitto", False)
-    
-    if not (includi_ricorsi or includi_conflitto):
+    if not (ctx.includi_ricorsi or ctx.includi_conflitto):
         return ""
-    
-    righe.append("")
-    righe.append("_" * 70)
-    righe.append("")
-    righe.append("ALTRE INFORMAZIONI:")
-    righe.append("")
-    
+
     # Responsabile del procedimento
-    nome_resp = dati.get('nome_responsabile', 'il sottoscritto')
-    righe.append(
-        f"Responsabile del procedimento (artt. 4-6 legge 241/1990): {nome_resp}."
-    )
-    
+    righe = [
+        "", "_" * 70, "", "ALTRE INFORMAZIONI:", "",
+        f"Responsabile del procedimento (artt. 4-6 legge 241/1990): {ctx.nome_responsabile}.",
+    ]
+
     # Ricorsi
-    if includi_ricorsi:
-        tar = dati.get("tar_competente", "TAR competente per territorio")
+    if ctx.includi_ricorsi:
         righe.append("")
         righe.append(
             f"Ricorsi: ai sensi dell'art. 3, comma 4, della legge 241/1990, "
-            f"contro il presente atto è ammesso il ricorso al {tar} nel termine "
+            f"contro il presente atto è ammesso il ricorso al {ctx.tar_competente} nel termine "
             f"di 60 giorni dalla pubblicazione (d.lgs. 2 luglio 2010, n. 104) o, "
             f"in alternativa, il ricorso straordinario al Presidente della Repubblica "
             f"nel termine di 120 giorni dalla pubblicazione, nei modi previsti "
             f"dall'art. 8 e seguenti del d.P.R. 24 novembre 1971, n. 1199."
         )
-    
+
     # Conflitto di interessi
-    if includi_conflitto:
+    if ctx.includi_conflitto:
         righe.append("")
         righe.append(
             "Conflitto d'interessi: in relazione all'adozione del presente atto, "
@@ -242,7 +463,7 @@ def genera_sezione_altre_informazioni(dati: Dict) -> str:
             "[X] non ricorre l'obbligo di astensione, previsto dall'art. 7 del "
             "DPR 62/2013 e del Codice di comportamento dell'Ente."
         )
-    
+
     # Pubblicazione trasparenza
     righe.append("")
     righe.append("Pubblicazione nella sezione \"Trasparenza\" (D.lgs. n. 33/2013)")
@@ -250,34 +471,23 @@ def genera_sezione_altre_informazioni(dati: Dict) -> str:
         "I dati della presente determinazione saranno pubblicati nella sezione "
         "Amministrazione Trasparente/Provvedimenti."
     )
-    
+
     return "\n".join(righe)
 
 
-def genera_visto_regolarita_contabile(dati: Dict) -> str:
+@sezione("genera_visto_regolarita_contabile")
+@legge("includi_visto", "comune", "data_atto", "visto_nome", "visto_qualifica")
+def genera_visto_regolarita_contabile(dati: Dati) -> str:
     """
     Genera la sezione del VISTO DI REGOLARITÀ CONTABILE.
     Ex art. 183 comma 7 del D.Lgs. 267/2000 (TUEL).
     """
-    if not dati.get("includi_visto", False):
+    ctx = contesto(dati)
+    if not ctx.includi_visto:
         return ""
-    
-    visto_nome = dati.get("visto_nome", "[Nome Responsabile Finanziario]")
-    visto_qualifica = dati.get(
-        "visto_qualifica", 
-        "Responsabile dell'Area Economico-Finanziaria"
-    )
-    data_atto = dati.get("data_atto")
-    data_str = formatta_data_breve(data_atto) if data_atto else "[Data]"
-    comune = dati.get("comune", "[Comune]")
-    
-    # Estrai solo il nome del comune senza "Comune di"
-    if comune.lower().startswith("comune di "):
-        nome_comune = comune[10:]
-    else:
-        nome_comune = comune
-    
-    testo = f"""
+
+    # nome_comune e data_atto_breve sono già calcolati nel contesto
+    return f"""
 
 {'_' * 70}
 
@@ -285,25 +495,15 @@ VISTO DI REGOLARITÀ CONTABILE
 
 Si appone il visto di regolarità contabile attestante la copertura finanziaria della presente determinazione, ai sensi dell'art. 183 comma VII del D.lgs. 267/2000 e s.m.i., che pertanto in data odierna, diviene esecutiva.
 
-{nome_comune} lì {data_str}
+{ctx.nome_comune} lì {ctx.data_atto_breve}
 
-{visto_qualifica}
+{ctx.visto_qualifica}
 
-f.to {visto_nome}
+f.to {ctx.visto_nome}
 """
-    
-    return testo
 
 
-def genera_attestato_pubblicazione(dati: Dict) -> str:
-    """
-    Genera l'ATTESTATO DI PUBBLICAZIONE all'Albo Pretorio.
-    """
-    # Includi solo se è richiesto il visto (per coerenza)
-    if not dati.get("includi_visto", False):
-        return ""
-    
-    testo = f"""
+_ATTESTATO_PUBBLICAZIONE = f"""
 {'_' * 70}
 
 ATTESTATO DI PUBBLICAZIONE
@@ -314,89 +514,123 @@ Il Responsabile del Servizio
 
 f.to _______________________
 """
-    return testo
+
+
+@sezione("genera_attestato_pubblicazione")
+@legge("includi_visto")
+def genera_attestato_pubblicazione(dati: Dati) -> str:
+    """
+    Genera l'ATTESTATO DI PUBBLICAZIONE all'Albo Pretorio.
+    """
+    # Includi solo se è richiesto il visto (per coerenza)
+    if not contesto(dati).includi_visto:
+        return ""
+
+    return _ATTESTATO_PUBBLICAZIONE
 
 
 # =============================================================================
 # MOTORE LOGICO PRINCIPALE
 # =============================================================================
 
-def assembla_visti(dati: Dict) -> list:
-    visti = []
-    
-    visti.append(f"VISTO {CHUNKS['art_50_affidamento']};")
-    visti.append(f"VISTO {CHUNKS['principi_art_1']};")
-    visti.append(f"VISTO {CHUNKS['art_15_rup']};")
-    
-    imponibile = float(dati.get("imponibile", 0))
-    
-    # MEPA
-    if imponibile >= 5000:
-        visti.append(f"VISTO {CHUNKS['obbligo_mepa_5000']};")
+# Clausole fisse: interpolate una sola volta all'import del modulo
+_VISTI_INIZIALI = (
+    f"VISTO {CHUNKS['art_50_affidamento']};",
+    f"VISTO {CHUNKS['principi_art_1']};",
+    f"VISTO {CHUNKS['art_15_rup']};",
+)
+_VISTO_MEPA = f"VISTO {CHUNKS['obbligo_mepa_5000']};"
+_VISTO_DEROGA_ROTAZIONE = f"VISTO {CHUNKS['deroga_rotazione_5000']};"
+_RITENUTO_GARANZIA = f"RITENUTO che {CHUNKS['esenzione_garanzia_ccnl']};"
+_VISTI_FINALI = (
+    f"DATO ATTO che {CHUNKS['art_52_requisiti']};",
+    f"DATO ATTO che {CHUNKS['art_16_conflitto_interessi']};",
+    f"DATO ATTO che {CHUNKS['tracciabilita_l136']};",
+    f"DATO ATTO che {CHUNKS['gdpr_clause']};",
+    f"CONSIDERATO che {CHUNKS['art_18_forma_contratto']};",
+)
+
+
+_CONSIDERATO_SOGLIA = "CONSIDERATO che l'importo dell'affidamento è inferiore a € 140.000,00 e pertanto rientra nella fattispecie prevista dall'art. 50, comma 1, lett. b) del D. Lgs. n. 36/2023;"
+_RITENUTO_CONGRUITA = f"RITENUTO altresì che {CHUNKS['congruita_economica']};"
+_ATTESTATO_DICHIARAZIONI = f"ATTESTATO {CHUNKS['dichiarazioni_responsabile']};"
+
+_PUNTO_STIPULA = "3. DI STIPULARE il contratto mediante corrispondenza secondo l'uso del commercio ai sensi dell'art. 18, comma 1, ultimo periodo del D. Lgs. n. 36/2023;"
+_PUNTI_FINALI = (
+    "6. DI DARE ATTO che l'affidatario assume tutti gli obblighi di tracciabilità dei flussi finanziari di cui all'art. 3 della Legge n. 136/2010 e ss.mm.ii.;",
+    # Pubblicità e Trasparenza
+    "7. DI DISPORRE la pubblicazione del presente provvedimento nella sezione \"Amministrazione Trasparente\" e la trasmissione dei dati alla BDNCP tramite Piattaforma Certificata (PCP) secondo le specifiche tecniche ANAC vigenti;",
+    "8. DI DARE ATTO che la presente determinazione è immediatamente eseguibile ai sensi dell'art. 183 del D. Lgs. n. 267/2000 (TUEL).",
+)
+
+
+@sezione("assembla_visti")
+@legge("imponibile", "righe_offerta", "regolamento_comunale", "piccola_fornitura")
+def assembla_visti(dati: Dati) -> list:
+    ctx = contesto(dati)
+    visti = list(_VISTI_INIZIALI)
     
-    # ROTAZIONE E MOTIVAZIONE SCELTA
-    if imponibile < 5000:
-        visti.append(f"VISTO {CHUNKS['deroga_rotazione_5000']};")
+    # MEPA oppure, sotto soglia, ROTAZIONE E MOTIVAZIONE SCELTA
+    visti.append(_VISTO_DEROGA_ROTAZIONE if ctx.sotto_soglia_5000 else _VISTO_MEPA)
     
     # Gestione Regolamento
-    if dati.get("regolamento_comunale"):
+    if ctx.regolamento_comunale:
         regolamento_testo = CHUNKS['regolamento_comunale'].format(
-            delibera_riferimento=dati.get("regolamento_comunale", "")
+            delibera_riferimento=ctx.regolamento_comunale
         )
         visti.append(f"VISTO {regolamento_testo};")
     
     # Garanzia / CCNL
-    if dati.get("piccola_fornitura", False):
-        visti.append(f"RITENUTO che {CHUNKS['esenzione_garanzia_ccnl']};")
-    
-    visti.append(f"DATO ATTO che {CHUNKS['art_52_requisiti']};")
-    visti.append(f"DATO ATTO che {CHUNKS['art_16_conflitto_interessi']};")
-    visti.append(f"DATO ATTO che {CHUNKS['tracciabilita_l136']};")
-    
-    # GDPR
-    visti.append(f"DATO ATTO che {CHUNKS['gdpr_clause']};")
+    if ctx.piccola_fornitura:
+        visti.append(_RITENUTO_GARANZIA)
     
-    visti.append(f"CONSIDERATO che {CHUNKS['art_18_forma_contratto']};")
+    visti.extend(_VISTI_FINALI)
     
     return visti
 
 
-def genera_premesse(dati: Dict) -> str:
-    importi = calcola_importi(dati.get("imponibile", 0), dati.get("aliquota_iva", 22))
-    
-    data_prev = dati.get("data_preventivo")
-    data_prev_str = formatta_data(data_prev) if isinstance(data_prev, datetime) else str(data_prev)
-    
+@legge(
+    "motivazione", "finalita", "tipo_documento", "numero_preventivo", "data_preventivo",
+    "criterio_scelta", "operatore_uscente",
+    *CHIAVI_FORNITORE, *CHIAVI_IMPORTI, *CHIAVI_AMMINISTRATIVE,
+)
+def componi_premesse(ctx: DeterminaContext, richiami_bilancio: str, visti: list,
+                     sezione_durc: str) -> str:
+    """Testo delle premesse a partire dalle sottosezioni già generate."""
+    importi = ctx.importi_testo
     premesse = []
-    
+
     # 0. RICHIAMI BILANCIO (NUOVO v4.0)
-    richiami_bilancio = genera_richiami_bilancio(dati)
     if richiami_bilancio:
         premesse.append(richiami_bilancio)
-    
+
     # 1. Narrativa
-    premesse.append(f"VERIFICATA la necessità di procedere all'acquisizione di quanto in oggetto, in considerazione di quanto segue: {dati.get('motivazione', '')};")
-    premesse.append(f"CONSIDERATO che la finalità che si intende perseguire con il presente affidamento è: {dati.get('finalita', '')};")
-    
-    # 2. Fornitore e Offerta
-    tipo_doc = dati.get("tipo_documento", "preventivo")
+    premesse.append(f"VERIFICATA la necessità di procedere all'acquisizione di quanto in oggetto, in considerazione di quanto segue: {ctx.motivazione};")
+    premesse.append(f"CONSIDERATO che la finalità che si intende perseguire con il presente affidamento è: {ctx.finalita};")
+
+    # 2. Fornitore e Offerta (con più aliquote, l'IVA è ripartita per aliquota)
+    if ctx.ripartizione_iva:
+        dettaglio = "; ".join(
+            f"al {voce['aliquota']}% su {voce['imponibile']} pari a {voce['iva']}" for voce in ctx.ripartizione_iva
+        )
+        iva_testo = f"pari a {importi['iva']} ({dettaglio})"
+    else:
+        iva_testo = f"al {ctx.aliquota_iva_testo}% pari a {importi['iva']}"
     premesse.append(
-        f"DATO ATTO che l'operatore economico {dati.get('ragione_sociale', '')} "
-        f"con sede in {dati.get('indirizzo', '')}, {dati.get('cap', '')} {dati.get('citta', '')} ({dati.get('provincia_fornitore', '')}), "
-        f"P.IVA/C.F. {dati.get('piva_cf', '')}, ha presentato {tipo_doc} "
-        f"n. {dati.get('numero_preventivo', '')} del {data_prev_str} "
-        f"per un importo di {formatta_importo(importi['imponibile'])} oltre IVA al {dati.get('aliquota_iva', 22)}% "
-        f"pari a {formatta_importo(importi['iva'])}, per un totale complessivo di {formatta_importo(importi['totale'])};"
+        f"DATO ATTO che l'operatore economico {ctx.ragione_sociale} "
+        f"con sede in {ctx.indirizzo}, {ctx.cap} {ctx.citta} ({ctx.provincia_fornitore}), "
+        f"P.IVA/C.F. {ctx.piva_cf}, ha presentato {ctx.tipo_documento} "
+        f"n. {ctx.numero_preventivo} del {ctx.data_preventivo_testo} "
+        f"per un importo di {importi['imponibile']} oltre IVA {iva_testo}, "
+        f"per un totale complessivo di {importi['totale']};"
     )
-    
+
     # 3. Normativa Base
-    premesse.append("CONSIDERATO che l'importo dell'affidamento è inferiore a € 140.000,00 e pertanto rientra nella fattispecie prevista dall'art. 50, comma 1, lett. b) del D. Lgs. n. 36/2023;")
-    
+    premesse.append(_CONSIDERATO_SOGLIA)
+
     # 4. Motivazione Scelta e Rotazione
-    criterio = dati.get("criterio_scelta", "esperienza specifica nel settore")
-    uscente = dati.get("operatore_uscente", False)
-    
-    if uscente:
+    criterio = ctx.criterio_scelta
+    if ctx.operatore_uscente:
         premesse.append(
             f"RITENUTO che, pur trattandosi di gestore uscente, la deroga al principio di rotazione è ampiamente giustificata "
             f"dalla necessità di garantire {criterio}, nonché dall'assenza di alternative altrettanto vantaggiose in termini "
@@ -409,122 +643,138 @@ def genera_premesse(dati: Dict) -> str:
         )
 
     # 5. Congruità
-    premesse.append(f"RITENUTO altresì che {CHUNKS['congruita_economica']};")
+    premesse.append(_RITENUTO_CONGRUITA)
 
     # 6. Visti Normativi
-    premesse.extend(assembla_visti(dati))
-    
+    premesse.extend(visti)
+
     # 7. DURC (NUOVO v4.0)
-    sezione_durc = genera_sezione_durc(dati)
     if sezione_durc:
         premesse.append(sezione_durc)
-    
+
     # 8. Dati Amministrativi
-    premesse.append(f"DATO ATTO che è stato acquisito il Codice Identificativo di Gara (CIG): {dati.get('cig', '')};")
-    
-    rup_nome = f"{dati.get('rup_nome', '')} {dati.get('rup_cognome', '')}"
-    premesse.append(f"DATO ATTO che il Responsabile Unico del Progetto (RUP) è individuato in {rup_nome}, {dati.get('rup_qualifica', '')};")
-    
-    premesse.append(f"VERIFICATA la disponibilità finanziaria sul Capitolo {dati.get('capitolo_bilancio', '')} del Bilancio {dati.get('esercizio_finanziario', '')};")
-    premesse.append(f"ATTESTATO {CHUNKS['dichiarazioni_responsabile']};")
-    
-    premesse.append(f"RITENUTO pertanto di procedere all'affidamento diretto ai sensi dell'art. 50, comma 1, lett. b) del D. Lgs. n. 36/2023 del servizio/fornitura in oggetto all'operatore economico {dati.get('ragione_sociale', '')};")
-    
+    premesse.append(f"DATO ATTO che è stato acquisito il Codice Identificativo di Gara (CIG): {ctx.cig};")
+    premesse.append(f"DATO ATTO che il Responsabile Unico del Progetto (RUP) è individuato in {ctx.rup_nome} {ctx.rup_cognome}, {ctx.rup_qualifica};")
+    premesse.append(f"VERIFICATA la disponibilità finanziaria sul Capitolo {ctx.capitolo_bilancio} del Bilancio {ctx.esercizio_finanziario};")
+    premesse.append(_ATTESTATO_DICHIARAZIONI)
+    premesse.append(f"RITENUTO pertanto di procedere all'affidamento diretto ai sensi dell'art. 50, comma 1, lett. b) del D. Lgs. n. 36/2023 del servizio/fornitura in oggetto all'operatore economico {ctx.ragione_sociale};")
+
     return "\n\n".join(premesse)
 
 
-def genera_dispositivo(dati: Dict) -> str:
-    importi = calcola_importi(dati.get("imponibile", 0), dati.get("aliquota_iva", 22))
-    
-    dispositivo = []
-    dispositivo.append("D E T E R M I N A")
-    
-    # Punto 1: Affidamento e Durata
-    durata = dati.get("durata_servizio", "tempi strettamente necessari all'esecuzione")
-    
+@sezione("genera_premesse")
+@legge(componi_premesse, genera_richiami_bilancio, assembla_visti, genera_sezione_durc)
+def genera_premesse(dati: Dati) -> str:
+    ctx = contesto(dati)
+    return componi_premesse(
+        ctx, genera_richiami_bilancio(ctx), assembla_visti(ctx), genera_sezione_durc(ctx)
+    )
+
+
+@legge("durata_servizio", *CHIAVI_FORNITORE, *CHIAVI_IMPORTI, *CHIAVI_AMMINISTRATIVE)
+def componi_dispositivo(ctx: DeterminaContext, altre_info: str) -> str:
+    """Testo del dispositivo a partire dalla sezione ALTRE INFORMAZIONI già generata."""
+    importi = ctx.importi_testo
+    dispositivo = ["D E T E R M I N A"]
+
+    # Punto 1: Affidamento e Durata (con più aliquote, ripartizione dell'IVA)
+    ripartizione = ""
+    if ctx.ripartizione_iva:
+        ripartizione = ", così ripartita: " + "; ".join(
+            f"IVA al {voce['aliquota']}% pari a {voce['iva']} su imponibile di {voce['imponibile']}"
+            for voce in ctx.ripartizione_iva
+        )
     dispositivo.append(
         f"1. DI AFFIDARE, ai sensi dell'art. 50, comma 1, lett. b) del D. Lgs. n. 36/2023, "
-        f"all'operatore economico {dati.get('ragione_sociale', '')} "
-        f"(P.IVA/C.F. {dati.get('piva_cf', '')}), con sede in {dati.get('indirizzo', '')}, "
-        f"{dati.get('cap', '')} {dati.get('citta', '')} ({dati.get('provincia_fornitore', '')}), "
-        f"il servizio/fornitura indicato in oggetto, per la durata di {durata} e per l'importo complessivo di "
-        f"{formatta_importo(importi['totale'])} (di cui imponibile {formatta_importo(importi['imponibile'])} "
-        f"e IVA {formatta_importo(importi['iva'])});"
+        f"all'operatore economico {ctx.ragione_sociale} "
+        f"(P.IVA/C.F. {ctx.piva_cf}), con sede in {ctx.indirizzo}, "
+        f"{ctx.cap} {ctx.citta} ({ctx.provincia_fornitore}), "
+        f"il servizio/fornitura indicato in oggetto, per la durata di {ctx.durata_servizio} e per l'importo complessivo di "
+        f"{importi['totale']} (di cui imponibile {importi['imponibile']} "
+        f"e IVA {importi['iva']}{ripartizione});"
     )
-    
+
     dispositivo.append(
-        f"2. DI IMPEGNARE la somma complessiva di {formatta_importo(importi['totale'])} "
-        f"al Capitolo {dati.get('capitolo_bilancio', '')} del Bilancio "
-        f"{dati.get('esercizio_finanziario', '')}, dando atto che il pagamento "
+        f"2. DI IMPEGNARE la somma complessiva di {importi['totale']} "
+        f"al Capitolo {ctx.capitolo_bilancio} del Bilancio "
+        f"{ctx.esercizio_finanziario}, dando atto che il pagamento "
         f"avverrà a seguito di presentazione di regolare fattura elettronica e previa verifica "
         f"della regolarità contributiva (DURC) e fiscale;"
     )
-    
-    dispositivo.append(f"3. DI STIPULARE il contratto mediante corrispondenza secondo l'uso del commercio ai sensi dell'art. 18, comma 1, ultimo periodo del D. Lgs. n. 36/2023;")
-    
-    dispositivo.append(f"4. DI DARE ATTO che il Codice Identificativo di Gara (CIG) assegnato alla presente procedura è: {dati.get('cig', '')};")
-    
-    rup_nome = f"{dati.get('rup_nome', '')} {dati.get('rup_cognome', '')}"
-    dispositivo.append(f"5. DI DARE ATTO che il Responsabile Unico del Progetto (RUP) è {rup_nome}, {dati.get('rup_qualifica', '')};")
-    
-    dispositivo.append(f"6. DI DARE ATTO che l'affidatario assume tutti gli obblighi di tracciabilità dei flussi finanziari di cui all'art. 3 della Legge n. 136/2010 e ss.mm.ii.;")
-    
-    # Pubblicità e Trasparenza
-    dispositivo.append(f"7. DI DISPORRE la pubblicazione del presente provvedimento nella sezione \"Amministrazione Trasparente\" e la trasmissione dei dati alla BDNCP tramite Piattaforma Certificata (PCP) secondo le specifiche tecniche ANAC vigenti;")
-    
-    dispositivo.append(f"8. DI DARE ATTO che la presente determinazione è immediatamente eseguibile ai sensi dell'art. 183 del D. Lgs. n. 267/2000 (TUEL).")
-    
+
+    dispositivo.append(_PUNTO_STIPULA)
+    dispositivo.append(f"4. DI DARE ATTO che il Codice Identificativo di Gara (CIG) assegnato alla presente procedura è: {ctx.cig};")
+    dispositivo.append(f"5. DI DARE ATTO che il Responsabile Unico del Progetto (RUP) è {ctx.rup_nome} {ctx.rup_cognome}, {ctx.rup_qualifica};")
+    dispositivo.extend(_PUNTI_FINALI)
+
     # SEZIONI FINALI (NUOVO v4.0)
-    altre_info = genera_sezione_altre_informazioni(dati)
     if altre_info:
         dispositivo.append(altre_info)
-    
+
     return "\n\n".join(dispositivo)
 
 
-def genera_chiusura(dati: Dict) -> str:
+@sezione("genera_dispositivo")
+@legge(componi_dispositivo, genera_sezione_altre_informazioni)
+def genera_dispositivo(dati: Dati) -> str:
+    ctx = contesto(dati)
+    return componi_dispositivo(ctx, genera_sezione_altre_informazioni(ctx))
+
+
+def componi_chiusura(visto: str, attestato: str) -> str:
+    """Visto contabile e attestato, saltando le parti vuote."""
+    return "\n".join(parte for parte in (visto, attestato) if parte)
+
+
+@sezione("genera_chiusura")
+@legge(genera_visto_regolarita_contabile, genera_attestato_pubblicazione)
+def genera_chiusura(dati: Dati) -> str:
     """
     Genera la parte di chiusura del documento con visto contabile e attestato.
     (NUOVO v4.0)
     """
-    chiusura = []
-    
-    # Visto di regolarità contabile
-    visto = genera_visto_regolarita_contabile(dati)
-    if visto:
-        chiusura.append(visto)
-    
-    # Attestato di pubblicazione
-    attestato = genera_attestato_pubblicazione(dati)
-    if attestato:
-        chiusura.append(attestato)
-    
-    return "\n".join(chiusura)
+    ctx = contesto(dati)
+    return componi_chiusura(
+        genera_visto_regolarita_contabile(ctx), genera_attestato_pubblicazione(ctx)
+    )
 
 
-def genera_testo_completo(dati: Dict) -> Tuple[str, str]:
+@sezione("genera_testo_completo")
+@legge(genera_premesse, genera_dispositivo, genera_chiusura)
+def genera_testo_completo(dati: Dati) -> Tuple[str, str]:
     """
     Funzione principale che genera il testo completo della determina.
     Restituisce una tupla (premesse, dispositivo).
+    Accetta un DeterminaContext o il dizionario `dati`, convertito una
+    sola volta e condiviso da tutte le sezioni.
     
     v4.0: Include sezioni bilancio, DURC, visto contabile, ricorsi.
     """
-    premesse = genera_premesse(dati)
-    dispositivo = genera_dispositivo(dati)
+    ctx = contesto(dati)
+    premesse = genera_premesse(ctx)
+    dispositivo = genera_dispositivo(ctx)
     
     # Aggiungi chiusura (visto contabile + attestato) al dispositivo
-    chiusura = genera_chiusura(dati)
+    chiusura = genera_chiusura(ctx)
     if chiusura:
         dispositivo += chiusura
     
     return premesse, dispositivo
 
 
-def valida_dati(dati: Dict) -> Tuple[bool, list]:
+def valida_dati(dati: Dati) -> Tuple[bool, list]:
     """
     Valida i dati obbligatori per la generazione della determina.
     """
+    if isinstance(dati, DeterminaContext):
+        dati = dati.dati or {nome: getattr(dati, nome) for nome in _CAMPI}
     errori = []
+    righe = dati.get("righe_offerta")
+    if righe:
+        try:
+            centesimi_righe(righe)
+        except ValueError as e:
+            errori.append(f"Righe dell'offerta: {e}")
     campi_obbligatori = [
         ("ragione_sociale", "Ragione Sociale"),
         ("piva_cf", "P.IVA / Codice Fiscale"),
@@ -537,6 +787,8 @@ def valida_dati(dati: Dict) -> Tuple[bool, list]:
     ]
     
     for campo, nome in campi_obbligatori:
+        if campo == "imponibile" and righe:
+            continue
         valore = dati.get(campo)
         if valore is None or (isinstance(valore, str) and not valore.strip()):
             errori.append(f"Il campo '{nome}' è obbligatorio")
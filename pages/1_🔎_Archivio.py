@@ -0,0 +1,81 @@
+"""
+DETERMINAFACILE - Ricerca nell'Archivio
+Pagina Streamlit per cercare le determine generate (archivio.py): testo
+libero su oggetto, motivazione e testo dell'atto, più filtri per
+fornitore, CIG, esercizio, periodo e importo. Si vedono solo gli atti
+dell'ente riconosciuto dal codice di accesso (accesso.py).
+"""
+
+import streamlit as st
+
+from accesso import modulo_accesso
+from archivio import PERCORSO_PREDEFINITO, ArchivioDetermine
+from logic_engine import formatta_importo
+
+
+RISULTATI_PER_PAGINA = 25
+
+
+@st.cache_resource
+def get_archivio():
+    return ArchivioDetermine(PERCORSO_PREDEFINITO) if PERCORSO_PREDEFINITO else None
+
+
+st.set_page_config(page_title="DeterminaFacile | Archivio", page_icon="🔎", layout="wide")
+st.title("🔎 Archivio determine")
+
+archivio = get_archivio()
+if archivio is None:
+    st.info("L'archivio è disattivato (variabile DETERMINAFACILE_ARCHIVIO non impostata).")
+    st.stop()
+
+ente = modulo_accesso()
+if ente is None:
+    st.info("Inserisci il codice del tuo ente per cercare le sue determine.")
+    st.stop()
+
+testo = st.text_input("Cerca nel testo", placeholder="es. manutenzione verde pubblico, forn* per prefisso")
+f1, f2, f3 = st.columns(3)
+with f1:
+    ragione_sociale = st.text_input("Ragione sociale (inizio)")
+with f2:
+    piva_cf = st.text_input("P.IVA / CF")
+    cig = st.text_input("CIG")
+with f3:
+    esercizio = st.text_input("Esercizio", placeholder="es. 2025")
+    periodo = st.date_input("Periodo (data atto)", value=(), format="DD/MM/YYYY")
+i1, i2, i3 = st.columns(3)
+with i1: importo_min = st.number_input("Totale da €", min_value=0.0, value=None, step=1000.0)
+with i2: importo_max = st.number_input("Totale fino a €", min_value=0.0, value=None, step=1000.0)
+with i3: pagina = st.number_input("Pagina", min_value=1, value=1)
+
+dal = periodo[0] if len(periodo) > 0 else None
+al = periodo[1] if len(periodo) > 1 else None
+
+risultati = archivio.cerca(
+    testo, ente=ente, cig=cig, piva_cf=piva_cf, ragione_sociale=ragione_sociale,
+    esercizio=esercizio.strip(), dal=dal, al=al,
+    importo_min=importo_min, importo_max=importo_max,
+    limite=RISULTATI_PER_PAGINA, offset=(pagina - 1) * RISULTATI_PER_PAGINA,
+)
+
+st.caption(f"{archivio.conta(ente):,} atti di {ente} in archivio".replace(",", "."))
+if not risultati:
+    st.warning("Nessuna determina trovata.")
+
+for atto in risultati:
+    data = "/".join(reversed(atto.data_atto.split("-"))) if atto.data_atto else "s.d."
+    with st.expander(f"{data} · {atto.ente or '—'} · {atto.oggetto[:90]}"):
+        st.markdown(
+            f"**{atto.ragione_sociale}** (P.IVA/CF {atto.piva_cf}) · CIG {atto.cig} · "
+            f"Cap. {atto.capitolo} / {atto.esercizio} · Totale {formatta_importo(atto.totale)}"
+        )
+        if atto.estratto:
+            st.caption(atto.estratto)
+        if st.button("Prepara RTF", key=f"rtf_{atto.id}"):
+            completo = archivio.leggi(atto.id, ente=ente)
+            if completo and completo.rtf:
+                st.download_button("📥 DOWNLOAD", data=completo.rtf, file_name=completo.nome_file,
+                                   mime="application/rtf", key=f"scarica_{atto.id}")
+            else:
+                st.info("RTF non conservato per questo atto.")
@@ -0,0 +1,253 @@
+"""
+DETERMINAFACILE - Parti Statiche della Pagina v1.0
+CSS e blocchi HTML/Markdown fissi di app.py (intestazione, schede dei
+vantaggi, disclaimer, domande frequenti, note legali, piè di pagina).
+Streamlit riesegue app.py a ogni interazione: qui le stringhe sono
+costruite una sola volta per processo, all'import del modulo, e app.py si
+limita a passarle a st.markdown.
+- Il CSS è minificato una volta sola (commenti e spazi superflui rimossi):
+  lo stesso foglio di stile viaggia verso il browser a ogni esecuzione
+"""
+
+import re
+
+
+def minifica_css(css: str) -> str:
+    """Toglie commenti e spazi superflui (attorno a { } ; , >) da un foglio di stile."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    return css.replace(";}", "}").strip()
+
+
+# =============================================================================
+# CSS (v3.2 - Fix Bordi)
+# =============================================================================
+
+_CSS_SORGENTE = """
+    /* ================= TEMA GLOBALE ================= */
+    .stApp {
+        background-color: #ffffff;
+    }
+
+    /* BARRA LATERALE (SIDEBAR) */
+    [data-testid="stSidebar"] {
+        background-color: #eef4f9 !important;
+        border-right: 2px solid #d0e0f0 !important;
+    }
+    /* Testi nella sidebar più grandi */
+    [data-testid="stSidebar"] .stMarkdown p, 
+    [data-testid="stSidebar"] .stTextInput label, 
+    [data-testid="stSidebar"] .stSelectbox label {
+        font-size: 1rem !important;
+        color: #003366 !important;
+    }
+
+    /* ================= FIX BORDI INPUT (Il trucco è qui) ================= */
+    /* Invece di colorare l'input interno, coloriamo il contenitore (wrapper) */
+    
+    div[data-baseweb="input"], div[data-baseweb="textarea"], div[data-baseweb="select"] > div {
+        border: 1px solid #003366 !important;
+        border-radius: 6px !important;
+        background-color: white !important;
+    }
+    
+    /* Rimuoviamo il bordo dall'input interno per evitare doppi bordi o glitch */
+    .stTextInput input, .stTextArea textarea {
+        border: none !important;
+        box-shadow: none !important;
+    }
+
+    /* Etichette (Labels) */
+    .stTextInput label, .stTextArea label, .stSelectbox label, .stNumberInput label, .stDateInput label, .stCheckbox label {
+        font-size: 1.05rem !important;
+        font-weight: 600 !important;
+        color: #003366 !important;
+    }
+
+    /* ================= COMPONENTI GRAFICI ================= */
+
+    /* HERO CONTAINER */
+    div.hero-container {
+        background-color: #003366 !important;
+        background-image: linear-gradient(180deg, #004080 0%, #003366 100%) !important;
+        color: white !important;
+        padding: 2.5rem 2rem;
+        border-radius: 10px;
+        text-align: center;
+        margin-bottom: 2rem;
+        box-shadow: 0 4px 10px rgba(0, 51, 102, 0.2);
+    }
+    h1.hero-title {
+        color: white !important;
+        font-family: 'Helvetica Neue', sans-serif;
+        font-weight: 800 !important;
+    }
+    p.hero-subtitle { color: #dceefb !important; font-size: 1.25rem !important; }
+
+    /* BADGE GRATIS */
+    div.free-badge {
+        background-color: #FFC107 !important;
+        color: #003366 !important;
+        padding: 8px 18px;
+        border-radius: 20px;
+        font-weight: 900;
+        font-size: 1rem !important;
+        display: inline-block;
+        margin-top: 15px;
+        box-shadow: 0 2px 5px rgba(0,0,0,0.2);
+    }
+
+    /* CARD VANTAGGI */
+    div.feature-card {
+        background-color: white !important;
+        padding: 1.5rem;
+        border-radius: 8px;
+        border: 1px solid #dae1e7;
+        text-align: center;
+        height: 100%;
+        box-shadow: 0 2px 4px rgba(0,0,0,0.03);
+        transition: transform 0.2s;
+    }
+    div.feature-card:hover {
+        transform: translateY(-3px);
+        border-color: #003366 !important;
+    }
+    div.feature-title {
+        color: #003366 !important;
+        font-weight: 700;
+        margin-top: 10px;
+        font-size: 1.2rem !important;
+    }
+    div.feature-card p { font-size: 1rem !important; line-height: 1.5; }
+
+    /* PULSANTI STANDARD */
+    div.stButton > button:first-child {
+        background-color: #003366 !important;
+        color: white !important;
+        border: 1px solid #002244 !important;
+        font-weight: 600;
+        font-size: 1.1rem !important;
+        padding: 0.7rem 1rem !important;
+    }
+    div.stButton > button:first-child:hover {
+        background-color: #002244 !important;
+        color: #FFC107 !important;
+        border-color: #FFC107 !important;
+    }
+
+    /* BOX AI */
+    div.ai-box {
+        background-color: #eef6fc !important;
+        border-left: 5px solid #0055A4 !important;
+        padding: 15px;
+        border-radius: 4px;
+        margin-bottom: 15px;
+    }
+
+    /* SEO BOX FOOTER */
+    div.seo-box {
+        background-color: #f9f9f9 !important;
+        padding: 2rem;
+        border-top: 3px solid #003366;
+        margin-top: 3rem;
+    }
+    div.seo-box h2 { color: #003366 !important; }
+    div.seo-box p, div.seo-box li { font-size: 1rem !important; line-height: 1.6; }
+
+    /* DISCLAIMER */
+    div.disclaimer-alert {
+        background-color: #fffde7 !important;
+        border-left: 6px solid #ffc107 !important;
+        padding: 1.2rem !important;
+        color: #333 !important;
+        font-size: 1rem !important;
+    }
+    
+    .stCaption { font-size: 0.95rem !important; color: #555 !important; }
+    div[data-testid="stExpander"] p { font-size: 1rem !important; }
+"""
+
+CSS = f"<style>{minifica_css(_CSS_SORGENTE)}</style>"
+
+
+# =============================================================================
+# HEADER & LANDING
+# =============================================================================
+
+INTESTAZIONE = """
+<div class="hero-container">
+    <h1 class="hero-title">DeterminaFacile</h1>
+    <p class="hero-subtitle">Crea la tua <strong>Determina di Affidamento Diretto</strong> (Art. 50) in 2 minuti.<br>Conforme al D.Lgs 36/2023, con assistenza AI.</p>
+    <div class="free-badge">✨ 100% GRATUITO & OPEN SOURCE</div>
+</div>
+"""
+
+SCHEDE_VANTAGGI = (
+    """
+    <div class="feature-card">
+        <div style="font-size: 2.5rem;">⚡</div>
+        <div class="feature-title">Più veloce di un Fac-simile</div>
+        <p>Non perdere tempo a cancellare dati vecchi da modelli Word obsoleti. Genera una determina pulita e pronta in pochi click.</p>
+    </div>
+    """,
+    """
+    <div class="feature-card">
+        <div style="font-size: 2.5rem;">⚖️</div>
+        <div class="feature-title">Conforme Art. 50 D.Lgs 36/2023</div>
+        <p>Include automaticamente le clausole per l'affidamento diretto sottosoglia e la deroga alla rotazione (Art. 49) per importi < 5.000€.</p>
+    </div>
+    """,
+    """
+    <div class="feature-card">
+        <div style="font-size: 2.5rem;">✨</div>
+        <div class="feature-title">AI Magic Writer</div>
+        <p>Non sai come scrivere la motivazione? L'Intelligenza Artificiale trasforma la tua idea in linguaggio amministrativo formale.</p>
+    </div>
+    """,
+)
+
+DISCLAIMER = """
+    <div class="disclaimer-alert">
+    <strong>⚠️ DISCLAIMER LEGALE</strong><br>
+    Questo strumento genera bozze di atti amministrativi. L'utente (RUP/Istruttore) è l'unico responsabile della verifica di correttezza formale, sostanziale e contabile prima della sottoscrizione.
+    </div>
+    """
+
+
+# =============================================================================
+# SEO & FOOTER
+# =============================================================================
+
+DOMANDE_FREQUENTI = """
+<div class="seo-box">
+<h2>Domande Frequenti su DeterminaFacile</h2>
+
+<h3>Cerchi un Fac-simile di Determina Aggiornato al 2025?</h3>
+<p>Molti RUP cercano <em>modelli Word statici</em> che rischiano di avere riferimenti normativi vecchi. DeterminaFacile non è un semplice fac-simile, ma un <strong>generatore intelligente gratuito</strong> che compila per te l'atto citando correttamente il <strong>Nuovo Codice Appalti (D.Lgs 36/2023)</strong>.</p>
+
+<h3>È davvero gratuito?</h3>
+<p>Sì. DeterminaFacile è un progetto <strong>Open Source</strong> senza fini di lucro, nato per semplificare la burocrazia. Non ci sono costi nascosti né abbonamenti.</p>
+
+<h3>Come gestire l'Affidamento Diretto Sottosoglia (Art. 50)?</h3>
+<p>Il software crea automaticamente la struttura per gli affidamenti diretti di servizi e forniture sotto i 140.000€, inserendo le clausole corrette per l'<strong>Art. 50 comma 1 lett. b)</strong>.</p>
+</div>
+"""
+
+NOTE_LEGALI = """
+    ### 1. Termini e Condizioni
+    L'applicazione "DeterminaFacile" è fornita "così com'è" (as-is). L'autore non si assume responsabilità per errori o omissioni negli atti generati.
+    ### 2. Privacy Policy AI
+    I dati inseriti nei campi assistiti dall'Intelligenza Artificiale vengono elaborati da OpenAI. **NON inserire dati personali** (nomi di persone fisiche, dati sanitari) nei prompt dell'AI.
+    Tutti i dati inseriti nel modulo restano nella sessione e vengono cancellati al termine della sessione (chiusura pagina).
+    ### 3. Archivio dell'ente
+    Se il gestore del servizio ha attivato l'archivio e l'utente accede con il **codice del proprio ente**, le determine scaricate (testo completo, dati del fornitore compresa la P.IVA/CF, documento RTF) sono conservate nell'archivio di quell'ente, consultabile solo con lo stesso codice. Senza codice ente nessuna determina viene conservata.
+    ### 4. Cookie Policy
+    Questo sito utilizza esclusivamente **Cookie Tecnici** necessari al funzionamento. Non viene effettuata profilazione pubblicitaria.
+    """
+
+PIE_DI_PAGINA = """
+<div style="text-align: center; margin-top: 2rem; color: #888; font-size: 0.8rem;">
+    <p><strong>DeterminaFacile.it</strong> © 2025 - Piattaforma Open Source per la P.A.</p>
+</div>
+"""
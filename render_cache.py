@@ -0,0 +1,165 @@
+"""
+DETERMINAFACILE - Cache di Rendering v1.0
+Memorizza i testi (premesse/dispositivo) e i bytes RTF delle determine già
+generate, indicizzati con un hash canonico dei dati del form.
+Due bozze identiche (anche di utenti diversi dello stesso ente) producono
+la stessa chiave e condividono la stessa voce di cache.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+
+from logic_engine import genera_testo_completo
+from document_generator import esporta_determina_rtf
+
+
+# =============================================================================
+# HASH CANONICO DEI DATI
+# =============================================================================
+
+def _normalizza_valore(valore):
+    """
+    Rende serializzabile in JSON un valore del form mantenendo distinti i tipi
+    che producono testi diversi (es. 22 e 22.0, '2025-01-01' e una data).
+    """
+    if isinstance(valore, datetime):
+        return {"__datetime__": valore.isoformat()}
+    if isinstance(valore, date):
+        return {"__date__": valore.isoformat()}
+    if isinstance(valore, time):
+        return {"__time__": valore.isoformat()}
+    if isinstance(valore, Decimal):
+        return {"__decimal__": str(valore)}
+    if isinstance(valore, (set, frozenset)):
+        return sorted(valore, key=repr)
+    if isinstance(valore, tuple):
+        return list(valore)
+    raise TypeError(f"Valore non supportato nella chiave di cache: {type(valore).__name__}")
+
+
+def hash_dati(dati: Dict) -> str:
+    """
+    Calcola un hash stabile (SHA-256) del dizionario `dati`.
+    L'ordine delle chiavi non conta; bool, int, float, Decimal e date
+    restano distinguibili tra loro.
+    """
+    serializzato = json.dumps(
+        dati, default=_normalizza_valore, sort_keys=True,
+        ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(serializzato.encode("utf-8")).hexdigest()
+
+
+# =============================================================================
+# GENERAZIONE COMPLETA DI UNA DETERMINA
+# =============================================================================
+
+@dataclass(frozen=True)
+class DeterminaGenerata:
+    """Risultato completo di una generazione: testi, RTF e nome file."""
+    premesse: str
+    dispositivo: str
+    rtf: bytes
+    nome_file: str
+
+    @property
+    def dimensione(self) -> int:
+        """Occupazione approssimativa in bytes (usata per il limite della cache)."""
+        return len(self.rtf) + 2 * (len(self.premesse) + len(self.dispositivo))
+
+
+def genera_testi(dati: Dict) -> Tuple[str, str]:
+    """
+    Premesse e dispositivo della determina. Se `dati` contiene `codice_cpv`,
+    il relativo VISTO viene aggiunto in coda alle premesse.
+    """
+    premesse, dispositivo = genera_testo_completo(dati)
+    codice_cpv = dati.get("codice_cpv")
+    if codice_cpv:
+        premesse += f"\nVISTO il codice CPV individuato: {codice_cpv};\n"
+    return premesse, dispositivo
+
+
+def genera_determina(dati: Dict) -> DeterminaGenerata:
+    """Genera testi e RTF di una determina (vedi genera_testi)."""
+    premesse, dispositivo = genera_testi(dati)
+    rtf, nome_file = esporta_determina_rtf(dati, premesse, dispositivo)
+    return DeterminaGenerata(premesse, dispositivo, rtf, nome_file)
+
+
+# =============================================================================
+# CACHE LRU
+# =============================================================================
+
+class CacheRender:
+    """
+    Cache LRU thread-safe delle determine generate.
+
+    Args:
+        max_voci: Numero massimo di determine memorizzate
+        max_bytes: Occupazione massima complessiva (bytes RTF + testi)
+    """
+
+    def __init__(self, max_voci: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_voci = max_voci
+        self.max_bytes = max_bytes
+        self._voci: "OrderedDict[str, DeterminaGenerata]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hit = 0
+        self.miss = 0
+        self.evict = 0
+
+    def _cerca(self, chiave: str) -> Optional[DeterminaGenerata]:
+        with self._lock:
+            voce = self._voci.get(chiave)
+            if voce is None:
+                self.miss += 1
+                return None
+            self._voci.move_to_end(chiave)
+            self.hit += 1
+            return voce
+
+    def _memorizza(self, chiave: str, voce: DeterminaGenerata) -> None:
+        with self._lock:
+            if chiave in self._voci:
+                return
+            if voce.dimensione > self.max_bytes:
+                return
+            self._voci[chiave] = voce
+            self._bytes += voce.dimensione
+            while len(self._voci) > self.max_voci or self._bytes > self.max_bytes:
+                _, rimossa = self._voci.popitem(last=False)
+                self._bytes -= rimossa.dimensione
+                self.evict += 1
+
+    def genera(self, dati: Dict) -> DeterminaGenerata:
+        """Restituisce la determina dalla cache oppure la genera e la memorizza."""
+        chiave = hash_dati(dati)
+        voce = self._cerca(chiave)
+        if voce is None:
+            voce = genera_determina(dati)
+            self._memorizza(chiave, voce)
+        return voce
+
+    def svuota(self) -> None:
+        with self._lock:
+            self._voci.clear()
+            self._bytes = 0
+
+    def statistiche(self) -> Dict[str, int]:
+        """Contatori di hit/miss/evict e occupazione corrente."""
+        with self._lock:
+            return {
+                "hit": self.hit,
+                "miss": self.miss,
+                "evict": self.evict,
+                "voci": len(self._voci),
+                "bytes": self._bytes,
+            }
@@ -0,0 +1,199 @@
+"""
+DETERMINAFACILE - Rendering Incrementale v1.0
+Rigenera solo le sezioni della determina i cui dati sono cambiati rispetto
+al rendering precedente: ogni generatore di logic_engine dichiara con
+@legge le chiavi di `dati` che usa, il renderer ricorda l'ultimo testo di
+ogni sezione e, a ogni nuovo rendering, riesegue solo le sezioni che
+leggono una chiave cambiata e ricuce i testi.
+- Premesse e dispositivo sono conservati come "scheletro": il template
+  eseguito con dei segnaposto al posto delle sottosezioni. Se cambiano
+  solo le sottosezioni (es. il protocollo DURC) lo scheletro non si
+  riesegue: i nuovi testi sono inseriti al posto dei segnaposto
+- Se non cambia niente, il contesto (DeterminaContext) non viene nemmeno
+  costruito
+- Il confronto tiene distinti i tipi (22 e 22.0 producono testi diversi)
+
+Il testo prodotto è sempre identico a genera_testo_completo. Un renderer
+ricorda una sola determina e non è thread-safe: se ne usa uno per sessione
+o per processo (es. un worker di batch.py, dove righe consecutive spesso
+differiscono in pochi campi).
+"""
+
+import copy
+import re
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from logic_engine import (
+    _CAMPI,
+    DeterminaContext,
+    Dati,
+    assembla_visti,
+    componi_chiusura,
+    componi_dispositivo,
+    componi_premesse,
+    contesto,
+    genera_attestato_pubblicazione,
+    genera_richiami_bilancio,
+    genera_sezione_altre_informazioni,
+    genera_sezione_durc,
+    genera_testo_completo,
+    genera_visto_regolarita_contabile,
+)
+
+
+# Chiave assente da `dati` / chiave mai letta (primo rendering)
+_ASSENTE = object()
+_MAI_LETTO = object()
+
+# Sottosezioni: nome -> generatore (riceve il contesto)
+SOTTOSEZIONI = {
+    "richiami_bilancio": genera_richiami_bilancio,
+    "visti": assembla_visti,
+    "sezione_durc": genera_sezione_durc,
+    "altre_info": genera_sezione_altre_informazioni,
+    "visto": genera_visto_regolarita_contabile,
+    "attestato": genera_attestato_pubblicazione,
+}
+
+# Sottosezioni inserite in premesse e dispositivo
+FIGLI_PREMESSE = ("richiami_bilancio", "visti", "sezione_durc")
+FIGLI_DISPOSITIVO = ("altre_info",)
+
+# Chiavi confrontate tra un rendering e il successivo
+CHIAVI = genera_testo_completo.chiavi
+
+_RE_SEGNAPOSTO = re.compile("\x00(\\w+)\x00")
+
+
+def _segnaposto(nome: str) -> str:
+    return f"\x00{nome}\x00"
+
+
+def _scheletro(testo: str, attesi: Tuple[str, ...]) -> Optional[List[str]]:
+    """
+    Divide il testo prodotto con i segnaposto in [testo, nome, testo, ...];
+    None se i segnaposto non sono esattamente quelli attesi (es. un campo
+    contiene lo stesso carattere di controllo): si ricompone ogni volta.
+    """
+    parti = _RE_SEGNAPOSTO.split(testo)
+    return parti if sorted(parti[1::2]) == sorted(attesi) else None
+
+
+def _cuci(parti: List[str], testi: Dict[str, str]) -> str:
+    cucite = parti[:]
+    cucite[1::2] = [testi[nome] for nome in parti[1::2]]
+    return "".join(cucite)
+
+
+class RenderIncrementale:
+    """
+    Renderer che conserva l'ultimo testo di ogni sezione.
+
+    Attributi `rigenerate` e `riusate`: sezioni dell'ultimo rendering,
+    utili per verificare quanto lavoro è stato risparmiato.
+    """
+
+    def __init__(self):
+        self._valori: Optional[Dict] = None
+        self._sezioni: Dict[str, object] = {}
+        # nome -> (sottosezioni non vuote, parti dello scheletro o None)
+        self._scheletri: Dict[str, Tuple[Tuple[bool, ...], Optional[List[str]]]] = {}
+        self._premesse = ""
+        self._dispositivo = ""
+        self.rigenerate: Tuple[str, ...] = ()
+        self.riusate: Tuple[str, ...] = ()
+
+    def azzera(self) -> None:
+        """Dimentica il rendering precedente (il prossimo è completo)."""
+        self._valori = None
+        self._sezioni.clear()
+        self._scheletri.clear()
+
+    def _nuovi_valori(self, dati: Dati) -> Dict:
+        """
+        Valori delle chiavi cambiate rispetto al rendering precedente (tutte
+        al primo). I valori mutabili (es. righe_offerta) sono copiati, perché
+        il chiamante potrebbe modificarli sul posto prima del rendering dopo.
+        """
+        if isinstance(dati, DeterminaContext):
+            dati = dati.dati or {nome: getattr(dati, nome) for nome in _CAMPI}
+        leggi = dati.get
+        precedenti = self._valori or {}
+        nuovi = {}
+        for chiave in CHIAVI:
+            valore = leggi(chiave, _ASSENTE)
+            precedente = precedenti.get(chiave, _MAI_LETTO)
+            if valore is precedente or (type(valore) is type(precedente) and valore == precedente):
+                continue
+            nuovi[chiave] = copy.deepcopy(valore) if isinstance(valore, (list, dict)) else valore
+        return nuovi
+
+    def cambiate(self, dati: Dati) -> FrozenSet[str]:
+        """Chiavi lette dalle sezioni il cui valore è diverso dal rendering precedente."""
+        return frozenset(self._nuovi_valori(dati))
+
+    def genera(self, dati: Dati) -> Tuple[str, str]:
+        """Come genera_testo_completo: restituisce (premesse, dispositivo)."""
+        nuovi = self._nuovi_valori(dati)
+        cambiate = frozenset(nuovi)
+        if not cambiate:
+            self.rigenerate, self.riusate = (), (*SOTTOSEZIONI, "premesse", "dispositivo")
+            return self._premesse, self._dispositivo
+
+        try:
+            ctx = contesto(dati)
+            rigenerate = [nome for nome, generatore in SOTTOSEZIONI.items()
+                          if nome not in self._sezioni or generatore.chiavi & cambiate]
+            for nome in rigenerate:
+                self._sezioni[nome] = SOTTOSEZIONI[nome](ctx)
+            s = self._sezioni
+
+            if componi_premesse.chiavi & cambiate or set(FIGLI_PREMESSE) & set(rigenerate):
+                testi = {
+                    "richiami_bilancio": s["richiami_bilancio"],
+                    "visti": "\n\n".join(s["visti"]),
+                    "sezione_durc": s["sezione_durc"],
+                }
+                self._premesse = self._ricomponi(
+                    "premesse", ctx, componi_premesse.chiavi & cambiate, testi, rigenerate,
+                    lambda r, v, d: componi_premesse(ctx, r, [v] if v else [], d),
+                )
+            if componi_dispositivo.chiavi & cambiate or {"altre_info", "visto", "attestato"} & set(rigenerate):
+                base = self._ricomponi(
+                    "dispositivo", ctx, componi_dispositivo.chiavi & cambiate,
+                    {"altre_info": s["altre_info"]}, rigenerate,
+                    lambda a: componi_dispositivo(ctx, a),
+                )
+                self._dispositivo = base + componi_chiusura(s["visto"], s["attestato"])
+        except Exception:
+            # Sezioni e valori ricordati devono restare coerenti tra loro
+            self.azzera()
+            raise
+
+        if self._valori is None:
+            self._valori = nuovi
+        else:
+            self._valori.update(nuovi)
+        self.rigenerate = tuple(rigenerate)
+        self.riusate = tuple(n for n in (*SOTTOSEZIONI, "premesse", "dispositivo") if n not in rigenerate)
+        return self._premesse, self._dispositivo
+
+    def _ricomponi(self, nome: str, ctx, proprie_cambiate, testi: Dict[str, str],
+                   rigenerate: List[str], componi) -> str:
+        """
+        Testo di premesse o dispositivo: riesegue il template (con i
+        segnaposto) solo se sono cambiate le sue chiavi o quali sottosezioni
+        sono vuote, altrimenti inserisce i testi nello scheletro conservato.
+        """
+        figli = tuple(testi)
+        presenti = tuple(bool(testi[figlio]) for figlio in figli)
+        conservato = self._scheletri.get(nome)
+        if proprie_cambiate or conservato is None or conservato[0] != presenti:
+            testo = componi(*(_segnaposto(f) if p else "" for f, p in zip(figli, presenti)))
+            attesi = tuple(f for f, p in zip(figli, presenti) if p)
+            conservato = self._scheletri[nome] = (presenti, _scheletro(testo, attesi))
+            rigenerate.append(nome)
+        parti = conservato[1]
+        if parti is None:
+            return componi(*(testi[f] for f in figli))
+        return _cuci(parti, testi)
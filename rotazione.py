@@ -0,0 +1,253 @@
+"""
+DETERMINAFACILE - Indice di Rotazione v1.0
+Verifica del principio di rotazione (art. 49 D.Lgs. 36/2023) sugli
+affidamenti già emessi dallo stesso ente: l'operatore economico ha già
+ricevuto un affidamento nella stessa categoria merceologica (gruppo CPV)
+nel periodo considerato?
+- Indice in memoria per (ente, P.IVA/CF, categoria CPV): la verifica al
+  momento della compilazione è una lettura di dizionario più una ricerca
+  binaria sulle date, indipendente dalla dimensione dell'archivio
+- Caricato dall'archivio delle determine (archivio.py) limitandosi agli
+  atti della finestra temporale, poi aggiornato a ogni nuovo atto
+Senza CPV la categoria non è verificabile: si considerano tutti gli
+affidamenti allo stesso operatore.
+"""
+
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# Cifre del codice CPV che individuano la categoria: 3 = gruppo
+# (es. 302 'Computer e relative forniture'), 2 = divisione, 4 = classe
+CIFRE_CATEGORIA = 3
+
+# Periodo considerato a ritroso dalla data dell'atto
+FINESTRA_GIORNI = 3 * 365
+
+_RE_CPV = re.compile(r"\b(\d{8})(?:-\d)?\b")
+
+
+def categoria_cpv(codice_cpv: Optional[str], cifre: int = CIFRE_CATEGORIA) -> str:
+    """'30213100-6 - Computer portatili' -> '302'; '' se il testo non contiene un codice CPV."""
+    trovato = _RE_CPV.search(codice_cpv or "")
+    return trovato.group(1)[:cifre] if trovato else ""
+
+
+def normalizza_piva(piva_cf: Optional[str]) -> str:
+    """P.IVA/CF confrontabile: senza spazi, maiuscolo, senza prefisso 'IT' della P.IVA."""
+    testo = "".join((piva_cf or "").split()).upper()
+    if testo.startswith("IT") and testo[2:].isdigit():
+        testo = testo[2:]
+    return testo
+
+
+def normalizza_ente(ente: Optional[str]) -> str:
+    return " ".join((ente or "").split()).casefold()
+
+
+def _in_data(valore) -> Optional[date]:
+    if isinstance(valore, datetime):
+        return valore.date()
+    if isinstance(valore, date):
+        return valore
+    if valore:
+        try:
+            return date.fromisoformat(str(valore)[:10])
+        except ValueError:
+            return None
+    return None
+
+
+@dataclass(frozen=True)
+class Affidamento:
+    """Un affidamento già emesso, come registrato nell'indice."""
+    id: int
+    ente: str
+    piva_cf: str
+    codice_cpv: str
+    data_atto: date
+    cig: str = ""
+    oggetto: str = ""
+    totale: Optional[Decimal] = None
+
+
+@dataclass(frozen=True)
+class VerificaRotazione:
+    """
+    Esito della verifica per un nuovo affidamento. `precedenti` sono gli
+    affidamenti allo stesso operatore nella finestra, dal più recente.
+    """
+    precedenti: Tuple[Affidamento, ...] = ()
+    categoria: str = ""
+    dal: Optional[date] = None
+
+    @property
+    def operatore_uscente(self) -> bool:
+        return bool(self.precedenti)
+
+    @property
+    def categoria_verificata(self) -> bool:
+        return bool(self.categoria)
+
+    def deroga_mancante(self, operatore_uscente_dichiarato: bool) -> bool:
+        """
+        True se l'operatore risulta uscente ma l'atto non lo dichiara: la
+        determina non conterrebbe la motivazione della deroga alla rotazione.
+        """
+        return self.operatore_uscente and not operatore_uscente_dichiarato
+
+
+class IndiceRotazione:
+    """
+    Indice degli affidamenti per la verifica della rotazione.
+
+    Args:
+        finestra_giorni: Periodo considerato a ritroso dalla data dell'atto
+        cifre_categoria: Cifre del CPV che individuano la categoria
+    """
+
+    def __init__(self, finestra_giorni: int = FINESTRA_GIORNI,
+                 cifre_categoria: int = CIFRE_CATEGORIA):
+        self.finestra_giorni = finestra_giorni
+        self.cifre_categoria = cifre_categoria
+        self._lock = threading.Lock()
+        self._ids = set()
+        # (ente, piva, categoria) e (ente, piva) -> (date ordinate, affidamenti nello stesso ordine)
+        self._per_categoria: Dict[Tuple[str, str, str], Tuple[List[date], List[Affidamento]]] = {}
+        self._per_operatore: Dict[Tuple[str, str], Tuple[List[date], List[Affidamento]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @staticmethod
+    def _inserisci(indice: Dict, chiave: tuple, affidamento: Affidamento) -> None:
+        date_, voci = indice.setdefault(chiave, ([], []))
+        posizione = bisect_right(date_, affidamento.data_atto)
+        date_.insert(posizione, affidamento.data_atto)
+        voci.insert(posizione, affidamento)
+
+    def _chiavi(self, affidamento: Affidamento) -> Tuple[Optional[tuple], Optional[tuple]]:
+        """Chiavi (per categoria, per operatore) dell'affidamento; None se non indicizzabile."""
+        piva = normalizza_piva(affidamento.piva_cf)
+        if not piva or affidamento.data_atto is None:
+            return None, None
+        ente = normalizza_ente(affidamento.ente)
+        categoria = categoria_cpv(affidamento.codice_cpv, self.cifre_categoria)
+        return ((ente, piva, categoria) if categoria else None), (ente, piva)
+
+    def aggiungi(self, affidamento: Affidamento) -> None:
+        """Registra un affidamento (gli id già presenti vengono ignorati)."""
+        per_categoria, per_operatore = self._chiavi(affidamento)
+        if per_operatore is None:
+            return
+        with self._lock:
+            if affidamento.id in self._ids:
+                return
+            self._ids.add(affidamento.id)
+            if per_categoria:
+                self._inserisci(self._per_categoria, per_categoria, affidamento)
+            self._inserisci(self._per_operatore, per_operatore, affidamento)
+
+    def carica(self, affidamenti: Iterable[Affidamento]) -> None:
+        """
+        Registra molti affidamenti insieme (es. all'avvio). Se arrivano in
+        ordine di data, come da ArchivioDetermine.affidamenti(), ogni voce è
+        un'aggiunta in coda; i gruppi ricevuti fuori ordine si riordinano
+        una volta sola alla fine.
+        """
+        enti: Dict[str, str] = {}
+        categorie: Dict[str, str] = {}
+        da_ordinare = set()
+        with self._lock:
+            for affidamento in affidamenti:
+                piva = normalizza_piva(affidamento.piva_cf)
+                data_atto = affidamento.data_atto
+                if not piva or data_atto is None or affidamento.id in self._ids:
+                    continue
+                self._ids.add(affidamento.id)
+                ente = enti.get(affidamento.ente)
+                if ente is None:
+                    ente = enti[affidamento.ente] = normalizza_ente(affidamento.ente)
+                categoria = categorie.get(affidamento.codice_cpv)
+                if categoria is None:
+                    categoria = categorie[affidamento.codice_cpv] = categoria_cpv(
+                        affidamento.codice_cpv, self.cifre_categoria
+                    )
+                chiavi = [(self._per_operatore, (ente, piva))]
+                if categoria:
+                    chiavi.append((self._per_categoria, (ente, piva, categoria)))
+                for indice, chiave in chiavi:
+                    voce = indice.get(chiave)
+                    if voce is None:
+                        indice[chiave] = ([data_atto], [affidamento])
+                        continue
+                    if data_atto < voce[0][-1]:
+                        da_ordinare.add((id(indice), chiave))
+                    voce[0].append(data_atto)
+                    voce[1].append(affidamento)
+            for id_indice, chiave in da_ordinare:
+                indice = self._per_operatore if id_indice == id(self._per_operatore) else self._per_categoria
+                voci = sorted(indice[chiave][1], key=lambda a: a.data_atto)
+                indice[chiave] = ([a.data_atto for a in voci], voci)
+
+    def registra(self, id_atto: int, dati: Dict) -> None:
+        """Registra la determina appena emessa a partire dal suo dizionario `dati`."""
+        data_atto = _in_data(dati.get("data_atto"))
+        if data_atto is None:
+            return
+        self.aggiungi(Affidamento(
+            id_atto, dati.get("comune") or "", dati.get("piva_cf") or "",
+            dati.get("codice_cpv") or "", data_atto, dati.get("cig") or "",
+            dati.get("oggetto") or "",
+        ))
+
+    def verifica(self, ente: str, piva_cf: str, codice_cpv: str = "",
+                 data_atto=None, cig: str = "", escludi=()) -> VerificaRotazione:
+        """
+        Affidamenti precedenti allo stesso operatore, nella stessa categoria
+        CPV (o in qualunque categoria se il CPV manca), nella finestra che
+        precede `data_atto` (oggi se assente). Gli atti con lo stesso `cig`
+        (bozze dello stesso affidamento) e gli id in `escludi` non contano.
+        """
+        piva = normalizza_piva(piva_cf)
+        categoria = categoria_cpv(codice_cpv, self.cifre_categoria)
+        fine = _in_data(data_atto) or date.today()
+        inizio = fine - timedelta(days=self.finestra_giorni)
+        if not piva:
+            return VerificaRotazione(categoria=categoria, dal=inizio)
+
+        ente = normalizza_ente(ente)
+        with self._lock:
+            if categoria:
+                voce = self._per_categoria.get((ente, piva, categoria))
+            else:
+                voce = self._per_operatore.get((ente, piva))
+            if voce is None:
+                return VerificaRotazione(categoria=categoria, dal=inizio)
+            date_, affidamenti = voce
+            precedenti = [
+                a for a in affidamenti[bisect_left(date_, inizio):bisect_right(date_, fine)]
+                if not (cig and a.cig == cig) and a.id not in escludi
+            ]
+        return VerificaRotazione(tuple(reversed(precedenti)), categoria, inizio)
+
+    @classmethod
+    def da_archivio(cls, archivio, **opzioni) -> "IndiceRotazione":
+        """
+        Costruisce l'indice dagli atti dell'archivio che ricadono nella
+        finestra (rispetto a oggi): gli atti più vecchi non servono alla
+        verifica e non vengono caricati.
+        """
+        indice = cls(**opzioni)
+        dal = date.today() - timedelta(days=indice.finestra_giorni)
+        indice.carica(
+            Affidamento(id_atto, ente, piva_cf, codice_cpv, _in_data(data_atto), cig, oggetto, totale)
+            for id_atto, ente, piva_cf, codice_cpv, data_atto, cig, oggetto, totale
+            in archivio.affidamenti(dal)
+        )
+        return indice
@@ -0,0 +1,370 @@
+"""
+DETERMINAFACILE - Servizio HTTP v1.0
+API HTTP per generare le determine da altri sistemi (protocollo
+informatico, contabilità) senza passare dall'interfaccia Streamlit.
+Il corpo della richiesta è il dizionario `dati` in JSON, con le stesse
+chiavi di batch.py (date come '2025-03-14' o '14/03/2025').
+
+    POST /v1/determina?formato=rtf   documento (rtf, docx o odt)
+    POST /v1/testi                   {"premesse": ..., "dispositivo": ...}
+    POST /v1/valida                  {"valido": ..., "errori": [...]}
+    GET  /v1/salute                  stato e contatori del servizio
+
+- HTTP/1.1 con keep-alive su asyncio, senza dipendenze esterne (niente
+  streamlit né openai)
+- Decodifica JSON, validazione e rendering girano in un pool di processi:
+  il ciclo degli eventi si limita a leggere e scrivere i socket
+- Le richieste in attesa sono inviate ai processi a lotti: quando tutti i
+  worker sono occupati la coda si accumula e il lotto successivo le
+  raccoglie in un solo passaggio (nessuna attesa aggiunta a basso carico)
+- Coda limitata: oltre `coda` richieste in attesa il servizio risponde
+  503 con Retry-After invece di accumulare memoria e latenza
+
+Uso:
+    python servizio.py --porta 8080 --processi 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, quote, urlsplit
+
+from batch import normalizza_dati
+from document_generator import FORMATI, esporta_determina
+from logic_engine import valida_dati
+from render_cache import genera_testi
+
+
+MAX_CORPO = 1024 * 1024
+MAX_TESTATA = 16 * 1024
+
+MOTIVI = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    411: "Length Required", 413: "Payload Too Large", 422: "Unprocessable Entity",
+    431: "Request Header Fields Too Large", 500: "Internal Server Error",
+    503: "Service Unavailable", 504: "Gateway Timeout",
+}
+
+# Percorso -> operazione eseguita nei worker
+OPERAZIONI = {
+    "/v1/determina": "documento",
+    "/v1/testi": "testi",
+    "/v1/valida": "valida",
+}
+
+
+class Risposta(NamedTuple):
+    stato: int
+    tipo: str
+    corpo: bytes
+    nome_file: str = ""
+
+
+def risposta_json(stato: int, contenuto) -> Risposta:
+    corpo = json.dumps(contenuto, ensure_ascii=False).encode("utf-8")
+    return Risposta(stato, "application/json; charset=utf-8", corpo)
+
+
+# =============================================================================
+# ELABORAZIONE (ESEGUITA NEI PROCESSI WORKER)
+# =============================================================================
+
+def elabora_richiesta(operazione: str, formato: str, corpo: bytes) -> Risposta:
+    """Decodifica, valida e genera una determina; gli errori diventano risposte."""
+    try:
+        dati = json.loads(corpo)
+    except ValueError as e:
+        return risposta_json(400, {"errore": f"JSON non valido: {e}"})
+    if not isinstance(dati, dict):
+        return risposta_json(400, {"errore": "Il corpo deve essere un oggetto JSON"})
+
+    try:
+        dati = normalizza_dati(dati)
+        valido, errori = valida_dati(dati)
+        if operazione == "valida":
+            return risposta_json(200, {"valido": valido, "errori": errori})
+        if not valido:
+            return risposta_json(422, {"valido": False, "errori": errori})
+
+        premesse, dispositivo = genera_testi(dati)
+        if operazione == "testi":
+            return risposta_json(200, {"premesse": premesse, "dispositivo": dispositivo})
+        contenuto, nome_file = esporta_determina(dati, premesse, dispositivo, formato)
+        return Risposta(200, FORMATI[formato][2], contenuto, nome_file)
+    except (ValueError, TypeError) as e:
+        # Date non riconosciute, importi non numerici, righe_offerta malformate
+        return risposta_json(422, {"valido": False, "errori": [f"{type(e).__name__}: {e}"]})
+    except Exception as e:
+        return risposta_json(500, {"errore": f"{type(e).__name__}: {e}"})
+
+
+def _ignora_interruzioni() -> None:
+    # Ctrl+C arriva a tutto il gruppo di processi: l'arresto lo gestisce il servizio
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def elabora_lotto(richieste: List[Tuple[str, str, bytes]]) -> List[Risposta]:
+    """Un lotto di richieste in un solo viaggio verso il worker."""
+    return [elabora_richiesta(*richiesta) for richiesta in richieste]
+
+
+# =============================================================================
+# SERVIZIO
+# =============================================================================
+
+class ServizioDetermine:
+    """
+    Server HTTP asyncio con un pool di processi per il rendering.
+
+    Args:
+        processi: Processi worker (default: numero di CPU)
+        lotto: Richieste massime per lotto inviato a un worker
+        coda: Richieste in attesa oltre le quali si risponde 503
+        lotti_in_volo: Lotti in elaborazione contemporanea (default: 2 x processi)
+        timeout: Secondi massimi di una richiesta in coda e in elaborazione
+        max_corpo: Dimensione massima del corpo JSON in bytes
+        keep_alive: Secondi di inattività dopo i quali si chiude la connessione
+    """
+
+    def __init__(self, processi: int = 0, lotto: int = 32, coda: int = 1024,
+                 lotti_in_volo: int = 0, timeout: float = 30.0,
+                 max_corpo: int = MAX_CORPO, keep_alive: float = 15.0):
+        self.processi = processi or os.cpu_count() or 1
+        self.lotto = lotto
+        self.lotti_in_volo = lotti_in_volo or self.processi * 2
+        self.timeout = timeout
+        self.max_corpo = max_corpo
+        self.keep_alive = keep_alive
+        self._dimensione_coda = coda
+        self._coda: Optional[asyncio.Queue] = None
+        self._posti: Optional[asyncio.Semaphore] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._distributore: Optional[asyncio.Task] = None
+        self._connessioni = set()
+        self._inizio = time.monotonic()
+        self.contatori = {"richieste": 0, "rifiutate": 0, "scadute": 0, "lotti": 0, "elaborate": 0}
+
+    # --- ciclo di vita ---
+
+    async def avvia(self, host: str = "127.0.0.1", porta: int = 8080) -> asyncio.AbstractServer:
+        self._coda = asyncio.Queue(maxsize=self._dimensione_coda)
+        self._posti = asyncio.Semaphore(self.lotti_in_volo)
+        self._pool = ProcessPoolExecutor(max_workers=self.processi, initializer=_ignora_interruzioni)
+        self._distributore = asyncio.get_running_loop().create_task(self._distribuisci())
+        return await asyncio.start_server(self._connessione, host, porta, limit=MAX_TESTATA)
+
+    async def chiudi(self) -> None:
+        # Le connessioni keep-alive inattive terminano con la chiusura del socket
+        for writer in list(self._connessioni):
+            writer.close()
+        await asyncio.sleep(0)
+        if self._distributore is not None:
+            self._distributore.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    # --- elaborazione ---
+
+    async def elabora(self, operazione: str, formato: str, corpo: bytes) -> Risposta:
+        """Mette la richiesta in coda e attende la risposta del worker."""
+        futuro = asyncio.get_running_loop().create_future()
+        try:
+            self._coda.put_nowait(((operazione, formato, corpo), futuro))
+        except asyncio.QueueFull:
+            self.contatori["rifiutate"] += 1
+            return risposta_json(503, {"errore": "Servizio sovraccarico, riprovare"})
+        try:
+            return await asyncio.wait_for(futuro, self.timeout)
+        except asyncio.TimeoutError:
+            self.contatori["scadute"] += 1
+            return risposta_json(504, {"errore": "Tempo di elaborazione scaduto"})
+
+    async def _distribuisci(self) -> None:
+        """Forma i lotti: aspetta un posto libero, poi prende tutto quello che è in coda."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._posti.acquire()
+            lotto = [await self._coda.get()]
+            while len(lotto) < self.lotto and not self._coda.empty():
+                lotto.append(self._coda.get_nowait())
+            loop.create_task(self._esegui(lotto))
+
+    async def _esegui(self, lotto) -> None:
+        # Le richieste già scadute mentre erano in coda non si elaborano
+        lotto = [(richiesta, futuro) for richiesta, futuro in lotto if not futuro.done()]
+        if not lotto:
+            self._posti.release()
+            return
+        richieste = [richiesta for richiesta, _ in lotto]
+        try:
+            risposte = await asyncio.get_running_loop().run_in_executor(
+                self._pool, elabora_lotto, richieste
+            )
+        except Exception as e:
+            # Es. worker terminato (BrokenProcessPool): fallisce solo questo lotto
+            risposte = [risposta_json(500, {"errore": f"{type(e).__name__}: {e}"})] * len(lotto)
+        finally:
+            self._posti.release()
+        self.contatori["lotti"] += 1
+        self.contatori["elaborate"] += len(lotto)
+        for (_, futuro), risposta in zip(lotto, risposte):
+            if not futuro.done():
+                futuro.set_result(risposta)
+
+    def salute(self) -> Dict:
+        return {
+            "stato": "ok",
+            "processi": self.processi,
+            "in_coda": self._coda.qsize() if self._coda is not None else 0,
+            "secondi_attivo": round(time.monotonic() - self._inizio, 1),
+            **self.contatori,
+        }
+
+    # --- HTTP ---
+
+    async def _instrada(self, metodo: str, destinazione: str, corpo: bytes) -> Risposta:
+        indirizzo = urlsplit(destinazione)
+        percorso = indirizzo.path.rstrip("/") or "/"
+        if percorso == "/v1/salute":
+            if metodo not in ("GET", "HEAD"):
+                return risposta_json(405, {"errore": "Metodo non consentito"})
+            return risposta_json(200, self.salute())
+        operazione = OPERAZIONI.get(percorso)
+        if operazione is None:
+            return risposta_json(404, {"errore": f"Percorso sconosciuto: {percorso}"})
+        if metodo != "POST":
+            return risposta_json(405, {"errore": "Metodo non consentito"})
+        formato = parse_qs(indirizzo.query).get("formato", ["rtf"])[0].lower()
+        if formato not in FORMATI:
+            return risposta_json(400, {"errore": f"Formato non supportato: '{formato}'"})
+        self.contatori["richieste"] += 1
+        return await self.elabora(operazione, formato, corpo)
+
+    async def _connessione(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connessioni.add(writer)
+        try:
+            while True:
+                try:
+                    testata = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.keep_alive)
+                except asyncio.LimitOverrunError:
+                    await _invia(writer, risposta_json(431, {"errore": "Intestazioni troppo lunghe"}), False)
+                    return
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    return
+
+                try:
+                    metodo, destinazione, versione, intestazioni = _leggi_testata(testata)
+                except ValueError:
+                    await _invia(writer, risposta_json(400, {"errore": "Richiesta HTTP non valida"}), False)
+                    return
+
+                connessione = intestazioni.get("connection", "").lower()
+                mantieni = connessione == "keep-alive" if versione == "HTTP/1.0" else connessione != "close"
+
+                if "chunked" in intestazioni.get("transfer-encoding", "").lower():
+                    await _invia(writer, risposta_json(411, {"errore": "Indicare Content-Length"}), False)
+                    return
+                try:
+                    lunghezza = int(intestazioni.get("content-length", "0"))
+                except ValueError:
+                    lunghezza = -1
+                if lunghezza < 0:
+                    await _invia(writer, risposta_json(400, {"errore": "Content-Length non valido"}), False)
+                    return
+                if lunghezza > self.max_corpo:
+                    await _invia(writer, risposta_json(413, {"errore": "Corpo troppo grande"}), False)
+                    return
+                corpo = await reader.readexactly(lunghezza) if lunghezza else b""
+
+                risposta = await self._instrada(metodo, destinazione, corpo)
+                await _invia(writer, risposta, mantieni, senza_corpo=metodo == "HEAD")
+                if not mantieni:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._connessioni.discard(writer)
+            writer.close()
+
+
+def _leggi_testata(testata: bytes) -> Tuple[str, str, str, Dict[str, str]]:
+    """'POST /v1/testi HTTP/1.1\\r\\nHost: ...' -> (metodo, destinazione, versione, intestazioni)."""
+    righe = testata.decode("latin-1").split("\r\n")
+    metodo, destinazione, versione = righe[0].split(" ")
+    if not versione.startswith("HTTP/1."):
+        raise ValueError(versione)
+    intestazioni = {}
+    for riga in righe[1:]:
+        if riga:
+            nome, _, valore = riga.partition(":")
+            intestazioni[nome.strip().lower()] = valore.strip()
+    return metodo.upper(), destinazione, versione, intestazioni
+
+
+async def _invia(writer: asyncio.StreamWriter, risposta: Risposta, mantieni: bool,
+                 senza_corpo: bool = False) -> None:
+    righe = [
+        f"HTTP/1.1 {risposta.stato} {MOTIVI.get(risposta.stato, '')}",
+        f"Content-Type: {risposta.tipo}",
+        f"Content-Length: {len(risposta.corpo)}",
+        f"Connection: {'keep-alive' if mantieni else 'close'}",
+    ]
+    if risposta.nome_file:
+        righe.append(f"Content-Disposition: attachment; filename*=UTF-8''{quote(risposta.nome_file)}")
+    if risposta.stato == 503:
+        righe.append("Retry-After: 1")
+    writer.write(("\r\n".join(righe) + "\r\n\r\n").encode("latin-1"))
+    if not senza_corpo:
+        writer.write(risposta.corpo)
+    await writer.drain()
+
+
+# =============================================================================
+# AVVIO
+# =============================================================================
+
+async def esegui(host: str, porta: int, **opzioni) -> None:
+    servizio = ServizioDetermine(**opzioni)
+    server = await servizio.avvia(host, porta)
+    fermo = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for segnale in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(segnale, fermo.set)
+        except NotImplementedError:
+            pass
+    print(f"DeterminaFacile API su http://{host}:{porta} ({servizio.processi} processi)", file=sys.stderr)
+    async with server:
+        await fermo.wait()
+    await servizio.chiudi()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Servizio HTTP per la generazione delle determine.")
+    parser.add_argument("--host", default="127.0.0.1", help="Indirizzo di ascolto (default: 127.0.0.1)")
+    parser.add_argument("--porta", type=int, default=8080, help="Porta (default: 8080)")
+    parser.add_argument("-p", "--processi", type=int, default=0,
+                        help="Processi worker (default: numero di CPU)")
+    parser.add_argument("--lotto", type=int, default=32,
+                        help="Richieste massime per lotto (default: 32)")
+    parser.add_argument("--coda", type=int, default=1024,
+                        help="Richieste in attesa oltre le quali si risponde 503 (default: 1024)")
+    parser.add_argument("--timeout", type=float, default=30.0,
+                        help="Secondi massimi per richiesta (default: 30)")
+    args = parser.parse_args(argv)
+
+    asyncio.run(esegui(
+        args.host, args.porta, processi=args.processi, lotto=args.lotto,
+        coda=args.coda, timeout=args.timeout,
+    ))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+DETERMINAFACILE - Spesa Cumulata v1.0
+Controllo del frazionamento artificioso (art. 14, c. 6 D.Lgs. 36/2023):
+quanto ha già speso l'ente nell'esercizio con lo stesso fornitore, nella
+stessa categoria CPV e sullo stesso capitolo, e quanto manca alle soglie
+dei 5.000 € (obbligo MEPA) e dei 140.000 € (affidamento diretto).
+- I totali sono mantenuti dall'archivio delle determine (archivio.py) a
+  ogni atto archiviato: la lettura è una ricerca per chiave primaria
+- Le bozze rigenerate con lo stesso CIG contano una volta sola, e l'atto
+  in compilazione non si somma a se stesso
+Gli avvisi sono informativi: la scelta della procedura resta al RUP e il
+testo della determina non viene modificato.
+"""
+
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from importi import da_centesimi, in_centesimi
+from logic_engine import SOGLIA_MEPA, formatta_importo
+from rotazione import categoria_cpv
+
+
+SOGLIA_AFFIDAMENTO_DIRETTO = 140000
+
+# Soglie controllate, dalla più bassa
+SOGLIE = (
+    (SOGLIA_MEPA, "obbligo di ricorso al MEPA"),
+    (SOGLIA_AFFIDAMENTO_DIRETTO, "affidamento diretto"),
+)
+
+# Quota della soglia oltre la quale si avvisa anche se non è superata
+MARGINE_AVVISO = 0.8
+
+DIMENSIONI = {
+    "fornitore": "con lo stesso operatore economico",
+    "cpv": "nella stessa categoria CPV",
+    "capitolo": "sullo stesso capitolo",
+}
+
+
+@dataclass(frozen=True)
+class SpesaCumulata:
+    """Spesa già impegnata nell'esercizio per una dimensione (imponibile, IVA esclusa)."""
+    dimensione: str
+    chiave: str
+    imponibile: Decimal
+    atti: int
+
+
+@dataclass(frozen=True)
+class AvvisoSoglia:
+    """
+    La spesa cumulata più l'atto in compilazione supera (o si avvicina a)
+    una soglia che l'atto da solo rispetta.
+    """
+    spesa: SpesaCumulata
+    soglia: int
+    descrizione: str
+    cumulato: Decimal
+    superata: bool
+
+    @property
+    def messaggio(self) -> str:
+        esito = "supera la soglia" if self.superata else "si avvicina alla soglia"
+        atti = "1 atto" if self.spesa.atti == 1 else f"{self.spesa.atti} atti"
+        return (
+            f"Spesa nell'esercizio {DIMENSIONI[self.spesa.dimensione]}: "
+            f"{formatta_importo(self.spesa.imponibile)} in {atti}; con questo "
+            f"affidamento {formatta_importo(self.cumulato)}, che {esito} di "
+            f"{formatta_importo(Decimal(self.soglia))} ({self.descrizione}). Verificare che "
+            f"non si tratti di frazionamento artificioso."
+        )
+
+
+class AggregatiSpesa:
+    """
+    Lettura della spesa cumulata dall'archivio delle determine.
+
+    Args:
+        archivio: ArchivioDetermine con la tabella `spesa`
+        margine: Quota della soglia oltre la quale si avvisa
+    """
+
+    def __init__(self, archivio, margine: float = MARGINE_AVVISO):
+        self.archivio = archivio
+        self.margine = margine
+
+    @staticmethod
+    def chiavi(piva_cf: str = "", codice_cpv: str = "", capitolo="") -> Dict[str, str]:
+        """Chiavi come le registra l'archivio (P.IVA maiuscola, gruppo CPV, capitolo come testo)."""
+        return {
+            "fornitore": (piva_cf or "").strip().upper(),
+            "cpv": categoria_cpv(codice_cpv),
+            "capitolo": str(capitolo or "").strip(),
+        }
+
+    def spesa(self, ente: str, esercizio, piva_cf: str = "", codice_cpv: str = "",
+              capitolo="", cig: str = "") -> List[SpesaCumulata]:
+        """
+        Spesa già archiviata per fornitore, categoria CPV e capitolo. Se il
+        CIG è già in archivio (una bozza precedente dello stesso atto) il
+        suo importo è tolto dai totali in cui compare.
+        """
+        chiavi = self.chiavi(piva_cf, codice_cpv, capitolo)
+        totali = self.archivio.spesa(ente, esercizio, chiavi)
+        precedente: Optional[Tuple] = self.archivio.atto_corrente(ente, cig)
+        risultato = []
+        for dimensione, (imponibile, atti) in totali.items():
+            if precedente is not None and precedente[4] == str(esercizio or ""):
+                indice = {"fornitore": 1, "cpv": 2, "capitolo": 3}[dimensione]
+                if precedente[indice] == chiavi[dimensione]:
+                    imponibile -= precedente[5]
+                    atti -= 1
+            risultato.append(SpesaCumulata(dimensione, chiavi[dimensione], da_centesimi(imponibile), atti))
+        return risultato
+
+    def avvisi(self, ente: str, esercizio, imponibile, piva_cf: str = "",
+               codice_cpv: str = "", capitolo="", cig: str = "") -> List[AvvisoSoglia]:
+        """
+        Avvisi per le soglie che l'atto da solo rispetta ma che la spesa
+        cumulata supera o sta per superare (per ogni dimensione la più alta).
+        """
+        corrente = da_centesimi(in_centesimi(imponibile or 0))
+        avvisi = []
+        for spesa in self.spesa(ente, esercizio, piva_cf, codice_cpv, capitolo, cig):
+            if not spesa.atti:
+                continue
+            cumulato = spesa.imponibile + corrente
+            for soglia, descrizione in reversed(SOGLIE):
+                if corrente >= soglia:
+                    continue
+                if cumulato >= soglia * Decimal(str(self.margine)):
+                    avvisi.append(AvvisoSoglia(spesa, soglia, descrizione, cumulato, cumulato >= soglia))
+                    break
+        return avvisi
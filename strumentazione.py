@@ -0,0 +1,260 @@
+"""
+DETERMINAFACILE - Strumentazione v1.0
+Misura opzionale delle sezioni della determina: tempo, numero di chiamate
+e dimensione dell'output di ogni generatore di sezione (logic_engine) e
+della conversione RTF (document_generator).
+
+Spenta per impostazione predefinita: le funzioni decorate con @sezione
+fanno solo un controllo su una variabile di modulo prima di chiamare la
+funzione originale. Si attiva con un "sink" che riceve le misure:
+- una funzione qualunque (riceve un dizionario per ogni misura)
+- SinkJSON: una riga JSON per misura su un file o un logger
+- SinkPrometheus: contatori aggregati esportati nel formato testo di Prometheus
+
+Uso:
+    with strumenta(SinkPrometheus()) as sink:
+        genera_testo_completo(dati)
+    print(sink.esporta())
+
+Per analizzare un singolo rendering c'è profila(), che cattura le
+statistiche di cProfile e/o le allocazioni di tracemalloc.
+"""
+
+import functools
+import io
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, TextIO, Union
+
+if TYPE_CHECKING:
+    import logging
+
+
+# Sink attivo (None = strumentazione spenta)
+_sink: Optional[Callable[[Dict[str, Any]], None]] = None
+
+# Pila delle sezioni in corso, per attribuire ogni misura alla sezione che la contiene
+_locale = threading.local()
+
+
+def _dimensione(risultato) -> int:
+    """Dimensione dell'output: caratteri, bytes, elementi o somma per le tuple di testi."""
+    if isinstance(risultato, (str, bytes, list)):
+        return len(risultato)
+    if isinstance(risultato, tuple):
+        return sum(_dimensione(parte) for parte in risultato)
+    if isinstance(risultato, int) and not isinstance(risultato, bool):
+        return risultato
+    return 0
+
+
+def sezione(nome: str) -> Callable:
+    """
+    Decoratore per i generatori di sezione. Con la strumentazione spenta il
+    costo è un confronto con None; accesa, invia al sink un dizionario con
+    sezione, genitore, durata_s e dimensione.
+    """
+    def decoratore(funzione: Callable) -> Callable:
+        @functools.wraps(funzione)
+        def misurata(*args, **kwargs):
+            if _sink is None:
+                return funzione(*args, **kwargs)
+            pila = getattr(_locale, "pila", None)
+            if pila is None:
+                pila = _locale.pila = []
+            genitore = pila[-1] if pila else None
+            pila.append(nome)
+            inizio = time.perf_counter()
+            try:
+                risultato = funzione(*args, **kwargs)
+            finally:
+                durata = time.perf_counter() - inizio
+                pila.pop()
+            sink = _sink
+            if sink is not None:
+                sink({
+                    "sezione": nome,
+                    "genitore": genitore,
+                    "durata_s": durata,
+                    "dimensione": _dimensione(risultato),
+                })
+            return risultato
+        return misurata
+    return decoratore
+
+
+def attiva(sink: Callable[[Dict[str, Any]], None]) -> None:
+    """Attiva la strumentazione per tutto il processo inviando le misure a `sink`."""
+    global _sink
+    _sink = sink
+
+
+def disattiva() -> None:
+    global _sink
+    _sink = None
+
+
+@contextmanager
+def strumenta(sink: Callable[[Dict[str, Any]], None]):
+    """Attiva la strumentazione per la durata del blocco e restituisce il sink."""
+    precedente = _sink
+    attiva(sink)
+    try:
+        yield sink
+    finally:
+        if precedente is not None:
+            attiva(precedente)
+        else:
+            disattiva()
+
+
+# =============================================================================
+# SINK
+# =============================================================================
+
+class SinkJSON:
+    """
+    Scrive una riga JSON per misura, con timestamp, su un file di testo
+    (es. sys.stderr) oppure su un logger a livello INFO.
+    """
+
+    def __init__(self, destinazione: Union[TextIO, "logging.Logger"]):
+        self.destinazione = destinazione
+        self._lock = threading.Lock()
+
+    def __call__(self, misura: Dict[str, Any]) -> None:
+        riga = json.dumps({"ts": round(time.time(), 6), **misura}, ensure_ascii=False)
+        # Un logger non ha write(): il controllo evita di importare logging all'avvio
+        if not hasattr(self.destinazione, "write"):
+            self.destinazione.info(riga)
+            return
+        with self._lock:
+            self.destinazione.write(riga + "\n")
+
+
+class SinkPrometheus:
+    """
+    Aggrega chiamate, secondi e dimensione per sezione; esporta() restituisce
+    le metriche nel formato testo di Prometheus (da servire su /metrics o
+    scrivere per il textfile collector di node_exporter).
+    """
+
+    PREFISSO = "determinafacile_sezione"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._chiamate: Dict[str, int] = {}
+        self._secondi: Dict[str, float] = {}
+        self._dimensione: Dict[str, int] = {}
+
+    def __call__(self, misura: Dict[str, Any]) -> None:
+        nome = misura["sezione"]
+        with self._lock:
+            self._chiamate[nome] = self._chiamate.get(nome, 0) + 1
+            self._secondi[nome] = self._secondi.get(nome, 0.0) + misura["durata_s"]
+            self._dimensione[nome] = self._dimensione.get(nome, 0) + misura["dimensione"]
+
+    def riepilogo(self) -> Dict[str, Dict[str, float]]:
+        """Per sezione: chiamate, secondi totali, media in ms e dimensione totale."""
+        with self._lock:
+            return {
+                nome: {
+                    "chiamate": n,
+                    "secondi": self._secondi[nome],
+                    "media_ms": self._secondi[nome] / n * 1000,
+                    "dimensione": self._dimensione[nome],
+                }
+                for nome, n in sorted(self._chiamate.items())
+            }
+
+    def esporta(self) -> str:
+        p = self.PREFISSO
+        righe = [
+            f"# HELP {p}_chiamate_total Chiamate del generatore di sezione.",
+            f"# TYPE {p}_chiamate_total counter",
+        ]
+        with self._lock:
+            nomi = sorted(self._chiamate)
+            righe += [f'{p}_chiamate_total{{sezione="{n}"}} {self._chiamate[n]}' for n in nomi]
+            righe += [
+                f"# HELP {p}_secondi_total Tempo complessivo speso nella sezione (incluse le sottosezioni).",
+                f"# TYPE {p}_secondi_total counter",
+            ]
+            righe += [f'{p}_secondi_total{{sezione="{n}"}} {self._secondi[n]:.9f}' for n in nomi]
+            righe += [
+                f"# HELP {p}_dimensione_total Dimensione complessiva dell'output (caratteri o bytes).",
+                f"# TYPE {p}_dimensione_total counter",
+            ]
+            righe += [f'{p}_dimensione_total{{sezione="{n}"}} {self._dimensione[n]}' for n in nomi]
+        return "\n".join(righe) + "\n"
+
+    def azzera(self) -> None:
+        with self._lock:
+            self._chiamate.clear()
+            self._secondi.clear()
+            self._dimensione.clear()
+
+
+# =============================================================================
+# PROFILAZIONE DI UN SINGOLO RENDERING
+# =============================================================================
+
+@dataclass
+class Profilo:
+    """Risultato di profila(): valore restituito, misure per sezione e report."""
+    risultato: Any
+    sezioni: Dict[str, Dict[str, float]]
+    cprofile: str = ""
+    picco_memoria: int = 0
+    allocazioni: List[str] = field(default_factory=list)
+
+
+def profila(funzione: Callable, *args, cprofile: bool = True, memoria: bool = False,
+            righe: int = 25, **kwargs) -> Profilo:
+    """
+    Esegue una volta `funzione(*args, **kwargs)` con la strumentazione delle
+    sezioni attiva e, a scelta, con cProfile (statistiche ordinate per tempo
+    cumulativo) e tracemalloc (picco e righe di codice che allocano di più).
+    cProfile e tracemalloc rallentano l'esecuzione: i tempi delle sezioni
+    vanno letti in proporzione, non in assoluto.
+    """
+    # Moduli di profilazione importati solo qui: non pesano sull'avvio
+    import cProfile
+    import pstats
+    import tracemalloc
+
+    aggregatore = SinkPrometheus()
+    profiler = cProfile.Profile() if cprofile else None
+    if memoria:
+        tracemalloc.start()
+    try:
+        with strumenta(aggregatore):
+            if profiler is not None:
+                profiler.enable()
+            try:
+                risultato = funzione(*args, **kwargs)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        picco = 0
+        allocazioni = []
+        if memoria:
+            picco = tracemalloc.get_traced_memory()[1]
+            istantanea = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ))
+            allocazioni = [str(s) for s in istantanea.statistics("lineno")[:righe]]
+    finally:
+        if memoria:
+            tracemalloc.stop()
+
+    report = ""
+    if profiler is not None:
+        testo = io.StringIO()
+        pstats.Stats(profiler, stream=testo).sort_stats("cumulative").print_stats(righe)
+        report = testo.getvalue()
+    return Profilo(risultato, aggregatore.riepilogo(), report, picco, allocazioni)
@@ -0,0 +1,41 @@
+"""
+Contesto della determina: i valori arrivati da JSON o CSV (None, numeri)
+non devono far fallire la generazione.
+"""
+
+import json
+
+import pytest
+
+from benchmarks.bench_template import DATI_ESEMPIO
+from logic_engine import DeterminaContext, genera_testo_completo
+from servizio import elabora_richiesta
+
+
+@pytest.mark.parametrize("comune, nome_comune", [
+    (None, ""),
+    ("", ""),
+    (65013, "65013"),
+    ("Comune di Pescara", "Pescara"),
+    ("COMUNE DI Pescara", "Pescara"),
+    ("Pescara", "Pescara"),
+])
+def test_nome_comune(comune, nome_comune):
+    assert DeterminaContext(comune=comune).nome_comune == nome_comune
+
+
+@pytest.mark.parametrize("includi_visto", [False, True])
+def test_comune_none_genera_il_testo(includi_visto):
+    premesse, dispositivo = genera_testo_completo(
+        dict(DATI_ESEMPIO, comune=None, includi_visto=includi_visto)
+    )
+    assert premesse
+    assert ("VISTO DI REGOLARITÀ CONTABILE" in dispositivo) == includi_visto
+
+
+@pytest.mark.parametrize("operazione", ["testi", "determina"])
+def test_servizio_con_comune_null(operazione):
+    dati = {chiave: valore.strftime("%Y-%m-%d") if hasattr(valore, "strftime") else valore
+            for chiave, valore in DATI_ESEMPIO.items()}
+    risposta = elabora_richiesta(operazione, "rtf", json.dumps(dict(dati, comune=None)).encode())
+    assert risposta.stato == 200, risposta.corpo
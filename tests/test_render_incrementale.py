@@ -0,0 +1,71 @@
+"""
+Rendering incrementale: il testo deve essere sempre identico a
+genera_testo_completo. Se una sezione legge una chiave di `dati` non
+dichiarata con @legge, cambiare solo quella chiave lascia il testo vecchio
+e questi test falliscono.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from benchmarks.bench_template import DATI_ESEMPIO
+from logic_engine import _CAMPI, genera_testo_completo
+from render_incrementale import RenderIncrementale
+
+# Le sezioni opzionali spente: le chiavi lette solo in alcuni rami
+# vanno provate anche da qui
+DATI_MINIMI = dict(
+    DATI_ESEMPIO, operatore_uscente=False, regolamento_comunale=None, dup_num="", bilancio_num="",
+    peg_num="", durc_protocollo="", includi_visto=False, includi_ricorsi=False, includi_conflitto=False,
+)
+
+RIGHE_OFFERTA = [{"descrizione": "PC", "quantita": 2, "prezzo_unitario": 700, "aliquota_iva": 22},
+                 {"descrizione": "Libri", "importo": 100, "aliquota_iva": 4}]
+
+
+def altro_valore(chiave, valore):
+    """Un valore diverso da `valore` dello stesso genere."""
+    if chiave == "righe_offerta":
+        return RIGHE_OFFERTA if not valore else None
+    if isinstance(valore, bool):
+        return not valore
+    if isinstance(valore, datetime):
+        return valore + timedelta(days=1)
+    if isinstance(valore, (int, float)):
+        return valore + 1
+    return f"{valore or ''} modificato"
+
+
+@pytest.mark.parametrize("base", [DATI_ESEMPIO, DATI_MINIMI], ids=["completa", "minima"])
+@pytest.mark.parametrize("chiave", _CAMPI)
+def test_cambiare_una_chiave_rigenera_le_sezioni_che_la_leggono(base, chiave):
+    render = RenderIncrementale()
+    render.genera(dict(base))
+    dati = dict(base, **{chiave: altro_valore(chiave, base.get(chiave))})
+    assert render.genera(dati) == genera_testo_completo(dict(dati))
+
+
+def test_sequenza_casuale_di_modifiche():
+    caso = random.Random(7)
+    chiavi = list(_CAMPI)
+    render = RenderIncrementale()
+    dati = dict(DATI_ESEMPIO)
+    for _ in range(500):
+        for chiave in caso.sample(chiavi, caso.choice([1, 1, 2, 5])):
+            if caso.random() < 0.1:
+                dati.pop(chiave, None)
+            else:
+                dati[chiave] = altro_valore(chiave, dati.get(chiave, DATI_ESEMPIO.get(chiave)))
+        assert render.genera(dati) == genera_testo_completo(dict(dati))
+    assert render.riusate
+
+
+def test_modifica_sul_posto_delle_righe_offerta():
+    render = RenderIncrementale()
+    righe = [dict(riga) for riga in RIGHE_OFFERTA]
+    dati = dict(DATI_ESEMPIO, righe_offerta=righe)
+    render.genera(dati)
+    righe[0]["quantita"] = 5
+    assert render.genera(dati) == genera_testo_completo(dict(dati))
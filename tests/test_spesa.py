@@ -0,0 +1,84 @@
+"""Spesa cumulata: totali mantenuti dai trigger dell'archivio (spesa.py, archivio.py)."""
+
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from archivio import ArchivioDetermine
+from render_cache import DeterminaGenerata
+from spesa import AggregatiSpesa
+
+DOCUMENTO = DeterminaGenerata("prova", "testo della determina", b"{\\rtf1}", "prova.rtf")
+ENTE = "Comune di Prova"
+
+
+def dati(cig, imponibile, piva_cf="01234567890", codice_cpv="30213100-6", capitolo="1010"):
+    return {
+        "comune": "testo libero del modulo", "cig": cig, "piva_cf": piva_cf,
+        "ragione_sociale": "Alfa S.r.l.", "capitolo_bilancio": capitolo,
+        "esercizio_finanziario": 2025, "imponibile": imponibile, "aliquota_iva": 22,
+        "data_atto": datetime(2025, 3, 1), "oggetto": f"FORNITURA {cig}",
+        "motivazione": "prova", "codice_cpv": codice_cpv,
+    }
+
+
+@pytest.fixture
+def archivio(tmp_path):
+    archivio = ArchivioDetermine(str(tmp_path / "archivio.sqlite3"))
+    yield archivio
+    archivio.chiudi()
+
+
+def totali(archivio, ente=ENTE):
+    spese = AggregatiSpesa(archivio).spesa(ente, 2025, "01234567890", "30213100-6", "1010")
+    return {s.dimensione: (s.imponibile, s.atti) for s in spese}
+
+
+def test_somma_gli_atti_per_dimensione(archivio):
+    archivio.archivia(dati("A1", 2000), DOCUMENTO, ente=ENTE)
+    archivio.archivia(dati("A2", 1500, capitolo="2020"), DOCUMENTO, ente=ENTE)
+    assert totali(archivio) == {
+        "fornitore": (Decimal("3500.00"), 2),
+        "cpv": (Decimal("3500.00"), 2),
+        "capitolo": (Decimal("2000.00"), 1),
+    }
+
+
+def test_stesso_cig_sostituisce_la_versione_precedente(archivio):
+    archivio.archivia(dati("A1", 2000), DOCUMENTO, ente=ENTE)
+    archivio.archivia(dati("A2", 1500), DOCUMENTO, ente=ENTE)
+    archivio.archivia(dati("A2", 1800), DOCUMENTO, ente=ENTE)
+    assert totali(archivio)["fornitore"] == (Decimal("3800.00"), 2)
+
+
+def test_eliminare_la_versione_corrente_ripristina_la_precedente(archivio):
+    archivio.archivia(dati("A1", 2000), DOCUMENTO, ente=ENTE)
+    archivio.archivia(dati("A2", 1500), DOCUMENTO, ente=ENTE)
+    ultima = archivio.archivia(dati("A2", 1800), DOCUMENTO, ente=ENTE)
+    assert archivio.elimina(ultima)
+    assert totali(archivio)["fornitore"] == (Decimal("3500.00"), 2)
+    assert archivio.atto_corrente(ENTE, "A2")[5] == 150000
+
+
+def test_eliminare_una_versione_superata_non_cambia_i_totali(archivio):
+    prima = archivio.archivia(dati("A1", 2000), DOCUMENTO, ente=ENTE)
+    archivio.archivia(dati("A1", 2500), DOCUMENTO, ente=ENTE)
+    archivio.elimina(prima)
+    assert totali(archivio)["fornitore"] == (Decimal("2500.00"), 1)
+
+
+def test_atto_in_compilazione_non_si_somma_a_se_stesso(archivio):
+    archivio.archivia(dati("A1", 2000), DOCUMENTO, ente=ENTE)
+    archivio.archivia(dati("A2", 1500), DOCUMENTO, ente=ENTE)
+    spese = AggregatiSpesa(archivio).spesa(ENTE, 2025, "01234567890", "30213100-6", "1010", cig="A2")
+    assert {s.dimensione: s.imponibile for s in spese}["fornitore"] == Decimal("2000.00")
+
+
+def test_totali_separati_per_ente(archivio):
+    archivio.archivia(dati("A1", 2000), DOCUMENTO, ente=ENTE)
+    archivio.archivia(dati("A1", 4000), DOCUMENTO, ente="Comune di Altrove")
+    assert totali(archivio)["fornitore"] == (Decimal("2000.00"), 1)
+    assert totali(archivio, "comune di prova")["fornitore"] == (Decimal("2000.00"), 1)
+    assert totali(archivio, "Comune di Altrove")["fornitore"] == (Decimal("4000.00"), 1)
+    assert totali(archivio, "testo libero del modulo")["fornitore"] == (Decimal("0.00"), 0)